@@ -1,11 +1,328 @@
-from django.contrib import admin
-from .models import Product
+import datetime
+import numpy as np
+from django.contrib import admin, messages
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from . import analytics, taskqueue
+from .models import (
+    DailySales,
+    Order,
+    OrderLine,
+    Product,
+    RequestProfile,
+    StockAlert,
+    StockMovement,
+    Task,
+)
+
+
+class StockAlertFilter(admin.SimpleListFilter):
+    """Filter products by their open stock alert, through its indexed table."""
+
+    title = "stock alert"
+    parameter_name = "stock_alert"
+
+    def lookups(self, request, model_admin):
+        return [("any", "Any alert"), *StockAlert.LEVELS]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        alerts = StockAlert.objects.filter(resolved__isnull=True)
+        if self.value() != "any":
+            alerts = alerts.filter(level=self.value())
+        return queryset.filter(pk__in=alerts.values("product_id"))
 
 
 class ProductAdmin(admin.ModelAdmin):
     """Class to fine tune admin view for Product Objects."""
 
-    list_display = ("name", "quantity_available", "price_per_kg")
+    list_display = (
+        "name",
+        "quantity_available",
+        "price_per_kg",
+        "sold_today",
+        "sold_this_week",
+    )
+    list_filter = (StockAlertFilter,)
+
+    def get_queryset(self, request):
+        """Annotate each product with its sales from the DailySales rollups, one
+        indexed (product, day) lookup per product.
+        """
+        today = timezone.localdate()
+        sales = DailySales.objects.filter(product=OuterRef("pk")).order_by()
+        week = (
+            sales.filter(day__gt=today - datetime.timedelta(days=7))
+            .values("product")
+            .annotate(total=Sum("kg_sold"))
+            .values("total")
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                sold_today=Coalesce(
+                    Subquery(sales.filter(day=today).values("kg_sold")), 0
+                ),
+                sold_this_week=Coalesce(Subquery(week), 0),
+            )
+        )
+
+    def sold_today(self, obj) -> int:
+        return obj.sold_today
+
+    sold_today.short_description = "Sold today (kg)"
+    sold_today.admin_order_field = "sold_today"
+
+    def sold_this_week(self, obj) -> int:
+        return obj.sold_this_week
+
+    sold_this_week.short_description = "Sold in the last 7 days (kg)"
+    sold_this_week.admin_order_field = "sold_this_week"
+
+
+class OrderLineInline(admin.TabularInline):
+    """Class to show the lines of an Order on its page."""
+
+    model = OrderLine
+    fields = ("product_name", "quantity", "price_per_kg")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+class OrderAdmin(admin.ModelAdmin):
+    """Class to browse the order history, which is never edited."""
+
+    list_display = ("id", "created", "total")
+    date_hierarchy = "created"
+    inlines = (OrderLineInline,)
+    change_list_template = "admin/cart/order/change_list.html"
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                "report/",
+                self.admin_site.admin_view(self.report_view),
+                name="cart_order_report",
+            )
+        ]
+        return urls + super().get_urls()
+
+    def report_view(self, request) -> TemplateResponse:
+        """Show sales and stock rollups over the last ?days= days (default 30)."""
+        try:
+            days = max(1, min(int(request.GET.get("days", "")), 366))
+        except ValueError:
+            days = analytics.DEFAULT_DAYS
+        report = analytics.report(days)
+        sold = np.flatnonzero(report.kg_sold)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Sales report, last {days} days",
+            "days": days,
+            "report": report,
+            "daily": zip(report.dates.tolist(), report.revenue.tolist()),
+            "best_sellers": report.rows(sold[report.top(report.kg_sold[sold], 20)]),
+            "running_out": report.rows(
+                sold[report.top(report.days_of_stock[sold], 20, ascending=True)]
+            ),
+        }
+        return TemplateResponse(request, "admin/cart/order/report.html", context)
+
+
+class DailySalesAdmin(admin.ModelAdmin):
+    """Class to browse the daily sales rollups of each product."""
+
+    list_display = ("day", "product", "kg_sold", "revenue")
+    list_select_related = ("product",)
+    date_hierarchy = "day"
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
+class OpenAlertFilter(admin.SimpleListFilter):
+    """Filter stock alerts by whether they are still open."""
+
+    title = "status"
+    parameter_name = "open"
+
+    def lookups(self, request, model_admin):
+        return [("1", "Open"), ("0", "Resolved")]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(resolved__isnull=self.value() == "1")
+
+
+class StockAlertAdmin(admin.ModelAdmin):
+    """Class to list the stock alerts raised for products."""
+
+    list_display = (
+        "product",
+        "level",
+        "quantity_available",
+        "threshold",
+        "created",
+        "resolved",
+    )
+    list_filter = (OpenAlertFilter, "level")
+    list_select_related = ("product",)
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
+class StockMovementAdmin(admin.ModelAdmin):
+    """Class to audit the inventory ledger, which is only ever appended to."""
+
+    # Ids: movements outlive the products and orders they refer to.
+    list_display = ("created", "product_id", "kind", "quantity", "order_id")
+    list_filter = ("kind",)
+    search_fields = ("=product__id",)
+    date_hierarchy = "created"
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        return False
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """Class to inspect queued and failed background tasks, and run them again."""
+
+    list_display = ("name", "args", "status", "attempts", "run_after", "created")
+    list_filter = ("status", "name")
+    readonly_fields = [field.name for field in Task._meta.fields]
+    actions = ("run_again",)
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    @admin.action(description="Run selected tasks again")
+    def run_again(self, request, queryset) -> None:
+        # Pending duplicates make the unique pending key refuse the update.
+        queryset = queryset.exclude(status=Task.PENDING).exclude(
+            key__in=Task.objects.filter(status=Task.PENDING).values("key")
+        )
+        try:
+            with transaction.atomic():
+                count = queryset.update(
+                    status=Task.PENDING,
+                    attempts=0,
+                    run_after=timezone.now(),
+                    locked_by="",
+                )
+        except IntegrityError:
+            self.message_user(
+                request, "Select only one of identical tasks.", messages.ERROR
+            )
+            return
+        transaction.on_commit(taskqueue.wake)
+        self.message_user(request, f"{count} tasks queued to run again.")
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Class to list captured request profiles and download them."""
+
+    list_display = ("created", "method", "route", "duration_ms", "queries", "download")
+    list_filter = ("method", "route")
+    search_fields = ("path",)
+    exclude = ("stats", "sql_timeline")
+    readonly_fields = (
+        "created",
+        "method",
+        "route",
+        "path",
+        "duration_ms",
+        "download",
+        "timeline",
+        "summary",
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("stats", "summary")
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def queries(self, obj) -> int:
+        return len(obj.sql_timeline)
+
+    def timeline(self, obj) -> str:
+        return format_html(
+            "<pre>{}</pre>",
+            "\n".join(
+                f"{start:>10.3f}ms {duration:>9.3f}ms  {sql}"
+                for start, duration, sql in obj.sql_timeline
+            ),
+        )
+
+    timeline.short_description = "SQL timeline (start, duration, query)"
+
+    def download(self, obj) -> str:
+        url = reverse("admin:cart_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">.prof</a>', url)
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="cart_requestprofile_download",
+            )
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, pk) -> HttpResponse:
+        """Return the pstats file of a profile."""
+        profile = self.get_object(request, pk)
+        if profile is None or not self.has_view_permission(request, profile):
+            return self._get_obj_does_not_exist_redirect(
+                request, self.model._meta, str(pk)
+            )
+        response = HttpResponse(
+            bytes(profile.stats), content_type="application/octet-stream"
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{profile.route}-{profile.pk}.prof"'
+        return response
 
 
 admin.site.register(Product, ProductAdmin)
+admin.site.register(Order, OrderAdmin)
+admin.site.register(DailySales, DailySalesAdmin)
+admin.site.register(StockAlert, StockAlertAdmin)
+admin.site.register(StockMovement, StockMovementAdmin)
+admin.site.register(Task, TaskAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
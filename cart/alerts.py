@@ -0,0 +1,113 @@
+"""Low stock alerts, evaluated only for the products whose stock just changed.
+
+Checkout calls `evaluate` with the products it sold, and saving a single Product
+(e.g. in the admin) does the same through a post_save handler, so the cost of
+alerting follows the number of stock changes rather than the size of the catalog.
+"""
+import logging
+from typing import Iterable, Optional
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from cart.models import Product, StockAlert
+from shoply import metrics
+
+
+logger = logging.getLogger(__name__)
+
+metrics.register(
+    "shoply_stock_alerts_total",
+    "counter",
+    "Stock alerts raised, by level (low or out).",
+)
+
+
+def level_for(quantity: int, threshold: int) -> Optional[str]:
+    """Return the alert level for a product with `quantity` kg left, if any."""
+    if quantity <= 0:
+        return StockAlert.OUT
+    if quantity <= threshold:
+        return StockAlert.LOW
+    return None
+
+
+def evaluate(product_ids: Iterable[int]) -> None:
+    """Open, escalate, update or resolve the alerts of the given products."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+
+    stock = Product.objects.filter(pk__in=product_ids).values_list(
+        "pk", "name", "quantity_available", "low_stock_threshold"
+    )
+    open_alerts = {
+        alert.product_id: alert
+        for alert in StockAlert.objects.filter(
+            product_id__in=product_ids, resolved__isnull=True
+        )
+    }
+
+    now = timezone.now()
+    new, changed = [], []
+    for pk, name, quantity, threshold in stock:
+        if threshold is None:
+            threshold = settings.LOW_STOCK_THRESHOLD
+        level = level_for(quantity, threshold)
+        alert = open_alerts.get(pk)
+
+        if level is None:
+            if alert is not None:
+                alert.resolved = now
+                changed.append(alert)
+            continue
+
+        if alert is None or alert.level != level:
+            # A new alert, or an escalation from low to out of stock (or back).
+            metrics.inc("shoply_stock_alerts_total", level=level)
+            logger.info(
+                "%s: %s has %skg left (threshold %skg)",
+                dict(StockAlert.LEVELS)[level],
+                name,
+                quantity,
+                threshold,
+            )
+        if alert is None:
+            new.append(
+                StockAlert(
+                    product_id=pk,
+                    level=level,
+                    quantity_available=quantity,
+                    threshold=threshold,
+                    created=now,
+                )
+            )
+        elif (alert.level, alert.quantity_available, alert.threshold) != (
+            level,
+            quantity,
+            threshold,
+        ):
+            alert.level = level
+            alert.quantity_available = quantity
+            alert.threshold = threshold
+            changed.append(alert)
+
+    if new:
+        StockAlert.objects.bulk_create(new)
+    if changed:
+        StockAlert.objects.bulk_update(
+            changed, ["level", "quantity_available", "threshold", "resolved"]
+        )
+
+
+@receiver(post_save, sender=Product, dispatch_uid="cart.alerts.product_saved")
+def product_saved(sender, instance, update_fields=None, raw=False, **kwargs) -> None:
+    """Evaluate the alerts of a product saved on its own."""
+    if raw:
+        return
+    if update_fields is not None and not {
+        "quantity_available",
+        "low_stock_threshold",
+    }.intersection(update_fields):
+        return
+    evaluate([instance.pk])
@@ -0,0 +1,237 @@
+"""Sales and inventory analytics computed with NumPy over the whole catalog.
+
+Order lines and product stock are read in id ordered chunks of plain values (no model
+instances) into arrays, and every rollup is a handful of vectorized operations, so a
+report over millions of lines costs a few seconds of fetching rather than a Python
+loop per row. Reports are cached until a new order is placed.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import CharField, F, IntegerField, Max
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from cart.models import Order, OrderLine, Product
+
+
+CHUNK_SIZE = 50000
+
+DEFAULT_DAYS = 30
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass
+class Report:
+    """Rollups over the `days` days up to and including `end`.
+
+    `dates`/`revenue` hold one entry per day. The product arrays are aligned with
+    `product_ids`, which covers every product in the catalog.
+    """
+
+    days: int
+    end: datetime.date
+    dates: np.ndarray
+    revenue: np.ndarray
+    product_ids: np.ndarray
+    stock: np.ndarray
+    kg_sold: np.ndarray
+    sell_through: np.ndarray
+    days_of_stock: np.ndarray
+
+    @property
+    def total_revenue(self) -> int:
+        return int(self.revenue.sum())
+
+    def top(self, values: np.ndarray, n: int, ascending: bool = False) -> np.ndarray:
+        """Return the indexes of the `n` products with the largest (or smallest)
+        `values`, in order.
+        """
+        n = min(n, len(values))
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        order = values if ascending else -values
+        part = np.argpartition(order, n - 1)[:n]
+        return part[np.argsort(order[part], kind="stable")]
+
+    def rows(self, indexes: Sequence[int]) -> List[dict]:
+        """Return display rows, with product names, for the given product indexes."""
+        ids = [int(self.product_ids[i]) for i in indexes]
+        names = dict(Product.objects.filter(pk__in=ids).values_list("pk", "name"))
+        return [
+            {
+                "product_id": product_id,
+                "name": names.get(product_id, ""),
+                "stock": int(self.stock[i]),
+                "kg_sold": int(self.kg_sold[i]),
+                "sell_through": float(self.sell_through[i]),
+                "days_of_stock": float(self.days_of_stock[i]),
+            }
+            for product_id, i in zip(ids, indexes)
+        ]
+
+
+def _chunks(queryset: QuerySet, fields: Tuple[str, ...], chunk_size: int) -> Iterable:
+    """Yield the `fields` of the queryset's rows as lists of tuples, paging by id so
+    each chunk is a single indexed range query.
+
+    Rows come straight from the database cursor: Django's per-value converters would
+    cost more than everything else put together, so values are left as the driver
+    returns them and converted a column at a time instead.
+    """
+    last = 0
+    while True:
+        chunk = queryset.filter(pk__gt=last).order_by("pk").values_list(*fields)
+        sql, params = chunk[:chunk_size].query.get_compiler(queryset.db).as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield rows
+
+
+def _timestamps(values: Sequence) -> np.ndarray:
+    """Convert stored UTC datetimes, as ISO 8601 strings (parsed natively by NumPy) or
+    datetime objects, to datetime64.
+    """
+    if values and not isinstance(values[0], str):
+        values = [
+            timezone.make_naive(value, datetime.timezone.utc)
+            if timezone.is_aware(value)
+            else value
+            for value in values
+        ]
+    return np.array(values, dtype="datetime64[us]")
+
+
+def columns(
+    queryset: QuerySet,
+    fields: Tuple[str, ...],
+    dtypes: Tuple[str, ...],
+    chunk_size: int = CHUNK_SIZE,
+) -> List[np.ndarray]:
+    """Read the `fields` of every row of the queryset into one array per field. The
+    first field must be the primary key, and annotations must come after model fields
+    (the order the database returns them in).
+    """
+    parts = [[] for _ in fields]
+    for rows in _chunks(queryset, fields, chunk_size):
+        for part, column, dtype in zip(parts, zip(*rows), dtypes):
+            if dtype.startswith("datetime64"):
+                part.append(_timestamps(column))
+            else:
+                part.append(np.array(column, dtype=dtype))
+    return [
+        np.concatenate(part) if part else np.empty(0, dtype=dtype)
+        for part, dtype in zip(parts, dtypes)
+    ]
+
+
+def compute(
+    days: int = DEFAULT_DAYS,
+    end: Optional[datetime.date] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Report:
+    """Compute the report for the `days` days up to `end` (default today)."""
+    end = end or timezone.localdate()
+    start = end - datetime.timedelta(days=days - 1)
+    midnight = datetime.time()
+
+    product_ids, stock = columns(
+        Product.objects.all(),
+        ("pk", "quantity_available"),
+        ("int64", "int64"),
+        chunk_size,
+    )
+    # Local midnights from the start of the period to the day after its end.
+    midnights = [
+        timezone.make_aware(
+            datetime.datetime.combine(start + datetime.timedelta(days=n), midnight)
+        )
+        for n in range(days + 1)
+    ]
+    lines = OrderLine.objects.filter(
+        created__gte=midnights[0], created__lt=midnights[-1]
+    ).annotate(
+        # Lines whose product was removed have no product id; 0 matches no product.
+        product_key=Coalesce("product_id", 0, output_field=IntegerField()),
+        # SQLite stores the text NumPy parses; its driver would parse each value first.
+        created_at=(
+            Cast("created", CharField())
+            if connections[OrderLine.objects.db].vendor == "sqlite"
+            else F("created")
+        ),
+    )
+    _, quantity, price, line_products, created = columns(
+        lines,
+        ("pk", "quantity", "price_per_kg", "product_key", "created_at"),
+        ("int64", "int64", "int64", "int64", "datetime64[us]"),
+        chunk_size,
+    )
+
+    # Daily revenue, with a zero for days without sales. Each line falls on the day
+    # of the last local midnight before it, which holds across DST changes too.
+    dates = np.arange(
+        np.datetime64(start, "D"), np.datetime64(end, "D") + 1, dtype="datetime64[D]"
+    )
+    utc_midnights = np.array(
+        [timezone.make_naive(m, datetime.timezone.utc) for m in midnights],
+        dtype="datetime64[us]",
+    )
+    revenue = np.bincount(
+        np.searchsorted(utc_midnights, created, side="right") - 1,
+        weights=quantity * price,
+        minlength=days,
+    ).astype(np.int64)
+
+    # kg sold per product; lines of products since removed from the catalog are
+    # dropped. Product ids come back sorted, so a binary search finds each index.
+    known = np.isin(line_products, product_ids)
+    kg_sold = np.bincount(
+        np.searchsorted(product_ids, line_products[known]),
+        weights=quantity[known],
+        minlength=len(product_ids),
+    ).astype(np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Share of the stock available over the period that was sold.
+        sell_through = np.nan_to_num(kg_sold / (kg_sold + stock))
+        # Days left at the period's average daily sales; inf for unsold products.
+        days_of_stock = np.where(kg_sold > 0, stock / (kg_sold / days), np.inf)
+
+    return Report(
+        days=days,
+        end=end,
+        dates=dates,
+        revenue=revenue,
+        product_ids=product_ids,
+        stock=stock,
+        kg_sold=kg_sold,
+        sell_through=sell_through,
+        days_of_stock=days_of_stock,
+    )
+
+
+def report(days: int = DEFAULT_DAYS) -> Report:
+    """Return the report for the last `days` days, computing it only when an order
+    has been placed (or the day has changed) since it was last computed.
+    """
+    # One entry per period, overwritten when stale: a report is the size of the
+    # catalog, so reports of earlier orders mustn't pile up in the cache.
+    key = f"cart:analytics:{days}"
+    version = (
+        timezone.localdate(),
+        Order.objects.aggregate(last=Max("pk"))["last"] or 0,
+    )
+    cached = cache.get(key)
+    if cached is not None and cached[:2] == version:
+        return cached[2]
+    result = compute(days)
+    cache.set(key, (*version, result), CACHE_TIMEOUT)
+    return result
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cart"
+
+    def ready(self) -> None:
+        # Connect the signal handlers that keep the stock alerts, the stock ledger, the
+        # inventory snapshot and the change feed up to date, and register the
+        # background tasks.
+        from cart import alerts, feed, inventory, ledger, tasks  # noqa: F401
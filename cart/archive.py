@@ -0,0 +1,102 @@
+"""Archival of old orders into compressed, per-month partition files.
+
+Each partition is a gzipped JSON Lines file with one order, and its lines, per line:
+
+    {"id": 1, "created": "2021-09-24T00:20:00+00:00", "total": 30,
+     "lines": [[product_id, product_name, quantity, price_per_kg], ...]}
+
+Orders are written and deleted a batch at a time, and a batch is only deleted once
+its file has been synced. An interrupted run may leave a batch in both places, so
+`read` skips orders it has already returned.
+"""
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+from django.db import router, transaction
+from cart.models import Order, OrderLine
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+LINE_FIELDS = ("product_id", "product_name", "quantity", "price_per_kg")
+
+
+def partition_path(directory: Union[str, Path], created: datetime.datetime) -> Path:
+    """Return the file holding the orders of the month `created` falls in."""
+    return Path(directory) / f"orders-{created:%Y-%m}.jsonl.gz"
+
+
+def archive(
+    before: datetime.datetime,
+    directory: Union[str, Path],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    using: Optional[str] = None,
+) -> Dict[str, int]:
+    """Move the orders created before `before` from the database into `directory`."""
+    using = using or router.db_for_write(Order)
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    counts = {"orders": 0, "lines": 0}
+
+    while True:
+        with transaction.atomic(using=using):
+            orders = list(
+                Order.objects.using(using)
+                .filter(created__lt=before)
+                .order_by("id")
+                .values("id", "created", "total")[:batch_size]
+            )
+            if not orders:
+                return counts
+
+            ids = [order["id"] for order in orders]
+            lines = defaultdict(list)
+            for line in (
+                OrderLine.objects.using(using)
+                .filter(order_id__in=ids)
+                .order_by("id")
+                .values_list("order_id", *LINE_FIELDS)
+            ):
+                lines[line[0]].append(line[1:])
+
+            partitions = defaultdict(list)
+            for order in orders:
+                record = {
+                    "id": order["id"],
+                    "created": order["created"].isoformat(),
+                    "total": order["total"],
+                    "lines": lines[order["id"]],
+                }
+                path = partition_path(directory, order["created"])
+                partitions[path].append(json.dumps(record, separators=(",", ":")))
+
+            for path, records in partitions.items():
+                # Appending adds a gzip member; readers see a single stream.
+                with gzip.open(path, "at", encoding="utf-8") as f:
+                    f.write("\n".join(records) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            OrderLine.objects.using(using).filter(order_id__in=ids).delete()
+            Order.objects.using(using).filter(id__in=ids).delete()
+
+        counts["orders"] += len(orders)
+        counts["lines"] += sum(len(order_lines) for order_lines in lines.values())
+
+
+def read(directory: Union[str, Path]) -> Iterator[Dict]:
+    """Yield every archived order, oldest partition first."""
+    seen = set()
+    for path in sorted(Path(directory).glob("orders-*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for row in f:
+                record = json.loads(row)
+                if record["id"] in seen:
+                    continue
+                seen.add(record["id"])
+                record["created"] = datetime.datetime.fromisoformat(record["created"])
+                record["lines"] = [dict(zip(LINE_FIELDS, l)) for l in record["lines"]]
+                yield record
@@ -0,0 +1,277 @@
+"""End-to-end benchmarks of the cart routes at configurable catalog and cart sizes."""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from cart import synthetic
+from cart.models import Cart, Product
+from shoply.middleware import QueryTimer
+
+
+# Fields identifying a result; the rest are measurements.
+KEY_FIELDS = ("route", "method", "products", "cart_lines")
+
+
+def checkout_data() -> Dict[str, object]:
+    """POST data buying every line of the cart."""
+    ids = list(Cart.objects.values_list("id", flat=True))
+    data = {
+        "form-TOTAL_FORMS": len(ids),
+        "form-INITIAL_FORMS": len(ids),
+        "form-MIN_NUM_FORMS": 0,
+        "form-MAX_NUM_FORMS": settings.CART_MAX_LINES,
+    }
+    data.update({f"form-{i}-id": pk for i, pk in enumerate(ids)})
+    return data
+
+
+Builder = Callable[[], Tuple[str, Optional[dict]]]
+
+
+def scenarios() -> List[Tuple[str, str, Builder, Optional[str]]]:
+    """Return (route, method, request builder, redirect) for every cart route.
+
+    Builders run before each timed request and return its URL and POST data. A POST
+    is expected to redirect to `redirect` (a form with errors would answer 200), a GET
+    to answer 200.
+    """
+
+    def first_item() -> Cart:
+        return Cart.objects.order_by("id").first()
+
+    def product_not_in_cart() -> Product:
+        return Product.objects.filter(cart__isnull=True, quantity_available__gt=0)[0]
+
+    cart_list = reverse("cart-list")
+    return [
+        ("cart-list", "GET", lambda: (cart_list, None), None),
+        (
+            "cart-list",
+            "POST",
+            lambda: (cart_list, checkout_data()),
+            reverse("checkout-success"),
+        ),
+        ("create-cart-item", "GET", lambda: (reverse("create-cart-item"), None), None),
+        (
+            "create-cart-item",
+            "POST",
+            lambda: (
+                reverse("create-cart-item"),
+                {"product": product_not_in_cart().id, "purchase_quantity": 1},
+            ),
+            cart_list,
+        ),
+        (
+            "update-cart-item",
+            "GET",
+            lambda: (reverse("update-cart-item", args=[first_item().id]), None),
+            None,
+        ),
+        (
+            "update-cart-item",
+            "POST",
+            lambda: (
+                reverse("update-cart-item", args=[first_item().id]),
+                {"purchase_quantity": 1},
+            ),
+            cart_list,
+        ),
+        (
+            "delete-cart-item",
+            "GET",
+            lambda: (reverse("delete-cart-item", args=[first_item().id]), None),
+            None,
+        ),
+        (
+            "delete-cart-item",
+            "POST",
+            lambda: (reverse("delete-cart-item", args=[first_item().id]), {}),
+            cart_list,
+        ),
+        (
+            "checkout-success",
+            "GET",
+            lambda: (reverse("checkout-success"), None),
+            None,
+        ),
+    ]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run_request(
+    client: Client, method: str, url: str, data, redirect: Optional[str] = None
+) -> Tuple[float, int, int]:
+    """Make one request whose writes are rolled back; return its time to last byte,
+    queries and size on the wire.
+
+    Raises RuntimeError unless a GET answered 200 and a POST redirected to `redirect`:
+    a page of form errors is fast, and would be timed as if the POST had succeeded.
+    """
+    timer = QueryTimer()
+    with transaction.atomic():
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            start = time.perf_counter()
+            if method == "GET":
+                response = client.get(url)
+            else:
+                response = client.post(url, data)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+
+    if method == "GET" and response.status_code != 200:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}")
+    if method != "GET" and (
+        response.status_code != 302 or response["Location"] != redirect
+    ):
+        raise RuntimeError(
+            f"{method} {url} returned {response.status_code}, "
+            f"expected a redirect to {redirect}"
+        )
+    return elapsed, timer.count, size
+
+
+def run(
+    sizes: List[Tuple[int, int]],
+    iterations: int,
+    seed: int = 0,
+    accept_encoding: str = "gzip, deflate, br",
+) -> List[dict]:
+    """Benchmark every scenario at each (products, cart_lines) size, with requests
+    sending `accept_encoding` as their Accept-Encoding header.
+    """
+    client = Client(HTTP_ACCEPT_ENCODING=accept_encoding)
+    results = []
+
+    for products, cart_lines in sizes:
+        synthetic.generate(products, cart_lines, seed=seed, clear=True)
+        # Drop the lines stock can't cover, so the checkout POST succeeds.
+        Cart.objects.filter(
+            purchase_quantity__gt=F("product__quantity_available")
+        ).delete()
+
+        for route, method, build, redirect in scenarios():
+            url, data = build()
+            # Warm up caches and lazily built objects before timing.
+            run_request(client, method, url, data, redirect)
+
+            latencies = []
+            for _ in range(iterations):
+                url, data = build()
+                elapsed, queries, size = run_request(
+                    client, method, url, data, redirect
+                )
+                latencies.append(elapsed * 1000)
+
+            tracemalloc.start()
+            run_request(client, method, url, data, redirect)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results.append(
+                {
+                    "route": route,
+                    "method": method,
+                    "products": products,
+                    "cart_lines": cart_lines,
+                    "p50_ms": round(percentile(latencies, 0.5), 3),
+                    "p90_ms": round(percentile(latencies, 0.9), 3),
+                    "p99_ms": round(percentile(latencies, 0.99), 3),
+                    "mean_ms": round(statistics.mean(latencies), 3),
+                    "queries": queries,
+                    "peak_kib": round(peak / 1024, 1),
+                    "bytes": size,
+                }
+            )
+
+    return results
+
+
+def checkout_render(
+    sizes: List[Tuple[int, int]], iterations: int, seed: int = 0
+) -> List[dict]:
+    """Time the checkout page's view and template rendering (without middleware) at
+    each (products, cart_lines) size, with its rows rendered by the forms' as_p and
+    by cart.rendering.
+    """
+    # Imported here: the views pull in the forms and their querysets.
+    from cart.views import CartCheckOutView
+
+    factory = RequestFactory()
+    results = []
+
+    for products, cart_lines in sizes:
+        synthetic.generate(products, cart_lines, seed=seed, clear=True)
+        for path, fast_rows in (("forms", False), ("rows", True)):
+            view = CartCheckOutView.as_view(fast_rows=fast_rows)
+            latencies = []
+            # The first render warms up caches and is not counted.
+            for _ in range(iterations + 1):
+                request = factory.get(reverse("cart-list"))
+                start = time.perf_counter()
+                view(request).render()
+                latencies.append((time.perf_counter() - start) * 1000)
+            p50 = percentile(latencies[1:], 0.5)
+            results.append(
+                {
+                    "path": path,
+                    "products": products,
+                    "cart_lines": cart_lines,
+                    "p50_ms": round(p50, 3),
+                    "per_row_us": round(p50 * 1000 / max(cart_lines, 1), 1),
+                }
+            )
+
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Return a description of every regression against the baseline.
+
+    Latency (p50) and peak memory regress when they grow by more than `tolerance`
+    (a fraction); query counts regress on any increase.
+    """
+    previous = {tuple(r[f] for f in KEY_FIELDS): r for r in baseline}
+    regressions = []
+
+    for result in results:
+        key = tuple(result[f] for f in KEY_FIELDS)
+        base = previous.get(key)
+        if base is None:
+            continue
+        name = "{1} {0} ({2} products, {3} lines)".format(*key)
+        for field in ("p50_ms", "peak_kib"):
+            if result[field] > base[field] * (1 + tolerance):
+                regressions.append(f"{name}: {field} {base[field]} -> {result[field]}")
+        if result["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: queries {base['queries']} -> {result['queries']}"
+            )
+
+    return regressions
+
+
+def load(path) -> List[dict]:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def dump(path, results: List[dict], meta: dict) -> None:
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
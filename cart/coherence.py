@@ -0,0 +1,191 @@
+"""Cache coherence across the worker processes of a deployment, without a broker.
+
+Process-local caches (like the inventory snapshot) register a handler for their
+namespace. A process changing cached data calls `invalidate(namespace, keys)`; once
+its transaction commits, a line naming the namespace and the changed keys is appended
+to a log file shared by every worker (CACHE_INVALIDATION_LOG). At the start of each
+request a worker stats that file, which costs microseconds. Only when it has grown
+does the worker read the new lines and pass their keys to the handlers, so a change
+reaches every worker by its next request.
+
+The log is started afresh, as a new file, once it grows past
+CACHE_INVALIDATION_LOG_MAX_BYTES; a worker that sees a new file can't know what it
+missed and drops its caches entirely.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Optional[List]], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+
+def register(namespace: str, handler: Handler) -> None:
+    """Call `handler` with the keys of the records other processes change in a
+    namespace, or with None when all of its records may have changed.
+    """
+    if reader.path is None:
+        # Changes logged from now on concern what the handler may go on to cache.
+        reader.start()
+    _handlers[namespace].append(handler)
+
+
+_origin = (None, "")
+
+
+def origin() -> str:
+    """Return an id of this process (a forked worker gets its own)."""
+    global _origin
+    if _origin[0] != os.getpid():
+        _origin = (os.getpid(), uuid.uuid4().hex)
+    return _origin[1]
+
+
+def _header() -> bytes:
+    # Identifies a log: inode numbers are reused once a log is replaced.
+    return (json.dumps({"log": uuid.uuid4().hex}) + "\n").encode()
+
+
+def _append(message: dict) -> None:
+    path = str(settings.CACHE_INVALIDATION_LOG)
+    line = (json.dumps(message) + "\n").encode()
+    while True:
+        with open(path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                    # Another process started a new log since this one was opened.
+                    continue
+            except FileNotFoundError:
+                continue
+            if f.tell() == 0:
+                f.write(_header())
+            f.write(line)
+            f.flush()
+            if f.tell() > settings.CACHE_INVALIDATION_LOG_MAX_BYTES:
+                fresh = f"{path}.{origin()}"
+                with open(fresh, "wb") as new:
+                    new.write(_header())
+                os.replace(fresh, path)
+            return
+
+
+def invalidate(namespace: str, keys: Optional[Iterable] = None) -> None:
+    """Tell the other processes, once the current transaction commits, that the
+    records with `keys` (all of them if None) of a namespace changed.
+    """
+    message = {
+        "origin": origin(),
+        "namespace": namespace,
+        "keys": None if keys is None else list(keys),
+    }
+    transaction.on_commit(lambda: _append(message))
+
+
+class Reader:
+    """Where a process is in the log, and the handling of the lines it hasn't read."""
+
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self.log: Optional[bytes] = None
+        self.offset = 0
+        self.seen: Optional[Tuple[int, int, int]] = None
+        self.lock = threading.Lock()
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def start(self) -> None:
+        """Start from the end of the log: there is nothing cached before that."""
+        self.path = str(settings.CACHE_INVALIDATION_LOG)
+        self.log, self.offset, self.seen = None, 0, None
+        try:
+            with open(self.path, "rb") as f:
+                self.log = f.readline()
+                self.offset = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            pass
+
+    def check(self) -> None:
+        """Apply the lines other processes have appended since the last check."""
+        if self.path != str(settings.CACHE_INVALIDATION_LOG):
+            with self.lock:
+                self.start()
+            _dispatch({namespace: None for namespace in _handlers})
+            return
+
+        seen = self._stat()
+        if seen is None or seen == self.seen:
+            return
+        with self.lock:
+            self.seen = seen
+            changes = self._read()
+        _dispatch(changes)
+
+    def _read(self) -> Dict[str, Optional[set]]:
+        with open(self.path, "rb") as f:
+            log = f.readline()
+            if not log.endswith(b"\n"):
+                return {}
+            if self.log is None:
+                # The first log: nothing was written before it.
+                self.log, self.offset = log, len(log)
+            elif log != self.log:
+                # A new log: whatever was logged at the end of the previous one is
+                # lost.
+                self.log, self.offset = log, f.seek(0, os.SEEK_END)
+                return {namespace: None for namespace in _handlers}
+            f.seek(self.offset)
+            data = f.read()
+        # A line still being written is left for the next check.
+        data = data[: data.rfind(b"\n") + 1]
+        self.offset += len(data)
+
+        changes: Dict[str, Optional[set]] = {}
+        own = origin()
+        for line in data.splitlines():
+            message = json.loads(line)
+            namespace = message["namespace"]
+            if message["origin"] == own or namespace not in _handlers:
+                continue
+            if message["keys"] is None or changes.get(namespace, set()) is None:
+                changes[namespace] = None
+            else:
+                changes.setdefault(namespace, set()).update(message["keys"])
+        return changes
+
+
+def _dispatch(changes: Dict[str, Optional[set]]) -> None:
+    for namespace, keys in changes.items():
+        for handler in _handlers[namespace]:
+            try:
+                handler(None if keys is None else sorted(keys))
+            except Exception:
+                logger.exception("Invalidating the %s cache failed", namespace)
+
+
+reader = Reader()
+
+
+@receiver(request_started, dispatch_uid="cart.coherence.check")
+def check(**kwargs) -> None:
+    """Bring this process's caches up to date with the changes of the others."""
+    if reader.path is not None:
+        reader.check()
@@ -1,10 +1,12 @@
 """Module to initialize the Database with Product and Cart records."""
-from django.db.utils import OperationalError
 from cart.models import Product, Cart
 
 
-def initialize_database():
-    """Initialze the database with Product and Cart objects."""
+def initialize_database() -> bool:
+    """Initialze the database with Product and Cart objects.
+
+    Safe to call repeatedly; returns True only when the seed records were created.
+    """
     potatoes, created = Product.objects.get_or_create(
         name="Potatoes", defaults={"quantity_available": 10, "price_per_kg": 5}
     )
@@ -32,10 +34,6 @@ def initialize_database():
             product=onions,
             defaults={"purchase_quantity": 1, "price_per_kg": onions.price_per_kg},
         )
+        return True
 
-
-try:
-    print("Initializing Database...")
-    initialize_database()
-except OperationalError as e:
-    pass
+    return False
@@ -0,0 +1,160 @@
+"""The stock event stream: Server-Sent Events pushing the stock and price changes of
+the products in the cart (cart.feed) to the checkout page.
+
+Django 3.2 iterates a streaming response synchronously, which would hold an ASGI
+worker's event loop for as long as the stream stays open, so the stream is served by
+a small ASGI application of its own, which shoply.asgi puts in front of Django's.
+Under WSGI the cart-events view answers 204, which tells EventSource clients not to
+reconnect.
+
+A stream starts with the current values of its products, so a client that reconnects
+has nothing to replay.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import reverse
+from cart import coherence, feed
+from cart.models import Cart
+
+
+# Database reads for the streams, and checks of the invalidation log, run on a thread
+# of their own (with a connection of its own) off the event loop.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cart-events")
+
+
+async def run_sync(function, *args):
+    def call():
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
+
+
+def format_event(deltas: feed.Deltas) -> bytes:
+    """Return a stock event: {"product id": [quantity, price] or null, ...}."""
+    data = json.dumps(deltas, separators=(",", ":"))
+    return f"event: stock\ndata: {data}\n\n".encode()
+
+
+def parse_products(query_string: bytes):
+    """Return the product ids of a ?products=1,2 query, [] if there is none, or None
+    if it is invalid.
+    """
+    values = parse_qs(query_string.decode("latin-1")).get("products")
+    if not values:
+        return []
+    try:
+        return [int(pk) for pk in values[-1].split(",") if pk]
+    except ValueError:
+        return None
+
+
+def cart_products():
+    return list(Cart.objects.values_list("product_id", flat=True))
+
+
+class EventStreams:
+    """ASGI application serving the stock event stream at the cart-events URL, and
+    passing every other request on to `app`.
+
+    The stream covers the products in ?products=, or else those in the cart.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.path = reverse("cart-events")
+        self.poller = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] == self.path:
+            await self.stream(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def stream(self, scope, receive, send) -> None:
+        if scope["method"] != "GET":
+            await self.respond(send, 405, b"Method Not Allowed", [(b"allow", b"GET")])
+            return
+        product_ids = parse_products(scope["query_string"])
+        if product_ids is None:
+            await self.respond(send, 400, b"Invalid products")
+            return
+
+        subscription = feed.broadcaster.subscribe(product_ids)
+        disconnected = asyncio.ensure_future(self.disconnect(receive))
+        try:
+            if not product_ids:
+                subscription.product_ids = set(await run_sync(cart_products))
+            self.start_polling()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        # Keeps nginx from buffering the events.
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            # Changes published from now on are sent after these values.
+            initial = await run_sync(feed.current, subscription.product_ids)
+            body = b"retry: %d\n\n" % settings.EVENTS_RETRY_MS + format_event(initial)
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+
+            while True:
+                waiting = asyncio.ensure_future(
+                    subscription.next(settings.EVENTS_HEARTBEAT_SECONDS)
+                )
+                await asyncio.wait(
+                    {waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected.done():
+                    waiting.cancel()
+                    return
+                deltas = waiting.result()
+                # A comment line when nothing changed, so proxies keep it open.
+                body = format_event(deltas) if deltas else b":\n\n"
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": True}
+                )
+        finally:
+            disconnected.cancel()
+            feed.broadcaster.unsubscribe(subscription)
+
+    async def disconnect(self, receive) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def respond(self, send, status: int, body: bytes, headers=()) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/plain"), *headers],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    def start_polling(self) -> None:
+        if (
+            self.poller is None
+            or self.poller.done()
+            or self.poller.get_loop() is not asyncio.get_running_loop()
+        ):
+            self.poller = asyncio.ensure_future(self.poll())
+
+    async def poll(self) -> None:
+        """Pick up the changes of other processes (cart.coherence) while streams are
+        open; the process may serve no other requests that would check for them.
+        """
+        while feed.broadcaster.subscriptions:
+            await run_sync(coherence.check)
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
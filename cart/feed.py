@@ -0,0 +1,142 @@
+"""A feed of stock and price changes, fanned out to the subscribers of this process.
+
+Product saves and deletes and checkouts' bulk stock changes are published once they
+commit; changes made by other processes arrive through cart.coherence. A delta maps a
+product id to its [quantity_available, price_per_kg], or to None once the product is
+deleted, and is read from the database only while the process has subscribers, so
+processes that serve no event streams (cart.events) pay nothing for the feed.
+
+Each subscription keeps the latest values of its products that it hasn't taken yet:
+a slow subscriber gets one merged delta instead of a backlog.
+"""
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from cart import coherence
+from cart.models import Product
+from cart.signals import stock_changed
+from shoply import metrics
+
+
+Deltas = Dict[int, Optional[List[int]]]
+
+metrics.register(
+    "shoply_event_subscribers", "gauge", "Open stock event streams in this process."
+)
+
+
+class Subscription:
+    """The deltas of some products waiting for one subscriber, in its event loop."""
+
+    def __init__(self, product_ids: Iterable[int], loop) -> None:
+        self.product_ids: Set[int] = set(product_ids)
+        self.loop = loop
+        self.pending: Deltas = {}
+        self.ready = asyncio.Event()
+        self.lock = threading.Lock()
+
+    def offer(self, deltas: Deltas) -> None:
+        """Queue the deltas of this subscription's products; callable from any thread."""
+        relevant = {pk: v for pk, v in deltas.items() if pk in self.product_ids}
+        if not relevant:
+            return
+        with self.lock:
+            self.pending.update(relevant)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # The subscriber's event loop is closed.
+            pass
+
+    async def next(self, timeout: float) -> Deltas:
+        """Wait up to `timeout` seconds for deltas; return them ({} if none came)."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.lock:
+            deltas, self.pending = self.pending, {}
+            self.ready.clear()
+        return deltas
+
+
+class Broadcaster:
+    """The subscriptions of this process, and the publishing of deltas to them."""
+
+    def __init__(self) -> None:
+        self.subscriptions: Set[Subscription] = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self, product_ids: Iterable[int]) -> Subscription:
+        """Subscribe to the deltas of some products; call it in the event loop."""
+        subscription = Subscription(product_ids, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.add(subscription)
+            metrics.set_gauge("shoply_event_subscribers", len(self.subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            self.subscriptions.discard(subscription)
+            metrics.set_gauge("shoply_event_subscribers", len(self.subscriptions))
+
+    def product_ids(self) -> Set[int]:
+        """Return the products any subscription is interested in."""
+        with self.lock:
+            return set().union(*(s.product_ids for s in self.subscriptions))
+
+    def publish(self, deltas: Deltas) -> None:
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(deltas)
+
+
+broadcaster = Broadcaster()
+
+
+def current(product_ids: Iterable[int]) -> Deltas:
+    """Return the current values of some products, None for the ones deleted."""
+    product_ids = list(product_ids)
+    rows = Product.objects.filter(pk__in=product_ids).values_list(
+        "pk", "quantity_available", "price_per_kg"
+    )
+    deltas: Deltas = dict.fromkeys(product_ids)
+    deltas.update({pk: [quantity, price] for pk, quantity, price in rows})
+    return deltas
+
+
+def refresh(product_ids: Optional[Iterable[int]]) -> None:
+    """Publish the current values of changed products (None: of every product)."""
+    wanted = broadcaster.product_ids()
+    if product_ids is not None:
+        wanted &= set(product_ids)
+    if wanted:
+        broadcaster.publish(current(wanted))
+
+
+coherence.register("inventory", refresh)
+
+
+def _refresh_on_commit(product_ids: List[int]) -> None:
+    if broadcaster.subscriptions:
+        transaction.on_commit(lambda: refresh(product_ids))
+
+
+@receiver(post_save, sender=Product, dispatch_uid="cart.feed.product_saved")
+def product_saved(sender, instance, raw=False, **kwargs) -> None:
+    if not raw:
+        _refresh_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="cart.feed.product_deleted")
+def product_deleted(sender, instance, **kwargs) -> None:
+    _refresh_on_commit([instance.pk])
+
+
+@receiver(stock_changed, dispatch_uid="cart.feed.stock_changed")
+def stock_changed_in_bulk(sender, changes: Dict[int, int], **kwargs) -> None:
+    _refresh_on_commit(list(changes))
@@ -1,12 +1,17 @@
 """Form Classes to be used by some by the views Classes, based on models."""
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models.query import QuerySet
+from django.forms.models import BaseModelFormSet
 from django.forms.utils import ErrorList
 from django.forms.widgets import HiddenInput
 from django.http.request import QueryDict
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from django.utils.translation import gettext as _
-from .models import Product, Cart
+from . import inventory, ledger
+from .models import Product, Cart, Order, StockMovement
 
 
 # labels for checkout form
@@ -15,22 +20,74 @@ name = "Product Name"
 quantity = "Quantity (kg)"
 
 
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField that resolves values found in `preloaded` (pk -> object)
+    without a query, and falls back to its queryset for anything else.
+    """
+
+    def __init__(self, queryset, *, preloaded=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.preloaded = preloaded or {}
+
+    def to_python(self, value):
+        if value not in self.empty_values:
+            try:
+                return self.preloaded[int(getattr(value, "pk", value))]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_python(value)
+
+
+class ProductName(forms.Widget):
+    """Shows a cart line's product as its name, with its id in data-product for
+    scripts, instead of a <select> listing the whole catalog. Only for disabled
+    fields: nothing is submitted.
+    """
+
+    product_name = ""
+
+    def id_for_label(self, id_):
+        # A <span> isn't labelable.
+        return None
+
+    def render(self, name, value, attrs=None, renderer=None):
+        return format_html(
+            '<span id="{}" data-product="{}">{}</span>',
+            (attrs or {}).get("id", ""),
+            "" if value is None else value,
+            self.product_name,
+        )
+
+
 class CheckOutForm(forms.ModelForm):
     """Form Class for checking out of cart."""
 
     price_per_kg = forms.IntegerField(disabled=True, label=price)
-    product = forms.ModelChoiceField(
-        queryset=Product.objects.all(), disabled=True, label=name
+    product = PreloadedModelChoiceField(
+        queryset=Product.objects.all(), disabled=True, label=name, widget=ProductName
     )
-    purchase_quantity = forms.IntegerField(disabled=True, label=quantity)
+    # Editable on the checkout page; a POST without it keeps the cart's quantity.
+    purchase_quantity = forms.IntegerField(min_value=0, required=False, label=quantity)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.product_id is not None:
+            self.fields["product"].widget.product_name = self.instance.product.name
 
     def clean_purchase_quantity(self):
         """Ensures the purchase quantity is equal to or less than the value of quantity_available
         in corresponding Product record.
         """
         purchase_quantity = self.cleaned_data["purchase_quantity"]
-        quantity_available = self.cleaned_data["product"].quantity_available
-        product_name = self.cleaned_data["product"].name
+        if purchase_quantity is None:
+            purchase_quantity = self.instance.purchase_quantity
+        product = self.cleaned_data["product"]
+        # Looked up for the whole cart at once by CheckOutFormSet.
+        available = getattr(self, "available", None)
+        if available is None:
+            available = inventory.available([product.pk])
+        quantity_available = available.get(product.pk, product.quantity_available)
+        product_name = product.name
 
         if purchase_quantity > quantity_available:
             raise ValidationError(
@@ -45,24 +102,118 @@ class CheckOutForm(forms.ModelForm):
         return purchase_quantity
 
     def save(self) -> None:
-        """Remove item represented by this form from the cart, and update the Product
-        Invetory to reflect purchase.
+        """Remove item represented by this form from the cart, record it as an Order and
+        update the Product Invetory to reflect purchase.
         """
         cart_item = self.instance
-        product = cart_item.product
 
-        # update product in the inventory
-        product.quantity_available -= cart_item.purchase_quantity
-        product.save()
+        with transaction.atomic():
+            # keep the purchase in the order history
+            order = Order.place([cart_item])
+
+            # record the purchase in the inventory ledger
+            ledger.record(
+                StockMovement.PURCHASE,
+                {cart_item.product_id: -cart_item.purchase_quantity},
+                order=order,
+            )
+
+            # remove item from the cart
+            cart_item.delete()
 
-        # remove item from the cart
-        cart_item.delete()
+    def _get_validation_exclusions(self):
+        """Skip the per-row existence and uniqueness queries for the product; the
+        field is disabled, so it always holds the cart item's own product.
+        """
+        return super()._get_validation_exclusions() + ["product"]
 
     class Meta:
         model = Cart
         fields = ["product", "purchase_quantity", "price_per_kg"]
 
 
+class CheckOutFormSet(BaseModelFormSet):
+    """Formset for checking out the whole cart with a fixed number of queries,
+    whatever the number of items in it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("queryset", Cart.objects.select_related("product"))
+        super().__init__(*args, **kwargs)
+
+    def add_fields(self, form, index) -> None:
+        """Resolve the id and product of each form from the cart items already
+        loaded.
+        """
+        super().add_fields(form, index)
+
+        id_field = form.fields[self._pk_field.name]
+        form.fields[self._pk_field.name] = PreloadedModelChoiceField(
+            id_field.queryset,
+            preloaded=self.cart_items,
+            initial=id_field.initial,
+            required=False,
+            widget=id_field.widget,
+        )
+
+        form.fields["product"].preloaded = self.cart_products
+        form.available = self.available
+
+    @cached_property
+    def cart_items(self):
+        """The cart items by id, shared by every form."""
+        return {cart.pk: cart for cart in self.get_queryset()}
+
+    @cached_property
+    def cart_products(self):
+        """The products of the cart items by id, shared by every form."""
+        return {cart.product_id: cart.product for cart in self.cart_items.values()}
+
+    @cached_property
+    def available(self):
+        """The stock of every product in the cart, from the inventory snapshot."""
+        return inventory.available(self.cart_products)
+
+    def update_quantities(self) -> int:
+        """Save the purchase quantities changed on the checkout page, all with one bulk
+        update, and return how many there were. The stock of every line has already
+        been checked with one lookup while the formset was validated.
+        """
+        changed = [
+            form.instance
+            for form in self.forms
+            if form.cleaned_data["purchase_quantity"]
+            != form.initial["purchase_quantity"]
+        ]
+        if changed:
+            Cart.objects.bulk_update(changed, ["purchase_quantity"])
+        return len(changed)
+
+    def save(self, commit: bool = True) -> None:
+        """Check out every item: record them as one Order, record their purchase in the
+        inventory ledger (one insert, and one bulk update of the stock of all their
+        products) and remove them from the cart with one delete.
+
+        Raises inventory.OutOfStock, undoing everything, if the stock the items were
+        validated against has been sold meanwhile.
+        """
+        items = [form.instance for form in self.forms]
+        if not items:
+            return
+
+        changes = {item.product_id: -item.purchase_quantity for item in items}
+
+        with transaction.atomic():
+            order = Order.place(items)
+            ledger.record(StockMovement.PURCHASE, changes, order=order)
+            sold_out = Product.objects.filter(
+                pk__in=list(changes), quantity_available__lt=0
+            ).values_list("name", flat=True)
+            if sold_out:
+                raise inventory.OutOfStock(sorted(sold_out))
+            Cart.objects.filter(pk__in=[item.pk for item in items]).delete()
+
+
 """The Function below was mean't to filter the selection items of the CreatItemForm in the
 Product field to show only items that aren't in the Cart but are in the Product table,
 but somehow it doesn't seem to work as intended, because it isn't evaluated each time the 
@@ -116,8 +267,10 @@ class CreateItemForm(forms.ModelForm):
                     "purchase_quantity": int(data["purchase_quantity"]),
                 }
             product_id = data["product"]
-            product = Product.objects.get(pk=product_id)
-            data["price_per_kg"] = product.price_per_kg
+            price_per_kg = inventory.prices([product_id]).get(product_id)
+            if price_per_kg is None:
+                price_per_kg = Product.objects.get(pk=product_id).price_per_kg
+            data["price_per_kg"] = price_per_kg
 
         super().__init__(
             data=data,
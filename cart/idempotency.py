@@ -0,0 +1,89 @@
+"""Idempotency keys for write requests.
+
+The first response to a key is kept in the "idempotency" cache (a database table
+whose entries expire after the cache TIMEOUT), and a retry with the same key gets
+that response back without running the view again. A replay is a single read: only
+a key seen for the first time is written, which takes the database's write lock.
+"""
+import hashlib
+from typing import Optional, Union
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from shoply import metrics
+
+
+CACHE_ALIAS = "idempotency"
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+FIELD = "idempotency_key"
+
+# Stored, for IDEMPOTENCY_IN_FLIGHT_TIMEOUT seconds, while the first request for a
+# key is still running.
+IN_FLIGHT = "in-flight"
+
+metrics.register(
+    "shoply_idempotency_requests_total",
+    "counter",
+    "Requests carrying an idempotency key, by result (miss, hit or conflict).",
+)
+
+
+def key_for(request, scope: str) -> Optional[str]:
+    """Return the cache key for the request's idempotency key, if it sent one."""
+    key = request.META.get(HEADER) or request.POST.get(FIELD)
+    if not key:
+        return None
+    digest = hashlib.sha256(f"{scope}:{key}".encode()).hexdigest()
+    return f"idempotency:{digest}"
+
+
+def claim(key: str) -> Union[None, str, HttpResponse]:
+    """Claim a key for this request.
+
+    Returns None when the caller should run the request, the stored response when
+    it already ran, or IN_FLIGHT when another request with the key is still running.
+    """
+    cache = caches[CACHE_ALIAS]
+    stored = cache.get(key)
+    if stored is None:
+        if cache.add(key, IN_FLIGHT, timeout=settings.IDEMPOTENCY_IN_FLIGHT_TIMEOUT):
+            metrics.inc("shoply_idempotency_requests_total", result="miss")
+            return None
+        # Another request claimed it since the get().
+        stored = cache.get(key)
+        if stored is None:
+            # ... and has released it already.
+            return claim(key)
+    if stored == IN_FLIGHT:
+        metrics.inc("shoply_idempotency_requests_total", result="conflict")
+        return IN_FLIGHT
+
+    metrics.inc("shoply_idempotency_requests_total", result="hit")
+    status, headers, content = stored
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    response["Idempotent-Replay"] = "true"
+    return response
+
+
+def store(key: str, response: HttpResponse) -> None:
+    """Keep the response for replays; server errors release the key instead."""
+    cache = caches[CACHE_ALIAS]
+    if response.status_code >= 500:
+        cache.delete(key)
+        return
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+    headers = [
+        (name, response[name])
+        for name in ("Content-Type", "Location")
+        if response.has_header(name)
+    ]
+    cache.set(key, (response.status_code, headers, response.content))
+
+
+def release(key: str) -> None:
+    """Forget a key whose request failed with an exception."""
+    caches[CACHE_ALIAS].delete(key)
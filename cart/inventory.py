@@ -0,0 +1,215 @@
+"""A compact, in-memory snapshot of every product's stock and price.
+
+The snapshot is three parallel NumPy arrays (product id, quantity_available and
+price_per_kg) sorted by id, so the id array doubles as the id -> index map through
+binary search: about 16 bytes per product, and no model instances. Availability and
+price checks for a whole cart are a few vectorized lookups.
+
+Changes made by this process are applied to the snapshot in place once they commit
+(post_save for single products, cart.signals.stock_changed for bulk changes), and
+announced to the other processes through cart.coherence, which re-read the changed
+products at their next request. Changes that can't be applied in place, like new or
+deleted products, bump a version, and the next `snapshot()` reloads. Changes that
+send no signal at all (e.g. QuerySet.update()) show up once the snapshot is older than
+INVENTORY_SNAPSHOT_MAX_AGE. Stock is decremented at checkout with a check in the
+database, so a stale snapshot can't oversell.
+
+Inside a transaction, lookups go to the database instead: the transaction may have
+uncommitted stock changes of its own, which the snapshot (of committed stock) lacks.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from cart import coherence
+from cart.analytics import columns
+from cart.models import Product
+from cart.signals import stock_changed
+
+
+class Snapshot:
+    """Stock and prices of every product at one point in time."""
+
+    __slots__ = ("ids", "quantity", "price", "version", "loaded_at")
+
+    def __init__(
+        self, ids: np.ndarray, quantity: np.ndarray, price: np.ndarray, version: int
+    ) -> None:
+        self.ids = ids
+        self.quantity = quantity
+        self.price = price
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version: int) -> "Snapshot":
+        ids, quantity, price = columns(
+            Product.objects.all(),
+            ("pk", "quantity_available", "price_per_kg"),
+            ("int64", "int32", "int32"),
+        )
+        return cls(ids, quantity, price, version)
+
+    def positions(self, product_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the index of each product in the arrays, and a mask of the products
+        that are in the snapshot at all (the index of the others is meaningless).
+        """
+        product_ids = np.fromiter(product_ids, dtype=np.int64)
+        index = np.searchsorted(self.ids, product_ids)
+        index[index == len(self.ids)] = 0
+        found = (
+            self.ids[index] == product_ids
+            if len(self.ids)
+            else np.zeros(len(product_ids), dtype=bool)
+        )
+        return index, found
+
+    def lookup(self, product_ids: Iterable[int], values: np.ndarray) -> Dict[int, int]:
+        """Return {product id: value} of the products found, from one of the arrays."""
+        product_ids = np.fromiter(product_ids, dtype=np.int64)
+        index, found = self.positions(product_ids)
+        return dict(zip(product_ids[found].tolist(), values[index[found]].tolist()))
+
+    def update(self, product_id: int, quantity: int, price: int) -> bool:
+        """Set a product's stock and price; False if it isn't in the snapshot."""
+        index, found = self.positions([product_id])
+        if not found[0]:
+            return False
+        self.quantity[index[0]] = quantity
+        self.price[index[0]] = price
+        return True
+
+    def apply(self, changes: Dict[int, int]) -> bool:
+        """Add {product id: delta} to the stock; False if any product is missing."""
+        index, found = self.positions(changes.keys())
+        np.add.at(
+            self.quantity,
+            index[found],
+            np.fromiter(changes.values(), dtype=np.int64)[found].astype(np.int32),
+        )
+        return bool(found.all())
+
+
+class OutOfStock(Exception):
+    """Raised when a checkout would take more of some products than there is left."""
+
+    def __init__(self, product_names: List[str]) -> None:
+        super().__init__(", ".join(product_names))
+        self.product_names = product_names
+
+
+_snapshot: Optional[Snapshot] = None
+_version = 0
+_loading = 0
+_lock = threading.Lock()
+
+
+def invalidate() -> None:
+    """Make the next snapshot() call load a new snapshot."""
+    global _version
+    _version += 1
+
+
+def snapshot() -> Snapshot:
+    """Return the current snapshot, (re)loading it when it is out of date."""
+    global _snapshot, _loading
+    current = _snapshot
+    if (
+        current is not None
+        and current.version == _version
+        and time.monotonic() - current.loaded_at < settings.INVENTORY_SNAPSHOT_MAX_AGE
+    ):
+        return current
+
+    with _lock:
+        if _snapshot is not current:
+            # Another thread has just loaded it.
+            return _snapshot
+        _loading += 1
+        try:
+            _snapshot = Snapshot.load(_version)
+        finally:
+            _loading -= 1
+        return _snapshot
+
+
+def _lookup(product_ids: Iterable[int], field: str) -> Dict[int, int]:
+    product_ids = list(product_ids)
+    if connections[Product.objects.db].in_atomic_block:
+        return dict(Product.objects.filter(pk__in=product_ids).values_list("pk", field))
+    current = snapshot()
+    values = current.quantity if field == "quantity_available" else current.price
+    return current.lookup(product_ids, values)
+
+
+def available(product_ids: Iterable[int]) -> Dict[int, int]:
+    """Return {product id: quantity available} of the given products that exist."""
+    return _lookup(product_ids, "quantity_available")
+
+
+def prices(product_ids: Iterable[int]) -> Dict[int, int]:
+    """Return {product id: price per kg} of the given products that exist."""
+    return _lookup(product_ids, "price_per_kg")
+
+
+def _changed(apply) -> None:
+    """Apply a committed change to the current snapshot, or invalidate it."""
+    current = _snapshot
+    if current is None:
+        return
+    if _loading or not apply(current):
+        # A snapshot being loaded may have read the old value.
+        invalidate()
+
+
+def _reread(product_ids: Optional[List[int]]) -> None:
+    """Update the snapshot with products another process changed."""
+    if _snapshot is None:
+        return
+    if product_ids is None:
+        invalidate()
+        return
+    rows = Product.objects.filter(pk__in=product_ids).values_list(
+        "pk", "quantity_available", "price_per_kg"
+    )
+    if len(rows) < len(product_ids):
+        # Deleted products.
+        invalidate()
+        return
+    for pk, quantity, price in rows:
+        _changed(lambda s: s.update(pk, quantity, price))
+
+
+coherence.register("inventory", _reread)
+
+
+@receiver(post_save, sender=Product, dispatch_uid="cart.inventory.product_saved")
+def product_saved(sender, instance, created, raw=False, **kwargs) -> None:
+    if raw:
+        return
+    coherence.invalidate("inventory", [instance.pk])
+    quantity, price = instance.quantity_available, instance.price_per_kg
+    if created or not isinstance(quantity, int):
+        # New products (and values still held as expressions) need a reload.
+        transaction.on_commit(invalidate)
+        return
+    transaction.on_commit(
+        lambda: _changed(lambda s: s.update(instance.pk, quantity, price))
+    )
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="cart.inventory.product_deleted")
+def product_deleted(sender, instance, **kwargs) -> None:
+    coherence.invalidate("inventory", [instance.pk])
+    transaction.on_commit(invalidate)
+
+
+@receiver(stock_changed, dispatch_uid="cart.inventory.stock_changed")
+def stock_changed_in_bulk(sender, changes: Dict[int, int], **kwargs) -> None:
+    changes = dict(changes)
+    coherence.invalidate("inventory", sorted(changes))
+    transaction.on_commit(lambda: _changed(lambda s: s.apply(changes)))
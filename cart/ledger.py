@@ -0,0 +1,209 @@
+"""The inventory ledger: every change in stock, as an append-only StockMovement.
+
+`record` appends the movements of a checkout, restock or adjustment with one insert,
+and applies them to Product.quantity_available with one update in the same
+transaction, so quantity_available stays a running total of the ledger (a projection)
+that is read as fast as ever. Saving a Product with another quantity_available (e.g.
+in the admin) records the difference: a restock when stock goes up, an adjustment when
+it goes down. Fixtures (loaddata's raw saves) record nothing: a dump of the database
+carries its movements and checkpoints already, so the products of a fixture without
+them show up in `drift`.
+
+`compact` folds old movements into per-product StockCheckpoints and removes them, so
+`stock` derives a product's stock from its checkpoint and the movements since: the
+work is proportional to the changes since the last compaction. `drift` lists the
+products whose quantity_available doesn't match their ledger.
+"""
+import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from django.db import connections, router, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from cart import tasks
+from cart.models import Order, Product, StockCheckpoint, StockMovement
+from cart.signals import stock_changed
+
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def record(kind: str, changes: Dict[int, int], order: Optional[Order] = None) -> None:
+    """Append a movement of `kind` for each {product id: change in kg}, and apply them
+    to quantity_available, with one insert and one update whatever their number.
+
+    The stock alerts of the products are evaluated, and cart.signals.stock_changed
+    sent, for when the transaction commits.
+    """
+    changes = {pk: quantity for pk, quantity in changes.items() if quantity}
+    if not changes:
+        return
+    created = timezone.now()
+    # A checkout's own transaction covers it; no savepoint needed.
+    with transaction.atomic(savepoint=False):
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product_id=pk,
+                    kind=kind,
+                    quantity=quantity,
+                    order=order,
+                    created=created,
+                )
+                for pk, quantity in changes.items()
+            ]
+        )
+        Product.objects.bulk_update(
+            [
+                Product(pk=pk, quantity_available=F("quantity_available") + quantity)
+                for pk, quantity in changes.items()
+            ],
+            ["quantity_available"],
+        )
+        # bulk_update sends no post_save signals.
+        tasks.evaluate_stock_alerts.enqueue(sorted(changes))
+        stock_changed.send(sender=Product, changes=changes)
+
+
+def stock(product_ids: Iterable[int]) -> Dict[int, int]:
+    """Derive the stock of products from their checkpoints and the movements since;
+    products the ledger has nothing on are left out.
+    """
+    product_ids = list(product_ids)
+    # Both reads in one transaction: a compaction committing between them would
+    # otherwise have its movements counted twice, or not at all.
+    with transaction.atomic():
+        result = dict(
+            StockCheckpoint.objects.filter(product_id__in=product_ids).values_list(
+                "product_id", "quantity"
+            )
+        )
+        since = Coalesce(
+            Subquery(
+                StockCheckpoint.objects.filter(product=OuterRef("product_id")).values(
+                    "movement_id"
+                )
+            ),
+            0,
+        )
+        totals = (
+            StockMovement.objects.filter(product_id__in=product_ids, id__gt=since)
+            .order_by()
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "total")
+        )
+        for pk, total in totals:
+            result[pk] = result.get(pk, 0) + total
+    return result
+
+
+def drift(batch_size: int = 1000) -> Iterator[Tuple[int, int, int]]:
+    """Yield (product id, quantity_available, stock from the ledger) of every product
+    whose two don't match.
+    """
+    last = 0
+    while True:
+        batch = list(
+            Product.objects.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", "quantity_available")[:batch_size]
+        )
+        if not batch:
+            return
+        derived = stock(pk for pk, _ in batch)
+        for pk, quantity in batch:
+            if derived.get(pk, 0) != quantity:
+                yield pk, quantity, derived.get(pk, 0)
+        last = batch[-1][0]
+
+
+def compact(
+    before: datetime.datetime,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    using: Optional[str] = None,
+) -> int:
+    """Fold the movements created before `before` into their products' checkpoints,
+    and remove them; return how many were folded.
+
+    Each batch is folded in a transaction of its own, so that a product's checkpoint
+    and remaining movements always add up to its stock.
+    """
+    using = using or router.db_for_write(StockMovement)
+    movements = StockMovement.objects.using(using)
+    cutoff = movements.filter(created__lt=before).aggregate(last=Max("id"))["last"]
+    if cutoff is None:
+        return 0
+
+    connection = connections[using]
+    table = connection.ops.quote_name(StockCheckpoint._meta.db_table)
+    folded = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(
+                movements.filter(id__lte=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return folded
+            batch = movements.filter(id__lte=ids[-1])
+            totals = (
+                batch.order_by()
+                .values("product_id")
+                .annotate(total=Sum("quantity"))
+                .values_list("product_id", "total")
+            )
+            now = connection.ops.adapt_datetimefield_value(timezone.now())
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {table} (product_id, quantity, movement_id, updated) "
+                    "VALUES (%s, %s, %s, %s) "
+                    "ON CONFLICT (product_id) DO UPDATE SET "
+                    f"quantity = {table}.quantity + excluded.quantity, "
+                    "movement_id = excluded.movement_id, updated = excluded.updated",
+                    [(pk, total, ids[-1], now) for pk, total in totals],
+                )
+            batch.delete()
+            folded += len(ids)
+
+
+@receiver(pre_save, sender=Product, dispatch_uid="cart.ledger.product_saving")
+def product_saving(sender, instance, raw=False, update_fields=None, **kwargs) -> None:
+    """Note how much a save changes the stock of an existing product; fixtures
+    change nothing.
+    """
+    instance._stock_change = 0
+    if (
+        raw
+        or instance.pk is None
+        or not isinstance(instance.quantity_available, int)
+        or (update_fields is not None and "quantity_available" not in update_fields)
+    ):
+        return
+    # Product.save() holds a transaction, so the stock can't change meanwhile.
+    previous = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list("quantity_available", flat=True)
+        .first()
+    )
+    if previous is not None:
+        instance._stock_change = instance.quantity_available - previous
+
+
+@receiver(post_save, sender=Product, dispatch_uid="cart.ledger.product_saved")
+def product_saved(sender, instance, created, raw=False, **kwargs) -> None:
+    """Record the stock a save added (restock) or took away (adjustment)."""
+    if raw:
+        return
+    change = instance.__dict__.pop("_stock_change", 0)
+    if created and isinstance(instance.quantity_available, int):
+        change = instance.quantity_available
+    if change:
+        StockMovement.objects.create(
+            product=instance,
+            kind=StockMovement.RESTOCK if change > 0 else StockMovement.ADJUSTMENT,
+            quantity=change,
+        )
@@ -0,0 +1,43 @@
+"""Management command comparing the two ways of rendering the checkout rows."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+from cart import benchmarks
+from cart.management.commands.bench_routes import parse_sizes
+
+
+class Command(BaseCommand):
+    """Time the checkout page rendered through the forms and through cart.rendering."""
+
+    help = (
+        "Measure the checkout page's render time per cart line with its rows rendered "
+        "by form.as_p and by cart.rendering, at each catalog and cart size."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--sizes",
+            default="100:10,1000:100",
+            help="Comma separated products:cart_lines sizes.",
+        )
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        sizes = parse_sizes(options["sizes"])
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = benchmarks.checkout_render(
+                sizes, options["iterations"], options["seed"]
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        loaders = settings.TEMPLATES[0]["OPTIONS"].get("loaders", [])
+        cached = any(isinstance(loader, tuple) for loader in loaders)
+        self.stdout.write(f"Template loader: {'cached' if cached else 'uncached'}")
+        for r in results:
+            self.stdout.write(
+                f"{r['path']:<5} {r['products']:>8} products {r['cart_lines']:>6} lines  "
+                f"p50 {r['p50_ms']:9.2f}ms  {r['per_row_us']:8.1f}us/row"
+            )
@@ -0,0 +1,109 @@
+"""Management command running the end-to-end cart route benchmarks."""
+import os
+import platform
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from cart import benchmarks
+
+
+def parse_sizes(value: str):
+    """Parse "1000:100,100000:1000" into [(1000, 100), (100000, 1000)]."""
+    try:
+        return [
+            tuple(int(n) for n in size.split(":")) for size in value.split(",") if size
+        ]
+    except ValueError:
+        raise CommandError(f"Invalid --sizes {value!r}, expected products:lines,...")
+
+
+class Command(BaseCommand):
+    """Benchmark every cart route on a scratch test database."""
+
+    help = (
+        "Measure latency percentiles, query counts and peak memory of every cart "
+        "route at each catalog and cart size, write them to a JSON file and flag "
+        "regressions against a stored baseline."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--sizes",
+            default="100:10,1000:20",
+            help="Comma separated products:cart_lines sizes.",
+        )
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--accept-encoding",
+            default="gzip, deflate, br",
+            help='Accept-Encoding header of the requests ("identity": uncompressed).',
+        )
+        parser.add_argument("--output", default="bench_results.json")
+        parser.add_argument(
+            "--baseline",
+            default=getattr(settings, "BENCHMARK_BASELINE", None),
+            help="Results file to compare against.",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this run as the new baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative growth of latency and memory.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        sizes = parse_sizes(options["sizes"])
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = benchmarks.run(
+                sizes,
+                options["iterations"],
+                options["seed"],
+                options["accept_encoding"],
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        meta = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "debug": settings.DEBUG,
+            "iterations": options["iterations"],
+            "seed": options["seed"],
+            "accept_encoding": options["accept_encoding"],
+        }
+        benchmarks.dump(options["output"], results, meta)
+
+        for r in results:
+            self.stdout.write(
+                f"{r['method']:>4} {r['route']:<17} {r['products']:>8} products "
+                f"{r['cart_lines']:>6} lines  p50 {r['p50_ms']:9.2f}ms  "
+                f"p99 {r['p99_ms']:9.2f}ms  {r['queries']:>5} queries  "
+                f"{r['peak_kib']:>9.1f}KiB  {r['bytes'] / 1024:>9.1f}KiB sent"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+        baseline = options["baseline"]
+        if options["save_baseline"]:
+            if not baseline:
+                raise CommandError("--save-baseline needs --baseline.")
+            benchmarks.dump(baseline, results, meta)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline}"))
+        elif baseline and os.path.exists(baseline):
+            regressions = benchmarks.compare(
+                results, benchmarks.load(baseline), options["tolerance"]
+            )
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(
+                    f"{len(regressions)} regression(s) against {baseline}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline}"))
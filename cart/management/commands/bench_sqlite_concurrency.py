@@ -0,0 +1,163 @@
+"""Management command comparing concurrent checkout-style load on two SQLite profiles."""
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from shoply.backends.sqlite3.base import apply_pragmas
+
+
+PRODUCTS = 1000
+
+
+def open_connection(path: str, profile: dict) -> sqlite3.Connection:
+    """Open a connection the way Django would for the given profile."""
+    connection = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(connection, profile["pragmas"])
+    return connection
+
+
+def writer(path: str, profile: dict, seconds: float, seed: int, results) -> None:
+    """Check out one product at a time: read its stock, decrement it, log the order."""
+    connection = open_connection(path, profile)
+    rng = random.Random(seed)
+    done = failed = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        product_id = rng.randint(1, PRODUCTS)
+        try:
+            connection.execute(f"BEGIN {profile['transaction_mode']}")
+            (quantity,) = connection.execute(
+                "SELECT quantity_available FROM product WHERE id = ?", (product_id,)
+            ).fetchone()
+            connection.execute(
+                "UPDATE product SET quantity_available = ? WHERE id = ?",
+                (quantity - 1, product_id),
+            )
+            connection.execute(
+                "INSERT INTO purchase (product_id, quantity) VALUES (?, 1)",
+                (product_id,),
+            )
+            connection.execute("COMMIT")
+            done += 1
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            failed += 1
+
+    results.put(("write", done, failed))
+
+
+def reader(path: str, profile: dict, seconds: float, seed: int, results) -> None:
+    """Render-style reads: total up a page of the catalog."""
+    connection = open_connection(path, profile)
+    rng = random.Random(seed)
+    done = failed = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        start = rng.randint(1, PRODUCTS - 100)
+        try:
+            connection.execute(
+                "SELECT SUM(quantity_available * price_per_kg) FROM product "
+                "WHERE id BETWEEN ? AND ?",
+                (start, start + 100),
+            ).fetchone()
+            done += 1
+        except sqlite3.OperationalError:
+            failed += 1
+
+    results.put(("read", done, failed))
+
+
+class Command(BaseCommand):
+    """Run concurrent readers and writers against a scratch database per profile."""
+
+    help = (
+        "Compare SQLite's defaults against the configured connection profile "
+        "(pragmas and transaction mode of the default database) under "
+        "concurrent reads and writes."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options) -> None:
+        database_options = settings.DATABASES["default"].get("OPTIONS", {})
+        profiles = {
+            "sqlite defaults": {"pragmas": {}, "transaction_mode": "DEFERRED"},
+            "configured": {
+                "pragmas": database_options.get("pragmas", {}),
+                "transaction_mode": database_options.get(
+                    "transaction_mode", "DEFERRED"
+                ),
+            },
+        }
+
+        for name, profile in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.sqlite3")
+                self.create_database(path, profile)
+                totals = self.run_profile(path, profile, options)
+
+            seconds = options["seconds"]
+            self.stdout.write(
+                f"{name:>16}: "
+                f"{totals['write'][0] / seconds:8.0f} writes/s "
+                f"({totals['write'][1]} locked), "
+                f"{totals['read'][0] / seconds:8.0f} reads/s "
+                f"({totals['read'][1]} locked)"
+            )
+
+    def create_database(self, path: str, profile: dict) -> None:
+        connection = open_connection(path, profile)
+        connection.executescript(
+            """
+            CREATE TABLE product (
+                id INTEGER PRIMARY KEY,
+                quantity_available INTEGER NOT NULL,
+                price_per_kg INTEGER NOT NULL
+            );
+            CREATE TABLE purchase (
+                id INTEGER PRIMARY KEY,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL
+            );
+            """
+        )
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO product VALUES (?, 1000000, ?)",
+            ((i, i % 20 + 1) for i in range(1, PRODUCTS + 1)),
+        )
+        connection.execute("COMMIT")
+        connection.close()
+
+    def run_profile(self, path: str, profile: dict, options: dict) -> dict:
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=role, args=(path, profile, options["seconds"], i, results)
+            )
+            for i, role in enumerate(
+                [writer] * options["writers"] + [reader] * options["readers"]
+            )
+        ]
+        for worker in workers:
+            worker.start()
+
+        totals = {"write": [0, 0], "read": [0, 0]}
+        for _ in workers:
+            role, done, failed = results.get()
+            totals[role][0] += done
+            totals[role][1] += failed
+        for worker in workers:
+            worker.join()
+
+        return totals
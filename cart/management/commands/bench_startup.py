@@ -0,0 +1,83 @@
+"""Management command to time worker boot up to the first served response."""
+import os
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter: boot the WSGI application and serve one request.
+BOOT_SCRIPT = """
+import sys
+from wsgiref.util import setup_testing_defaults
+from shoply.wsgi import application
+
+environ = {"PATH_INFO": sys.argv[1], "HTTP_HOST": "localhost"}
+setup_testing_defaults(environ)
+status = []
+body = application(environ, lambda s, h, exc_info=None: status.append(s))
+b"".join(body)
+print(status[0])
+"""
+
+
+class Command(BaseCommand):
+    """Spawn fresh worker processes and time boot to first response."""
+
+    help = (
+        "Time process boot to first response for a route. Fails when the median "
+        "exceeds the budget (--budget-ms or the STARTUP_BUDGET_MS setting)."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--path", default="/cart/", help="Route to request.")
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Number of processes to boot."
+        )
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=getattr(settings, "STARTUP_BUDGET_MS", None),
+            help="Maximum allowed median boot-to-first-response time.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", "shoply.settings")
+        # Time the cold path: the first response without the boot warm-up.
+        env.setdefault("SHOPLY_WARMUP", "0")
+        timings = []
+
+        for _ in range(options["runs"]):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-c", BOOT_SCRIPT, options["path"]],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+
+            status = result.stdout.strip()
+            if result.returncode != 0 or not status.startswith(("2", "3")):
+                raise CommandError(
+                    f"Worker failed to serve {options['path']}: "
+                    f"{status or result.stderr.strip()}"
+                )
+            timings.append(elapsed)
+
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"boot-to-first-response {options['path']}: "
+            f"median {median:.1f}ms, min {min(timings):.1f}ms, "
+            f"max {max(timings):.1f}ms over {len(timings)} runs"
+        )
+
+        budget = options["budget_ms"]
+        if budget is not None and median > budget:
+            raise CommandError(
+                f"Startup budget exceeded: median {median:.1f}ms > {budget:.1f}ms"
+            )
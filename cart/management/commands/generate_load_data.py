@@ -0,0 +1,57 @@
+"""Management command to generate a large synthetic catalog and cart."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from cart import synthetic
+
+
+class Command(BaseCommand):
+    """Bulk load a reproducible synthetic catalog and cart for load testing."""
+
+    help = (
+        "Generate a synthetic Product catalog and Cart, e.g. "
+        "`generate_load_data --products 1000000 --cart-lines 5000 --seed 42`."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--cart-lines", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0, help="Same seed, same data.")
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=2.0,
+            help="How strongly cart lines favour popular products (0 is uniform).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=synthetic.DEFAULT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete all existing products and cart items first (orders are kept).",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options) -> None:
+        start = time.perf_counter()
+        try:
+            counts = synthetic.generate(
+                products=options["products"],
+                cart_lines=options["cart_lines"],
+                seed=options["seed"],
+                skew=options["skew"],
+                batch_size=options["batch_size"],
+                clear=options["clear"],
+                using=options["database"],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - start
+
+        rows = counts["products"] + counts["cart_lines"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inserted {counts['products']} products and {counts['cart_lines']} "
+                f"cart lines in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,47 @@
+"""Management command to backfill or verify the daily sales rollups."""
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from cart import rollups
+
+
+class Command(BaseCommand):
+    """Recompute the DailySales rollups from the order lines."""
+
+    help = (
+        "Rebuild the daily sales rollups from the order lines still in the database, "
+        "or with --check only report the ones that do not match."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--since",
+            type=datetime.date.fromisoformat,
+            help="First day (YYYY-MM-DD) to rebuild; default the oldest order line.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare, and fail if any rollup is wrong.",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options) -> None:
+        mismatches = rollups.verify(options["since"], using=options["database"])
+        for product, day, wanted, stored in mismatches[:20]:
+            self.stdout.write(
+                f"product {product} on {day}: expected (kg, AED) {wanted}, "
+                f"stored {stored}"
+            )
+
+        if options["check"]:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollups do not match.")
+            self.stdout.write(self.style.SUCCESS("All rollups match the order lines."))
+            return
+
+        written = rollups.rebuild(options["since"], using=options["database"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} rollups ({len(mismatches)} were wrong)."
+            )
+        )
@@ -0,0 +1,60 @@
+"""Management command to run background task workers."""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from cart import taskqueue
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Run queued background tasks until interrupted (or the queue is empty)."""
+
+    help = "Run background tasks from the task queue with a pool of worker threads."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--threads", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=settings.TASK_BATCH_SIZE)
+        parser.add_argument(
+            "--poll", type=float, default=1.0, help="Seconds to sleep when idle."
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the queue is empty."
+        )
+
+    def worker(self, options, counts, index) -> None:
+        try:
+            while True:
+                try:
+                    ran = taskqueue.run_pending(batch_size=options["batch_size"])
+                except Exception:
+                    # e.g. the database is unavailable; try again after a pause.
+                    logger.exception("Error running background tasks")
+                    ran = 0
+                counts[index] += ran
+                if not ran:
+                    if options["once"]:
+                        return
+                    time.sleep(options["poll"])
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options) -> None:
+        counts = [0] * options["threads"]
+        threads = [
+            threading.Thread(target=self.worker, args=(options, counts, i), daemon=True)
+            for i in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {sum(counts)} tasks."))
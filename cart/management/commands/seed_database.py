@@ -0,0 +1,19 @@
+"""Management command to seed the database with the initial Product and Cart records."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cart.db_init import initialize_database
+
+
+class Command(BaseCommand):
+    """Seed the database; running it again on a seeded database is a no-op."""
+
+    help = "Seed the database with the initial Product and Cart records."
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            created = initialize_database()
+
+        if created:
+            self.stdout.write(self.style.SUCCESS("Database seeded."))
+        else:
+            self.stdout.write("Database already seeded, nothing to do.")
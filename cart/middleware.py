@@ -0,0 +1,99 @@
+"""Middleware for the cart app."""
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from cart.models import RequestProfile
+from shoply import warmup
+
+
+class SQLTimeline:
+    """Execute wrapper recording when each query started and how long it took."""
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ended = time.perf_counter()
+            self.queries.append(
+                [
+                    round((began - self.start) * 1000, 3),
+                    round((ended - began) * 1000, 3),
+                    sql,
+                ]
+            )
+
+
+class ProfilingMiddleware:
+    """Profile requests with cProfile and store the profile with its SQL timeline.
+
+    A request is profiled when its X-Profile header matches PROFILING_TOKEN, or at
+    random for a PROFILING_SAMPLE_RATE fraction of requests (never the warm-up's
+    requests). With no token and a zero rate the middleware removes itself, so it
+    costs nothing when off.
+    """
+
+    header = "HTTP_X_PROFILE"
+
+    def __init__(self, get_response):
+        self.token = getattr(settings, "PROFILING_TOKEN", "")
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        if not self.token and not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.max_profiles = getattr(settings, "PROFILING_MAX_PROFILES", 200)
+        self.get_response = get_response
+
+    def should_profile(self, request) -> bool:
+        header = request.META.get(self.header)
+        if header and self.token:
+            return hmac.compare_digest(header.encode(), self.token.encode())
+        return not warmup.is_warmup(request) and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        timeline = SQLTimeline(start)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timeline))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = (time.perf_counter() - start) * 1000
+
+        self.save(request, profiler, timeline, duration)
+        return response
+
+    def save(self, request, profiler, timeline, duration) -> None:
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(40)
+        match = request.resolver_match
+
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            route=match.view_name if match else "unresolved",
+            path=request.get_full_path()[:2000],
+            duration_ms=duration,
+            sql_timeline=timeline.queries,
+            summary=summary.getvalue(),
+            stats=marshal.dumps(stats.stats),
+        )
+        RequestProfile.objects.filter(id__lte=profile.id - self.max_profiles).delete()
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.7 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0002_auto_20210924_0020"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("method", models.CharField(max_length=10)),
+                ("route", models.CharField(max_length=200)),
+                ("path", models.CharField(max_length=2000)),
+                ("duration_ms", models.FloatField(verbose_name="Duration (ms)")),
+                ("sql_timeline", models.JSONField(default=list)),
+                (
+                    "summary",
+                    models.TextField(help_text="Top functions by cumulative time"),
+                ),
+                ("stats", models.BinaryField()),
+            ],
+            options={
+                "ordering": ["-id"],
+            },
+        ),
+    ]
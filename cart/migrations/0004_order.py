@@ -0,0 +1,94 @@
+# Generated by Django 3.2.7 on 2026-10-19 09:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0003_requestprofile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Order",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("total", models.IntegerField(verbose_name="Total (AED)")),
+            ],
+            options={
+                "ordering": ["-id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="OrderLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "product_name",
+                    models.CharField(max_length=200, verbose_name="Product Name"),
+                ),
+                ("quantity", models.IntegerField(verbose_name="Quantity (kg)")),
+                (
+                    "price_per_kg",
+                    models.IntegerField(verbose_name="Price (per kg in AED)"),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lines",
+                        to="cart.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="cart.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="orderline",
+            index=models.Index(
+                fields=["product", "created"], name="orderline_product_time"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderline",
+            index=models.Index(fields=["created"], name="orderline_time"),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.7 on 2026-10-19 09:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0004_order"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("kg_sold", models.IntegerField(default=0, verbose_name="Sold (kg)")),
+                (
+                    "revenue",
+                    models.IntegerField(default=0, verbose_name="Revenue (AED)"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="cart.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily sales",
+                "ordering": ["-day", "product"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailysales",
+            constraint=models.UniqueConstraint(
+                fields=("product", "day"), name="sales_product_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 3.2.7 on 2026-10-19 09:55
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0005_dailysales"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="low_stock_threshold",
+            field=models.IntegerField(
+                blank=True,
+                help_text="Alert when stock falls to this many kg (blank: the site default).",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0)],
+            ),
+        ),
+        migrations.CreateModel(
+            name="StockAlert",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "level",
+                    models.CharField(
+                        choices=[("low", "Low stock"), ("out", "Out of stock")],
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "quantity_available",
+                    models.IntegerField(verbose_name="Quantity (kg)"),
+                ),
+                ("threshold", models.IntegerField()),
+                ("created", models.DateTimeField(default=django.utils.timezone.now)),
+                ("resolved", models.DateTimeField(blank=True, null=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="cart.product"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stockalert",
+            index=models.Index(fields=["resolved", "level"], name="stockalert_open"),
+        ),
+        migrations.AddConstraint(
+            model_name="stockalert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("resolved__isnull", True)),
+                fields=("product",),
+                name="stockalert_one_open_per_product",
+            ),
+        ),
+    ]
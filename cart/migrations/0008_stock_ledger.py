@@ -0,0 +1,112 @@
+# Generated by Django 3.2.7 on 2026-10-19 10:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_checkpoints(apps, schema_editor):
+    """Start the ledger of every existing product from its current stock."""
+    Product = apps.get_model("cart", "Product")
+    StockCheckpoint = apps.get_model("cart", "StockCheckpoint")
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {StockCheckpoint._meta.db_table} "
+            "(product_id, quantity, movement_id, updated) "
+            f"SELECT id, quantity_available, 0, %s FROM {Product._meta.db_table}",
+            [connection.ops.adapt_datetimefield_value(django.utils.timezone.now())],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0007_task"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockCheckpoint",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        serialize=False,
+                        to="cart.product",
+                    ),
+                ),
+                ("quantity", models.IntegerField(verbose_name="Quantity (kg)")),
+                ("movement_id", models.BigIntegerField(default=0)),
+                ("updated", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("purchase", "Purchase"),
+                            ("restock", "Restock"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.IntegerField(
+                        help_text="Negative when stock goes out.",
+                        verbose_name="Change (kg)",
+                    ),
+                ),
+                ("created", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="cart.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="cart.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(fields=["product", "id"], name="stockmovement_product"),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(fields=["created"], name="stockmovement_time"),
+        ),
+        migrations.RunPython(open_checkpoints, migrations.RunPython.noop),
+    ]
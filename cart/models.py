@@ -1,8 +1,9 @@
 """Model Classes for defining database tables."""
 from typing import Collection, Optional
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 
@@ -24,10 +25,25 @@ class Product(models.Model):
         validators=[MinValueValidator(0)], verbose_name=price_text
     )
 
+    low_stock_threshold = models.IntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        help_text="Alert when stock falls to this many kg (blank: the site default).",
+    )
+
     def __str__(self) -> str:
         """Return String for representing a Product object."""
         return self.name
 
+    def save(self, *args, **kwargs) -> None:
+        """Save the product in a transaction, in which cart.ledger records any change
+        in its stock.
+        """
+        using = kwargs.get("using") or router.db_for_write(Product, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ["id"]
 
@@ -61,3 +77,331 @@ class Cart(models.Model):
             )
 
         return super().clean_fields(exclude=exclude)
+
+
+class RequestProfile(models.Model):
+    """Class to represent a profile captured for one request by ProfilingMiddleware."""
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    method = models.CharField(max_length=10)
+
+    route = models.CharField(max_length=200)
+
+    path = models.CharField(max_length=2000)
+
+    duration_ms = models.FloatField(verbose_name="Duration (ms)")
+
+    # [[start offset (ms), duration (ms), sql], ...] in execution order.
+    sql_timeline = models.JSONField(default=list)
+
+    summary = models.TextField(help_text="Top functions by cumulative time")
+
+    # Marshalled pstats data, loadable with pstats.Stats or snakeviz.
+    stats = models.BinaryField()
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self) -> str:
+        """Return String for representing a RequestProfile object."""
+        return f"{self.method} {self.route} ({self.duration_ms:.1f}ms)"
+
+
+class Order(models.Model):
+    """Class to represent a checked out cart. Orders are only ever appended, and are
+    moved out of the table by the archive_orders command once they are old.
+    """
+
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    total = models.IntegerField(verbose_name="Total (AED)")
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self) -> str:
+        """Return String for representing an Order object."""
+        return f"Order {self.pk} ({self.created:%Y-%m-%d %H:%M})"
+
+    @classmethod
+    def place(cls, items: Collection[Cart]) -> "Order":
+        """Record the cart items as a new order, with one insert for all of its lines."""
+        created = timezone.now()
+        order = cls.objects.create(
+            created=created,
+            total=sum(item.purchase_quantity * item.price_per_kg for item in items),
+        )
+        lines = [
+            OrderLine(
+                order=order,
+                created=created,
+                product_id=item.product_id,
+                product_name=item.product.name,
+                quantity=item.purchase_quantity,
+                price_per_kg=item.price_per_kg,
+            )
+            for item in items
+        ]
+        OrderLine.objects.bulk_create(lines)
+        DailySales.add(lines)
+        return order
+
+
+class OrderLine(models.Model):
+    """Class to represent one product bought in an Order."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+
+    # Copied from the order so per-product, time-range queries need no join.
+    created = models.DateTimeField(default=timezone.now)
+
+    # History outlives the catalog: no constraint ties lines to existing products,
+    # and the name below is kept for when the product is gone. The index over
+    # (product, created) covers lookups by product.
+    product = models.ForeignKey(
+        Product,
+        null=True,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        db_index=False,
+    )
+
+    product_name = models.CharField(max_length=200, verbose_name=name_text)
+
+    quantity = models.IntegerField(verbose_name=quantity_text)
+
+    price_per_kg = models.IntegerField(verbose_name=price_text)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["product", "created"], name="orderline_product_time"),
+            models.Index(fields=["created"], name="orderline_time"),
+        ]
+
+    def __str__(self) -> str:
+        """Return String for representing an OrderLine object."""
+        return f"{self.quantity}kg of {self.product_name}"
+
+
+class DailySales(models.Model):
+    """Class to represent the running sales total of a product on one (local) day.
+
+    Rows are upserted by every checkout, and can be rebuilt from the order lines with
+    the rebuild_sales_rollups command.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False
+    )
+
+    day = models.DateField()
+
+    kg_sold = models.IntegerField(default=0, verbose_name="Sold (kg)")
+
+    revenue = models.IntegerField(default=0, verbose_name="Revenue (AED)")
+
+    class Meta:
+        ordering = ["-day", "product"]
+        verbose_name_plural = "daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "day"], name="sales_product_day")
+        ]
+
+    def __str__(self) -> str:
+        """Return String for representing a DailySales object."""
+        return f"{self.day}: {self.kg_sold}kg of product {self.product_id}"
+
+    @classmethod
+    def add(cls, lines: Collection["OrderLine"], using: Optional[str] = None) -> None:
+        """Add the order lines to their products' totals for the day, with one upsert
+        for all of them.
+        """
+        totals = {}
+        for line in lines:
+            key = (line.product_id, timezone.localdate(line.created))
+            kg_sold, revenue = totals.get(key, (0, 0))
+            totals[key] = (
+                kg_sold + line.quantity,
+                revenue + line.quantity * line.price_per_kg,
+            )
+        if not totals:
+            return
+
+        connection = connections[using or router.db_for_write(cls)]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (product_id, day, kg_sold, revenue) "
+                "VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (product_id, day) DO UPDATE SET "
+                f"kg_sold = {table}.kg_sold + excluded.kg_sold, "
+                f"revenue = {table}.revenue + excluded.revenue",
+                [
+                    (product, connection.ops.adapt_datefield_value(day), *total)
+                    for (product, day), total in totals.items()
+                ],
+            )
+
+
+class StockAlert(models.Model):
+    """Class to represent a product running low on (or out of) stock.
+
+    A product has at most one open alert, which is resolved once it is restocked
+    above its threshold.
+    """
+
+    LOW = "low"
+    OUT = "out"
+    LEVELS = [(LOW, "Low stock"), (OUT, "Out of stock")]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    level = models.CharField(max_length=3, choices=LEVELS)
+
+    quantity_available = models.IntegerField(verbose_name=quantity_text)
+
+    threshold = models.IntegerField()
+
+    created = models.DateTimeField(default=timezone.now)
+
+    resolved = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product"],
+                condition=models.Q(resolved__isnull=True),
+                name="stockalert_one_open_per_product",
+            )
+        ]
+        indexes = [models.Index(fields=["resolved", "level"], name="stockalert_open")]
+
+    def __str__(self) -> str:
+        """Return String for representing a StockAlert object."""
+        return (
+            f"{self.get_level_display()}: {self.product} ({self.quantity_available}kg)"
+        )
+
+
+class Task(models.Model):
+    """Class to represent a background task waiting to run (or that failed for good).
+
+    Tasks are run, and then deleted, by cart.taskqueue.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=200)
+
+    args = models.JSONField(default=list)
+
+    # Identical tasks (same name and args) share a key; only one of them is pending.
+    key = models.CharField(max_length=64)
+
+    status = models.CharField(max_length=7, choices=STATUSES, default=PENDING)
+
+    attempts = models.IntegerField(default=0)
+
+    run_after = models.DateTimeField(default=timezone.now)
+
+    locked_by = models.CharField(max_length=32, blank=True)
+
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    created = models.DateTimeField(default=timezone.now)
+
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["run_after", "id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="pending"),
+                name="task_one_pending_per_key",
+            )
+        ]
+        indexes = [models.Index(fields=["status", "run_after"], name="task_due")]
+
+    def __str__(self) -> str:
+        """Return String for representing a Task object."""
+        return f"{self.name}{tuple(self.args)} ({self.status})"
+
+
+class StockMovement(models.Model):
+    """Class to represent one change in the stock of a product.
+
+    Movements are only ever appended, and Product.quantity_available is kept as their
+    running total (see cart.ledger). The compact_stock_ledger command folds old
+    movements into StockCheckpoints.
+    """
+
+    PURCHASE = "purchase"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+    KINDS = [(PURCHASE, "Purchase"), (RESTOCK, "Restock"), (ADJUSTMENT, "Adjustment")]
+
+    # Like order lines, movements outlive the products and orders they refer to.
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+
+    quantity = models.IntegerField(
+        verbose_name="Change (kg)", help_text="Negative when stock goes out."
+    )
+
+    order = models.ForeignKey(
+        Order,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["product", "id"], name="stockmovement_product"),
+            models.Index(fields=["created"], name="stockmovement_time"),
+        ]
+
+    def __str__(self) -> str:
+        """Return String for representing a StockMovement object."""
+        return f"{self.get_kind_display()} of {self.quantity:+d}kg of product {self.product_id}"
+
+
+class StockCheckpoint(models.Model):
+    """Class to represent the stock of a product once every movement up to (and
+    including) `movement_id` has been folded in and removed from the ledger.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+
+    quantity = models.IntegerField(verbose_name=quantity_text)
+
+    movement_id = models.BigIntegerField(default=0)
+
+    updated = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        """Return String for representing a StockCheckpoint object."""
+        return f"{self.quantity}kg of product {self.product_id} at movement {self.movement_id}"
@@ -0,0 +1,105 @@
+"""Direct rendering of the checkout formset's rows from plain values.
+
+Rendering each row with `{{ form.as_p }}` builds a form, bound fields, widgets and a
+template context per field; on a large cart that is most of the page's time.
+`checkout_rows` produces the same HTML (and so the same POST data) for an unbound
+checkout formset by formatting the results of one values-only query.
+"""
+from dataclasses import dataclass
+from django.forms.formsets import (
+    INITIAL_FORM_COUNT,
+    MAX_NUM_FORM_COUNT,
+    MIN_NUM_FORM_COUNT,
+    TOTAL_FORM_COUNT,
+)
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+
+# Stands in for the cart item id while the item URLs are reversed, once per page.
+URL_PLACEHOLDER = 2147483647
+
+MANAGEMENT_INPUT = '<input type="hidden" name="{0}-{1}" value="{2}" id="id_{0}-{1}">'
+
+# What cart_checkout.html, trimmed (TRIMMED_TEMPLATES), renders for each form of the
+# formset.
+ROW = (
+    "\n"
+    "<p><label>{product_label}</label> "
+    '<span id="id_{prefix}-product" data-product="{product_id}">{product_name}</span>'
+    "</p>\n"
+    '<p><label for="id_{prefix}-purchase_quantity">{quantity_label}</label> '
+    '<input type="number" name="{prefix}-purchase_quantity" value="{quantity}" '
+    'min="0" id="id_{prefix}-purchase_quantity"></p>\n'
+    '<p><label for="id_{prefix}-price_per_kg">{price_label}</label> '
+    '<input type="number" name="{prefix}-price_per_kg" value="{price}" disabled '
+    'id="id_{prefix}-price_per_kg">'
+    '<input type="hidden" name="{prefix}-id" value="{pk}" id="id_{prefix}-id"></p>\n'
+    '<a href="{update_url}">Update Item</a>\n'
+    '<a href="{delete_url}" class="right">Remove Item</a>\n'
+    "<hr>\n"
+)
+
+
+@dataclass
+class CheckoutRows:
+    """The rendered management form and rows of a checkout, and its totals."""
+
+    management: SafeString
+    rows: SafeString
+    total_quantity: int
+    total_cost: int
+
+
+def checkout_rows(formset) -> CheckoutRows:
+    """Render the management form and the rows of an unbound checkout formset."""
+    fields = formset.form.base_fields
+    suffix = getattr(formset.form, "label_suffix", None) or ":"
+    labels = {
+        "product_label": escape(fields["product"].label) + suffix,
+        "quantity_label": escape(fields["purchase_quantity"].label) + suffix,
+        "price_label": escape(fields["price_per_kg"].label) + suffix,
+    }
+    update_url, delete_url = (
+        reverse(name, args=[URL_PLACEHOLDER]).replace(str(URL_PLACEHOLDER), "{}")
+        for name in ("update-cart-item", "delete-cart-item")
+    )
+
+    items = formset.queryset.order_by("pk").values_list(
+        "pk", "product_id", "product__name", "purchase_quantity", "price_per_kg"
+    )
+    rows = []
+    total_quantity = total_cost = 0
+    for i, (pk, product_id, product_name, quantity, price) in enumerate(items):
+        rows.append(
+            ROW.format(
+                prefix=f"{formset.prefix}-{i}",
+                product_id=product_id,
+                product_name=escape(product_name),
+                quantity=quantity,
+                price=price,
+                pk=pk,
+                update_url=update_url.format(pk),
+                delete_url=delete_url.format(pk),
+                **labels,
+            )
+        )
+        total_quantity += quantity
+        total_cost += quantity * price
+
+    management = "".join(
+        MANAGEMENT_INPUT.format(formset.prefix, name, value)
+        for name, value in (
+            (TOTAL_FORM_COUNT, len(rows)),
+            (INITIAL_FORM_COUNT, len(rows)),
+            (MIN_NUM_FORM_COUNT, formset.min_num),
+            (MAX_NUM_FORM_COUNT, formset.max_num),
+        )
+    )
+    return CheckoutRows(
+        management=mark_safe(management),
+        rows=mark_safe("".join(rows)),
+        total_quantity=total_quantity,
+        total_cost=total_cost,
+    )
@@ -0,0 +1,92 @@
+"""Backfill and verification of the DailySales rollups from the order lines.
+
+Checkout keeps DailySales up to date incrementally (see DailySales.add); this module
+recomputes the same totals from OrderLine, for days whose lines have not yet been
+archived. archive_orders archives whole days, so the day of the oldest order line
+left is complete.
+"""
+import datetime
+from typing import Dict, List, Optional, Tuple
+from django.db import router, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from cart.models import DailySales, OrderLine
+
+
+Totals = Dict[Tuple[int, datetime.date], Tuple[int, int]]
+
+
+def oldest_day(using: Optional[str] = None) -> Optional[datetime.date]:
+    """Return the day of the oldest order line still in the database."""
+    line = OrderLine.objects.using(using).order_by("created").first()
+    return timezone.localdate(line.created) if line else None
+
+
+def expected(since: datetime.date, using: Optional[str] = None) -> Totals:
+    """Return the (kg sold, revenue) of each product and day from `since` onwards,
+    computed from the order lines.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(since, datetime.time()))
+    rows = (
+        OrderLine.objects.using(using)
+        .filter(created__gte=start, product__isnull=False)
+        .annotate(day=TruncDate("created", tzinfo=timezone.get_current_timezone()))
+        .values("product_id", "day")
+        .annotate(
+            kg_sold=Sum("quantity"), revenue=Sum(F("quantity") * F("price_per_kg"))
+        )
+        .order_by()
+    )
+    return {
+        (row["product_id"], row["day"]): (row["kg_sold"], row["revenue"])
+        for row in rows
+    }
+
+
+def actual(since: datetime.date, using: Optional[str] = None) -> Totals:
+    """Return the (kg sold, revenue) of each product and day from `since` onwards, as
+    stored in DailySales.
+    """
+    return {
+        (product, day): (kg_sold, revenue)
+        for product, day, kg_sold, revenue in DailySales.objects.using(using)
+        .filter(day__gte=since)
+        .values_list("product_id", "day", "kg_sold", "revenue")
+    }
+
+
+def verify(since: Optional[datetime.date] = None, using: Optional[str] = None) -> List:
+    """Return (product id, day, expected, stored) for every rollup that does not match
+    the order lines from `since` (default: the oldest order line) onwards.
+    """
+    since = since or oldest_day(using)
+    if since is None:
+        return []
+    wanted, stored = expected(since, using), actual(since, using)
+    return [
+        (product, day, wanted.get((product, day)), stored.get((product, day)))
+        for product, day in sorted(wanted.keys() | stored.keys())
+        if wanted.get((product, day)) != stored.get((product, day))
+    ]
+
+
+def rebuild(since: Optional[datetime.date] = None, using: Optional[str] = None) -> int:
+    """Replace the rollups from `since` (default: the oldest order line) onwards with
+    totals computed from the order lines, and return how many were written. Rollups of
+    earlier, archived days are kept.
+    """
+    using = using or router.db_for_write(DailySales)
+    since = since or oldest_day(using)
+    if since is None:
+        return 0
+    with transaction.atomic(using=using):
+        DailySales.objects.using(using).filter(day__gte=since).delete()
+        rows = DailySales.objects.using(using).bulk_create(
+            (
+                DailySales(product_id=product, day=day, kg_sold=kg, revenue=revenue)
+                for (product, day), (kg, revenue) in expected(since, using).items()
+            ),
+            batch_size=1000,
+        )
+    return len(rows)
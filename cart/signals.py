@@ -0,0 +1,7 @@
+"""Signals sent by the cart app."""
+from django.dispatch import Signal
+
+
+# Sent with `changes`, a {product id: change in quantity_available} dict, when stock is
+# changed in bulk (and so without post_save signals), e.g. by a checkout.
+stock_changed = Signal()
@@ -0,0 +1,30 @@
+/* Live stock and prices on the checkout page, from the stock event stream
+   (cart/events.py). Each stock event maps product ids to [quantity, price], or to
+   null once a product is gone. */
+(function () {
+    var form = document.querySelector("form[data-events]");
+    if (!form || !window.EventSource) {
+        return;
+    }
+    var source = new EventSource(form.dataset.events);
+    source.addEventListener("stock", function (event) {
+        var deltas = JSON.parse(event.data);
+        var products = form.querySelectorAll("[data-product]");
+        Array.prototype.forEach.call(products, function (product) {
+            var id = product.dataset.product;
+            if (!(id in deltas)) {
+                return;
+            }
+            var delta = deltas[id] || [0, null];
+            // id_<prefix>product, the id of the field.
+            var prefix = product.id.slice("id_".length, -"product".length);
+            var quantity = form.elements[prefix + "purchase_quantity"];
+            var price = form.elements[prefix + "price_per_kg"];
+            // The browser then refuses to submit more than is left.
+            quantity.max = delta[0];
+            var changed = delta[1] !== null && String(delta[1]) !== price.value;
+            price.classList.toggle("stale", changed);
+            price.title = changed ? "Now " + delta[1] + " AED per kg" : "";
+        });
+    });
+})();
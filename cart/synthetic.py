@@ -0,0 +1,135 @@
+"""Reproducible, production-scale synthetic catalogs and carts for load testing."""
+import random
+from typing import Dict, List, Optional
+from django.db import connections, router, transaction
+from django.db.models import Max
+from cart.models import (
+    Cart,
+    DailySales,
+    OrderLine,
+    Product,
+    StockAlert,
+    StockCheckpoint,
+    StockMovement,
+)
+
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def skewed_index(rng: random.Random, size: int, skew: float) -> int:
+    """Return an index in [0, size) where low indexes are picked far more often,
+    approximating the long tail of real product popularity (skew=0 is uniform).
+    """
+    return min(int(size * rng.random() ** (1 + skew)), size - 1)
+
+
+def _batches(iterable: List, batch_size: int):
+    for start in range(0, len(iterable), batch_size):
+        yield iterable[start : start + batch_size]
+
+
+def generate(
+    products: int,
+    cart_lines: int = 0,
+    seed: int = 0,
+    skew: float = 2.0,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    clear: bool = False,
+    using: Optional[str] = None,
+) -> Dict[str, int]:
+    """Insert `products` synthetic Product rows and `cart_lines` Cart rows for them.
+
+    The same seed always produces the same catalog and cart. Prices and stock follow
+    heavy tailed distributions, and cart lines favour the popular (low rank) products.
+    Everything is inserted with batched bulk_create inside a single transaction.
+    """
+    if cart_lines > products:
+        raise ValueError("A cart can hold at most one line per product.")
+
+    rng = random.Random(seed)
+    using = using or router.db_for_write(Product)
+    products_qs = Product.objects.using(using)
+    cart_qs = Cart.objects.using(using)
+
+    with transaction.atomic(using=using):
+        # New products get ids past every product the orders and sales rollups (which
+        # outlive a clear) know of, so their history isn't attributed to them.
+        first_id = 1 + max(
+            qs.using(using).aggregate(last=Max(field))["last"] or 0
+            for qs, field in (
+                (Product.objects, "id"),
+                (OrderLine.objects, "product_id"),
+                (DailySales.objects, "product_id"),
+            )
+        )
+        if clear:
+            # A plain DELETE; the ORM would load and cascade over every row first.
+            with connections[using].cursor() as cursor:
+                for model in (
+                    Cart,
+                    StockAlert,
+                    StockMovement,
+                    StockCheckpoint,
+                    Product,
+                ):
+                    cursor.execute(f"DELETE FROM {model._meta.db_table}")
+
+        stock = []
+        prices = []
+        for _ in range(products):
+            # Roughly 2% of the catalog is out of stock, the rest is Pareto distributed.
+            stock.append(0 if rng.random() < 0.02 else int(rng.paretovariate(1.2) * 5))
+            prices.append(max(1, int(rng.paretovariate(1.5) * 3)))
+
+        for batch in _batches(range(products), batch_size):
+            products_qs.bulk_create(
+                [
+                    Product(
+                        id=first_id + i,
+                        name=f"Product {first_id + i:07d}",
+                        quantity_available=stock[i],
+                        price_per_kg=prices[i],
+                    )
+                    for i in batch
+                ],
+                batch_size=batch_size,
+            )
+
+        ids = range(first_id, first_id + products)
+
+        # The products' ledgers start from their initial stock (see cart.ledger).
+        checkpoints = StockCheckpoint.objects.using(using)
+        for batch in _batches(range(products), batch_size):
+            checkpoints.bulk_create(
+                [StockCheckpoint(product_id=ids[i], quantity=stock[i]) for i in batch],
+                batch_size=batch_size,
+            )
+
+        in_stock = sum(1 for quantity in stock if quantity > 0)
+        if cart_lines * 2 > in_stock:
+            # Skewed sampling would rarely reach the tail; pick uniformly instead.
+            chosen = set(rng.sample(range(products), cart_lines))
+        else:
+            chosen = set()
+            while len(chosen) < cart_lines:
+                index = skewed_index(rng, products, skew)
+                # Keep a few unfulfillable lines so stock validation is exercised.
+                if stock[index] > 0 or rng.random() < 0.05:
+                    chosen.add(index)
+
+        lines = sorted(chosen)
+        for batch in _batches(lines, batch_size):
+            cart_qs.bulk_create(
+                [
+                    Cart(
+                        product_id=ids[i],
+                        purchase_quantity=rng.randint(1, max(1, min(stock[i], 10))),
+                        price_per_kg=prices[i],
+                    )
+                    for i in batch
+                ],
+                batch_size=batch_size,
+            )
+
+    return {"products": products, "cart_lines": len(lines)}
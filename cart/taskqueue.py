@@ -0,0 +1,215 @@
+"""A small database backed task queue for work that can happen after a response.
+
+    @taskqueue.task(max_attempts=3)
+    def send_receipt(order_id):
+        ...
+
+    send_receipt.enqueue(order.pk)
+
+`enqueue` inserts a Task row in the caller's transaction, so a task exists if and
+only if the work that asked for it committed. On commit, up to TASK_THREADS threads
+of the web process start draining the queue; `python manage.py run_tasks` runs
+dedicated workers too. Identical tasks (same name and arguments) are coalesced while
+pending, tasks declared with `batch=True` are run once per claimed batch with the
+arguments of every task in it, and failures are retried with exponential backoff.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import traceback
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from cart.models import Task
+from shoply import metrics
+
+
+logger = logging.getLogger(__name__)
+
+metrics.register(
+    "shoply_tasks_total",
+    "counter",
+    "Background tasks run, by task and result (ok, retry or failed).",
+)
+
+
+class TaskFunction:
+    """A function that can be called directly, or enqueued to run in the background."""
+
+    def __init__(
+        self,
+        func: Callable,
+        name: str,
+        max_attempts: int,
+        retry_delay: float,
+        batch: bool,
+    ) -> None:
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.batch = batch
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def enqueue(self, *args, delay: float = 0) -> None:
+        """Queue a run with `args` (JSON serializable) once the current transaction
+        commits. Does nothing if an identical run is already pending.
+        """
+        key = hashlib.sha256(
+            json.dumps([self.name, args], sort_keys=True).encode()
+        ).hexdigest()
+        Task.objects.bulk_create(
+            [
+                Task(
+                    name=self.name,
+                    args=list(args),
+                    key=key,
+                    run_after=timezone.now() + datetime.timedelta(seconds=delay),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(wake)
+
+
+registry: Dict[str, TaskFunction] = {}
+
+
+def task(
+    max_attempts: int = 3, retry_delay: float = 1.0, batch: bool = False
+) -> Callable[[Callable], TaskFunction]:
+    """Register a function as a task. A `batch` task is called with a list holding
+    the arguments (as a list) of each run in a batch.
+    """
+
+    def decorator(func: Callable) -> TaskFunction:
+        name = f"{func.__module__}.{func.__qualname__}"
+        registry[name] = TaskFunction(func, name, max_attempts, retry_delay, batch)
+        return registry[name]
+
+    return decorator
+
+
+def claim(batch_size: int, lease: float) -> List[Task]:
+    """Take up to `batch_size` due tasks, or tasks whose worker let its lease expire,
+    for this worker. A single UPDATE claims them, so no two workers get the same one.
+    """
+    now = timezone.now()
+    due = Q(status=Task.PENDING, run_after__lte=now) | Q(
+        status=Task.RUNNING, locked_until__lt=now
+    )
+    token = uuid.uuid4().hex
+    ids = Task.objects.filter(due).order_by("run_after", "id").values("id")
+    claimed = Task.objects.filter(due, id__in=ids[:batch_size]).update(
+        status=Task.RUNNING,
+        locked_by=token,
+        locked_until=now + datetime.timedelta(seconds=lease),
+    )
+    if not claimed:
+        return []
+    return list(Task.objects.filter(locked_by=token, status=Task.RUNNING))
+
+
+def _finish(tasks: List[Task], error: Optional[str]) -> None:
+    """Delete tasks that ran, and reschedule or fail the ones that raised."""
+    if error is None:
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).delete()
+        for t in tasks:
+            metrics.inc("shoply_tasks_total", task=t.name, result="ok")
+        return
+
+    now = timezone.now()
+    for t in tasks:
+        definition = registry.get(t.name)
+        t.attempts += 1
+        t.last_error = error
+        t.locked_by = ""
+        t.locked_until = None
+        if definition is None or t.attempts >= definition.max_attempts:
+            t.status = Task.FAILED
+            metrics.inc("shoply_tasks_total", task=t.name, result="failed")
+            logger.error("Task %s failed for good: %s", t, error.splitlines()[-1])
+            t.save()
+            continue
+
+        t.status = Task.PENDING
+        delay = definition.retry_delay * 2 ** (t.attempts - 1)
+        t.run_after = now + datetime.timedelta(seconds=delay)
+        metrics.inc("shoply_tasks_total", task=t.name, result="retry")
+        try:
+            with transaction.atomic():
+                t.save()
+        except IntegrityError:
+            # An identical task was enqueued meanwhile; it will do the work.
+            Task.objects.filter(pk=t.pk).delete()
+
+
+def _run(definition: Optional[TaskFunction], tasks: List[Task]) -> Optional[str]:
+    """Run claimed tasks of one name, returning the error they raised, if any."""
+    if definition is None:
+        return f"Unknown task {tasks[0].name}"
+    try:
+        with transaction.atomic():
+            if definition.batch:
+                definition.func([t.args for t in tasks])
+            else:
+                for t in tasks:
+                    definition.func(*t.args)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def run_pending(batch_size: Optional[int] = None, lease: Optional[float] = None) -> int:
+    """Claim and run one batch of due tasks, returning how many there were."""
+    batch_size = batch_size or settings.TASK_BATCH_SIZE
+    lease = lease or settings.TASK_LEASE_SECONDS
+    tasks = claim(batch_size, lease)
+
+    by_name = defaultdict(list)
+    for t in tasks:
+        by_name[t.name].append(t)
+    for name, group in by_name.items():
+        definition = registry.get(name)
+        if definition is not None and not definition.batch:
+            # Run separately, so one failing run doesn't retry the others.
+            for t in group:
+                _finish([t], _run(definition, [t]))
+        else:
+            _finish(group, _run(definition, group))
+    return len(tasks)
+
+
+_drainers = 0
+_drainers_lock = threading.Lock()
+
+
+def _drain() -> None:
+    global _drainers
+    try:
+        while run_pending():
+            pass
+    except Exception:
+        logger.exception("Background task runner crashed")
+    finally:
+        connections.close_all()
+        with _drainers_lock:
+            _drainers -= 1
+
+
+def wake() -> None:
+    """Start a thread draining the queue, unless TASK_THREADS are already at it."""
+    global _drainers
+    with _drainers_lock:
+        if _drainers >= settings.TASK_THREADS:
+            return
+        _drainers += 1
+    threading.Thread(target=_drain, name="shoply-tasks", daemon=True).start()
@@ -0,0 +1,9 @@
+"""Background tasks of the cart app, run by cart.taskqueue."""
+from typing import List
+from cart import alerts, taskqueue
+
+
+@taskqueue.task(batch=True)
+def evaluate_stock_alerts(batch: List[list]) -> None:
+    """Evaluate the stock alerts of the products sold by a batch of checkouts."""
+    alerts.evaluate(pk for (product_ids,) in batch for pk in product_ids)
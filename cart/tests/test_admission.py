@@ -0,0 +1,127 @@
+"""Test Classes for admission control of the write views."""
+import threading
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import Cart
+from shoply import admission, metrics
+
+
+class LimiterTest(SimpleTestCase):
+    """Tests for the bounded concurrency limiter."""
+
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def hold_slot(self, limiter: admission.Limiter):
+        """Occupy a slot from another thread until the returned event is set."""
+        entered, release = threading.Event(), threading.Event()
+
+        def run():
+            with limiter.admit():
+                entered.set()
+                release.wait()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        entered.wait()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        return release
+
+    def test_full_queue_is_shed_at_once(self):
+        """Test that a request is turned away when no slot or queue space is free."""
+        limiter = admission.Limiter("test", concurrency=1, queue=0, timeout=10)
+        self.hold_slot(limiter)
+
+        with self.assertRaises(admission.Overloaded) as cm:
+            with limiter.admit():
+                pass
+        self.assertEqual(cm.exception.reason, "queue_full")
+
+    def test_waiting_request_times_out(self):
+        """Test that a queued request gives up after the timeout."""
+        limiter = admission.Limiter("test", concurrency=1, queue=1, timeout=0.05)
+        self.hold_slot(limiter)
+
+        with self.assertRaises(admission.Overloaded) as cm:
+            with limiter.admit():
+                pass
+        self.assertEqual(cm.exception.reason, "timeout")
+        self.assertEqual(limiter.waiting, 0)
+        self.assertIn(
+            'shoply_admission_shed_total{pool="test",reason="timeout"} 1',
+            metrics.render(*metrics.collect()),
+        )
+
+    def test_waiting_request_gets_the_freed_slot(self):
+        """Test that a queued request runs once a slot is released."""
+        limiter = admission.Limiter("test", concurrency=1, queue=1, timeout=10)
+        release = self.hold_slot(limiter)
+        threading.Timer(0.05, release.set).start()
+
+        with limiter.admit():
+            self.assertEqual(limiter.active, 1)
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+
+
+@override_settings(
+    ADMISSION_POOLS={"writes": {"concurrency": 0, "queue": 0}},
+)
+class AdmissionControlViewTest(TestCase):
+    """Tests for shedding writes when the writes pool is saturated."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        metrics.reset()
+
+    def test_checkout_is_shed_with_retry_after(self):
+        """Test that a checkout that can't be admitted gets a 503 and writes nothing."""
+        data = {
+            "form-TOTAL_FORMS": 3,
+            "form-INITIAL_FORMS": 3,
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+        }
+        data.update({f"form-{i}-id": pk for i, pk in enumerate([1, 2, 3])})
+
+        response = self.client.post(reverse("cart-list"), data=data)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertIn(
+            'shoply_admission_shed_total{pool="writes",reason="queue_full"} 1',
+            metrics.render(*metrics.collect()),
+        )
+
+    def test_shed_checkout_makes_no_queries(self):
+        """Test that a checkout is shed before its formset is validated or its
+        idempotency key claimed.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("cart-list"),
+                data={"form-TOTAL_FORMS": 0, "form-INITIAL_FORMS": 0},
+                HTTP_IDEMPOTENCY_KEY="shed",
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(queries.captured_queries, [])
+
+    def test_item_writes_are_shed(self):
+        """Test that the other write views are limited too."""
+        update = self.client.post(
+            reverse("update-cart-item", args=[1]), {"purchase_quantity": 1}
+        )
+        delete = self.client.post(reverse("delete-cart-item", args=[1]))
+
+        self.assertEqual((update.status_code, delete.status_code), (503, 503))
+        self.assertEqual(Cart.objects.count(), 3)
+
+    def test_reads_are_not_limited(self):
+        """Test that pages are still served while writes are shed."""
+        self.assertEqual(self.client.get(reverse("cart-list")).status_code, 200)
@@ -0,0 +1,122 @@
+"""Test Classes for the low stock alerts."""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls.base import reverse
+from cart import alerts, taskqueue
+from cart.db_init import initialize_database
+from cart.models import Cart, Product, StockAlert
+from shoply import metrics
+
+
+@override_settings(LOW_STOCK_THRESHOLD=5)
+class StockAlertTest(TestCase):
+    """Tests for raising and resolving stock alerts as stock changes."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        metrics.reset()
+        self.potatoes = Product.objects.get(name="Potatoes")
+
+    def set_stock(self, quantity: int) -> None:
+        self.potatoes.quantity_available = quantity
+        self.potatoes.save()
+
+    def open_alert(self):
+        return StockAlert.objects.filter(product=self.potatoes, resolved__isnull=True)
+
+    def test_saving_low_stock_opens_an_alert(self):
+        """Test that falling to the threshold opens a low stock alert."""
+        self.set_stock(6)
+        self.assertFalse(self.open_alert().exists())
+
+        with self.assertLogs("cart.alerts", "INFO") as logs:
+            self.set_stock(5)
+        alert = self.open_alert().get()
+        self.assertEqual((alert.level, alert.quantity_available), (StockAlert.LOW, 5))
+        self.assertIn("Low stock: Potatoes has 5kg left", logs.output[0])
+
+    def test_alert_is_updated_escalated_and_resolved(self):
+        """Test that one alert follows the stock until the product is restocked."""
+        self.set_stock(4)
+        self.set_stock(3)
+        self.assertEqual(self.open_alert().get().quantity_available, 3)
+
+        self.set_stock(0)
+        self.assertEqual(self.open_alert().get().level, StockAlert.OUT)
+
+        self.set_stock(50)
+        self.assertFalse(self.open_alert().exists())
+        self.assertEqual(StockAlert.objects.filter(product=self.potatoes).count(), 1)
+        self.assertIn(
+            'shoply_stock_alerts_total{level="out"} 1',
+            metrics.render(*metrics.collect()),
+        )
+
+    def test_product_threshold_overrides_the_default(self):
+        """Test that a product's own threshold is used when it has one."""
+        self.potatoes.low_stock_threshold = 20
+        self.set_stock(10)
+
+        self.assertEqual(self.open_alert().get().threshold, 20)
+
+    def test_checkout_evaluates_only_the_products_sold(self):
+        """Test that checkout alerts on the products it sold."""
+        Cart.objects.exclude(product=self.potatoes).delete()
+        Product.objects.filter(pk=self.potatoes.pk).update(quantity_available=6)
+        data = {
+            "form-TOTAL_FORMS": 1,
+            "form-INITIAL_FORMS": 1,
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+            "form-0-id": Cart.objects.get().pk,
+        }
+
+        with self.captureOnCommitCallbacks():
+            self.client.post(reverse("cart-list"), data=data)
+        # Alerts are evaluated by a background task after the checkout commits.
+        self.assertFalse(self.open_alert().exists())
+        taskqueue.run_pending()
+
+        self.assertEqual(self.open_alert().get().quantity_available, 4)
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+    def test_evaluating_unchanged_products_writes_nothing(self):
+        """Test that an up to date alert costs only the two lookups."""
+        self.set_stock(3)
+        with self.assertNumQueries(2):
+            alerts.evaluate([self.potatoes.pk])
+
+
+@override_settings(LOW_STOCK_THRESHOLD=5)
+class StockAlertAdminTest(TestCase):
+    """Tests for the stock alert filters in the admin."""
+
+    def setUp(self) -> None:
+        """Set up Database objects, alerts and an admin login."""
+        initialize_database()
+        Product.objects.filter(name="Potatoes").update(quantity_available=0)
+        Product.objects.filter(name="Carrots").update(quantity_available=3)
+        alerts.evaluate(Product.objects.values_list("pk", flat=True))
+        user = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(user)
+
+    def filtered_products(self, value):
+        response = self.client.get(
+            reverse("admin:cart_product_changelist"), {"stock_alert": value}
+        )
+        return sorted(p.name for p in response.context["cl"].result_list)
+
+    def test_product_filter(self):
+        """Test filtering the product list by open stock alert."""
+        self.assertEqual(self.filtered_products("any"), ["Carrots", "Potatoes"])
+        self.assertEqual(self.filtered_products("out"), ["Potatoes"])
+        self.assertEqual(self.filtered_products("low"), ["Carrots"])
+
+    def test_alert_list(self):
+        """Test that the open alerts are listed in the admin."""
+        response = self.client.get(
+            reverse("admin:cart_stockalert_changelist"), {"open": "1"}
+        )
+
+        self.assertEqual(response.context["cl"].result_count, 2)
@@ -0,0 +1,126 @@
+"""Test Classes for the sales and inventory analytics."""
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls.base import reverse
+from django.utils import timezone
+from cart import analytics
+from cart.db_init import initialize_database
+from cart.models import Cart, Order, OrderLine, Product
+
+
+def sell(product: Product, quantity: int, days_ago: int) -> None:
+    """Record an order of `quantity` kg of the product placed `days_ago` days ago."""
+    created = timezone.now() - datetime.timedelta(days=days_ago)
+    order = Order.objects.create(created=created, total=quantity * product.price_per_kg)
+    OrderLine.objects.create(
+        order=order,
+        created=created,
+        product=product,
+        product_name=product.name,
+        quantity=quantity,
+        price_per_kg=product.price_per_kg,
+    )
+
+
+class AnalyticsTest(TestCase):
+    """Tests for the rollups computed by cart.analytics."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and some sales."""
+        initialize_database()
+        cache.clear()
+        self.potatoes, self.carrots, self.onions = Product.objects.all()
+        sell(self.potatoes, 2, days_ago=0)
+        sell(self.potatoes, 3, days_ago=1)
+        sell(self.carrots, 4, days_ago=1)
+        sell(self.carrots, 100, days_ago=40)
+
+    def test_daily_revenue(self):
+        """Test that revenue is summed per day, with zeros for days without sales."""
+        report = analytics.compute(days=7, chunk_size=2)
+        price = {p: p.price_per_kg for p in (self.potatoes, self.carrots)}
+
+        self.assertEqual(len(report.dates), 7)
+        self.assertEqual(report.dates[-1], timezone.localdate())
+        self.assertEqual(report.revenue[-1], 2 * price[self.potatoes])
+        self.assertEqual(
+            report.revenue[-2], 3 * price[self.potatoes] + 4 * price[self.carrots]
+        )
+        self.assertEqual(report.revenue[:-2].sum(), 0)
+
+    def test_product_rollups(self):
+        """Test kg sold, sell-through and days of stock for every product."""
+        report = analytics.compute(days=10)
+
+        self.assertEqual(
+            report.product_ids.tolist(),
+            [self.potatoes.pk, self.carrots.pk, self.onions.pk],
+        )
+        self.assertEqual(report.kg_sold.tolist(), [5, 4, 0])
+        self.assertAlmostEqual(report.sell_through[0], 5 / (5 + 10))
+        self.assertAlmostEqual(report.days_of_stock[1], 6 / (4 / 10))
+        self.assertEqual(report.days_of_stock[2], float("inf"))
+        self.assertEqual(
+            [row["name"] for row in report.rows(report.top(report.kg_sold, 2))],
+            ["Potatoes", "Carrots"],
+        )
+
+    def test_sales_of_removed_products_count_towards_revenue(self):
+        """Test that lines without a product still count towards revenue only."""
+        Cart.objects.all().delete()
+        self.potatoes.delete()
+        report = analytics.compute(days=10)
+
+        self.assertEqual(report.product_ids.tolist(), [self.carrots.pk, self.onions.pk])
+        self.assertEqual(report.kg_sold.tolist(), [4, 0])
+        self.assertEqual(
+            report.total_revenue,
+            5 * self.potatoes.price_per_kg + 4 * self.carrots.price_per_kg,
+        )
+
+    def test_report_is_cached_until_an_order_is_placed(self):
+        """Test that the report is only recomputed after a new order."""
+        first = analytics.report(days=10)
+        with self.assertNumQueries(1):
+            cached = analytics.report(days=10)
+        self.assertEqual(cached.kg_sold.tolist(), first.kg_sold.tolist())
+
+        sell(self.onions, 1, days_ago=0)
+        self.assertEqual(analytics.report(days=10).kg_sold.tolist(), [5, 4, 1])
+
+    def test_a_new_report_replaces_the_stale_one(self):
+        """Test that a period's report is cached under a single key."""
+        analytics.report(days=10)
+        sell(self.onions, 1, days_ago=0)
+        analytics.report(days=10)
+
+        self.assertEqual(
+            [key for key in cache._cache if "cart:analytics" in key],
+            [cache.make_key("cart:analytics:10")],
+        )
+
+
+class SalesReportAdminTest(TestCase):
+    """Tests for the sales report admin page."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and log in as an admin."""
+        initialize_database()
+        cache.clear()
+        sell(Product.objects.first(), 2, days_ago=0)
+        user = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(user)
+
+    def test_report_page(self):
+        """Test that the report lists the best sellers and is linked from orders."""
+        url = reverse("admin:cart_order_report")
+        response = self.client.get(url, {"days": 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["days"], 7)
+        self.assertEqual(response.context["best_sellers"][0]["name"], "Potatoes")
+        self.assertContains(
+            self.client.get(reverse("admin:cart_order_changelist")), url
+        )
@@ -0,0 +1,70 @@
+"""Test Classes for the route benchmark helpers."""
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from cart import benchmarks, synthetic
+from cart.benchmarks import compare
+from cart.models import Cart
+
+
+def result(**measurements):
+    base = {"route": "cart-list", "method": "GET", "products": 10, "cart_lines": 2}
+    base.update({"p50_ms": 10.0, "peak_kib": 100.0, "queries": 5})
+    base.update(measurements)
+    return base
+
+
+class CompareTest(SimpleTestCase):
+    """Tests for comparing benchmark results against a baseline."""
+
+    def test_no_regression_within_tolerance(self):
+        """Test that growth within the tolerance is not flagged."""
+        self.assertEqual(compare([result(p50_ms=11.5)], [result()], 0.2), [])
+
+    def test_latency_and_memory_regressions(self):
+        """Test that latency and memory growth beyond the tolerance is flagged."""
+        regressions = compare([result(p50_ms=13, peak_kib=200)], [result()], 0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("p50_ms 10.0 -> 13", regressions[0])
+
+    def test_any_extra_query_is_a_regression(self):
+        """Test that a single additional query is flagged."""
+        regressions = compare([result(queries=6)], [result()], 0.2)
+
+        self.assertEqual(
+            regressions, ["GET cart-list (10 products, 2 lines): queries 5 -> 6"]
+        )
+
+    def test_results_missing_from_baseline_are_ignored(self):
+        """Test that new routes or sizes don't count as regressions."""
+        self.assertEqual(compare([result(products=99)], [result()], 0.2), [])
+
+
+@override_settings(TASK_THREADS=0)
+class RunTest(TestCase):
+    """Smoke tests for running the route benchmarks."""
+
+    def test_every_scenario_is_measured(self):
+        """Test that every route is measured, and its writes rolled back."""
+        results = benchmarks.run([(20, 5)], iterations=2)
+
+        self.assertEqual(
+            [(r["route"], r["method"]) for r in results],
+            [(route, method) for route, method, *_ in benchmarks.scenarios()],
+        )
+        self.assertTrue(all(r["bytes"] > 0 for r in results if r["method"] == "GET"))
+        self.assertEqual(Cart.objects.count(), 5)
+
+    def test_a_post_without_its_redirect_fails(self):
+        """Test that a POST answered with form errors (the product is already in
+        the cart) doesn't pass as a success.
+        """
+        synthetic.generate(20, 5)
+        with self.assertRaises(RuntimeError):
+            benchmarks.run_request(
+                Client(),
+                "POST",
+                reverse("create-cart-item"),
+                {"product": Cart.objects.first().product_id, "purchase_quantity": 1},
+                reverse("cart-list"),
+            )
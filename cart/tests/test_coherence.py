@@ -0,0 +1,187 @@
+"""Test Classes for keeping per-process caches coherent across processes."""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from cart import coherence
+
+
+class InvalidationLogTest(TestCase):
+    """Tests for announcing changes and applying the ones of other processes."""
+
+    def setUp(self) -> None:
+        """Log to a scratch file, and record what a test handler is called with."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = os.path.join(directory.name, "invalidations.log")
+        log_setting = override_settings(CACHE_INVALIDATION_LOG=self.log)
+        log_setting.enable()
+        self.addCleanup(log_setting.disable)
+
+        self.calls = []
+        coherence.register("test", self.calls.append)
+        self.addCleanup(coherence._handlers.pop, "test")
+        # Catch up with the new log, which drops every cache.
+        coherence.check()
+        self.calls.clear()
+
+    def append(self, namespace="test", keys=None, origin="other"):
+        coherence._append({"origin": origin, "namespace": namespace, "keys": keys})
+
+    def test_changes_of_other_processes_are_applied(self):
+        """Test that the keys logged since the last check are passed on once."""
+        self.append(keys=[3, 1])
+        self.append(keys=[2, 3])
+        self.append(namespace="unknown", keys=[9])
+
+        coherence.check()
+        coherence.check()
+
+        self.assertEqual(self.calls, [[1, 2, 3]])
+
+    def test_whole_namespace_invalidation_wins(self):
+        """Test that a change of everything isn't narrowed down by other lines."""
+        self.append(keys=[1])
+        self.append(keys=None)
+        self.append(keys=[2])
+
+        coherence.check()
+
+        self.assertEqual(self.calls, [None])
+
+    def test_own_changes_are_skipped(self):
+        """Test that a process doesn't invalidate what it already updated itself."""
+        with self.captureOnCommitCallbacks(execute=True):
+            coherence.invalidate("test", [5])
+        self.append(keys=[6])
+
+        coherence.check()
+
+        self.assertEqual(self.calls, [[6]])
+        with open(self.log) as f:
+            self.assertEqual(json.loads(f.readlines()[1])["keys"], [5])
+
+    def test_changes_are_logged_only_on_commit(self):
+        """Test that a transaction that doesn't commit announces nothing."""
+        coherence.invalidate("test", [5])
+
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_partial_lines_wait_for_the_next_check(self):
+        """Test that a line still being written is read once it is complete."""
+        self.append(keys=[3])
+        with open(self.log, "a") as f:
+            f.write('{"origin": "other", "namespace": "test", ')
+        coherence.check()
+        with open(self.log, "a") as f:
+            f.write('"keys": [4]}\n')
+        coherence.check()
+
+        self.assertEqual(self.calls, [[3], [4]])
+
+    @override_settings(CACHE_INVALIDATION_LOG_MAX_BYTES=200)
+    def test_new_log_drops_every_cache(self):
+        """Test that starting a new log makes the readers drop what they cached."""
+        self.append(keys=[1])
+        coherence.check()
+        for key in range(10):
+            self.append(keys=[key])
+
+        coherence.check()
+
+        self.assertEqual(self.calls, [[1], None])
+        self.assertLess(os.path.getsize(self.log), 200)
+
+
+# Runs in a worker process: load the snapshot, then handle "requests" until the
+# product's price changes, and print when it did.
+WORKER = """
+import sys, time
+import django
+django.setup()
+from django.core.signals import request_started
+from cart import inventory
+
+pk, price = int(sys.argv[1]), int(sys.argv[2])
+assert inventory.prices([pk])[pk] != price
+print("ready", flush=True)
+deadline = time.time() + 30
+while inventory.prices([pk])[pk] != price and time.time() < deadline:
+    time.sleep(0.001)
+    request_started.send(sender=None)
+print(time.time(), flush=True)
+"""
+
+# Runs in another process: change the product's price as the admin would.
+WRITER = """
+import sys, time
+import django
+django.setup()
+from cart.models import Product
+
+product = Product.objects.get(pk=int(sys.argv[1]))
+product.price_per_kg = int(sys.argv[2])
+product.save()
+print(time.time(), flush=True)
+"""
+
+
+class MultiProcessConvergenceTest(SimpleTestCase):
+    """Tests for a change reaching several worker processes."""
+
+    WORKERS = 4
+
+    def setUp(self) -> None:
+        """Set up a database file and an invalidation log for the processes."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "shoply.settings",
+            "SHOPLY_DB_NAME": os.path.join(directory.name, "db.sqlite3"),
+            "SHOPLY_CACHE_INVALIDATION_LOG": os.path.join(directory.name, "log"),
+            # Only the log can bring the change within the test.
+            "SHOPLY_INVENTORY_SNAPSHOT_MAX_AGE": "3600",
+            "SHOPLY_TASK_THREADS": "0",
+        }
+        for command in (["migrate", "-v0"], ["seed_database"]):
+            self.run_python([os.path.join(settings.BASE_DIR, "manage.py"), *command])
+
+    def run_python(self, args):
+        return subprocess.run(
+            [sys.executable, *args],
+            cwd=settings.BASE_DIR,
+            env=self.env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    def test_price_change_reaches_every_worker(self):
+        """Test that every worker sees an edited price within a fraction of a second."""
+        workers = [
+            subprocess.Popen(
+                [sys.executable, "-c", WORKER, "1", "42"],
+                cwd=settings.BASE_DIR,
+                env=self.env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(self.WORKERS)
+        ]
+        try:
+            for worker in workers:
+                self.assertEqual(worker.stdout.readline().strip(), "ready")
+
+            changed_at = float(self.run_python(["-c", WRITER, "1", "42"]))
+            seen_at = [float(worker.communicate(timeout=60)[0]) for worker in workers]
+        finally:
+            for worker in workers:
+                worker.kill()
+                worker.wait()
+
+        convergence = max(seen_at) - changed_at
+        self.assertLess(convergence, 1.0)
@@ -0,0 +1,82 @@
+"""Test Classes for the management commands."""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from cart.models import Cart, Order, OrderLine, Product, StockAlert
+
+
+class SeedDatabaseCommandTest(TestCase):
+    """Tests for the seed_database command."""
+
+    def test_seeds_products_and_cart_items(self):
+        """Test that the command creates the initial records."""
+        call_command("seed_database", stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Cart.objects.count(), 3)
+
+    def test_running_twice_is_a_no_op(self):
+        """Test that seeding an already seeded database creates nothing new."""
+        call_command("seed_database", stdout=StringIO())
+        out = StringIO()
+        call_command("seed_database", stdout=out)
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertIn("already seeded", out.getvalue())
+
+
+class GenerateLoadDataCommandTest(TestCase):
+    """Tests for the generate_load_data command."""
+
+    def generate(self, **options):
+        call_command("generate_load_data", clear=True, stdout=StringIO(), **options)
+        return list(Product.objects.values_list("quantity_available", "price_per_kg"))
+
+    def test_generates_requested_rows(self):
+        """Test that the catalog and cart have the requested sizes."""
+        self.generate(products=200, cart_lines=50, seed=1)
+
+        self.assertEqual(Product.objects.count(), 200)
+        self.assertEqual(Cart.objects.count(), 50)
+
+    def test_cart_prices_match_products(self):
+        """Test that generated cart lines would pass Cart.clean_fields."""
+        self.generate(products=200, cart_lines=50, seed=1)
+
+        for item in Cart.objects.select_related("product"):
+            self.assertEqual(item.price_per_kg, item.product.price_per_kg)
+
+    def test_same_seed_gives_same_data(self):
+        """Test that the data is reproducible from the seed."""
+        first = self.generate(products=100, cart_lines=10, seed=7)
+        second = self.generate(products=100, cart_lines=10, seed=7)
+        third = self.generate(products=100, cart_lines=10, seed=8)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_clear_keeps_history_apart(self):
+        """Test that clearing removes the stock alerts of the old catalog, and that
+        the new products don't take the ids of the products sold before.
+        """
+        self.generate(products=20, cart_lines=5, seed=1)
+        product = Product.objects.last()
+        StockAlert.objects.create(
+            product=product, level=StockAlert.LOW, quantity_available=1, threshold=5
+        )
+        OrderLine.objects.create(
+            order=Order.objects.create(total=product.price_per_kg),
+            product=product,
+            product_name=product.name,
+            quantity=1,
+            price_per_kg=product.price_per_kg,
+        )
+
+        self.generate(products=20, cart_lines=5, seed=1)
+
+        self.assertFalse(StockAlert.objects.exists())
+        self.assertGreater(Product.objects.first().pk, product.pk)
+        self.assertFalse(
+            Product.objects.filter(pk=OrderLine.objects.get().product_id).exists()
+        )
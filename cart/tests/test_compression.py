@@ -0,0 +1,129 @@
+"""Test Classes for response compression and the trimmed templates."""
+import gzip
+import unittest
+import zlib
+from unittest import mock
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from shoply import middleware
+from shoply.middleware import CompressionMiddleware
+from shoply.staticfiles import brotli
+from shoply.template_loaders import trim
+
+
+class CompressedPagesTest(TestCase):
+    """Tests for the cart pages sent through CompressionMiddleware."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        self.url = reverse("cart-list")
+
+    def test_gzip_when_accepted(self):
+        """Test that the page is gzipped for a client accepting only gzip."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertIn(b"Potatoes", gzip.decompress(response.content))
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Test that brotli is picked over gzip when the client accepts both."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn(b"Potatoes", brotli.decompress(response.content))
+
+    def test_gzip_without_brotli(self):
+        """Test that gzip is used when the brotli package is missing."""
+        with mock.patch.object(middleware, "brotli", None):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="br, gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_identity_when_nothing_accepted(self):
+        """Test that a client accepting no compression gets the plain page."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn(b"Potatoes", response.content)
+
+    @override_settings(COMPRESSION_MIN_SIZE=1024 * 1024)
+    def test_small_responses_are_sent_as_they_are(self):
+        """Test that a response under the size threshold isn't compressed."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertNotIn("Accept-Encoding", response.get("Vary", ""))
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    """Tests for CompressionMiddleware on responses of every kind."""
+
+    def get(self, response, accept_encoding="gzip"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_streamed_chunks_are_flushed(self):
+        """Test that each streamed chunk can be decompressed as soon as it's sent."""
+        chunks = [b"event: one\n\n", b"event: two\n\n" * 100]
+        response = self.get(StreamingHttpResponse(iter(chunks)))
+        decompressor = zlib.decompressobj(wbits=31)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        received = [decompressor.decompress(data) for data in response]
+        self.assertEqual(received[:2], chunks)
+        self.assertTrue(decompressor.eof)
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_streamed_brotli(self):
+        """Test that a streamed response is compressed with brotli too."""
+        chunks = [b"a" * 2000, b"b" * 2000]
+        response = self.get(StreamingHttpResponse(iter(chunks)), "br")
+        decompressor = brotli.Decompressor()
+
+        received = [decompressor.process(data) for data in response]
+        self.assertEqual(received[:2], chunks)
+
+    def test_encoded_and_binary_responses_are_left_alone(self):
+        """Test that encoded responses and non-text types aren't compressed."""
+        encoded = HttpResponse(b"x" * 2000)
+        encoded["Content-Encoding"] = "gzip"
+        image = HttpResponse(b"x" * 2000, content_type="image/png")
+
+        self.assertEqual(self.get(encoded).content, b"x" * 2000)
+        self.assertFalse(self.get(image).has_header("Content-Encoding"))
+
+    def test_etag_becomes_weak(self):
+        """Test that the ETag of a compressed response is made weak."""
+        response = HttpResponse(b"x" * 2000)
+        response["ETag"] = '"abc"'
+
+        self.assertEqual(self.get(response)["ETag"], 'W/"abc"')
+
+
+class TrimmedTemplatesTest(SimpleTestCase):
+    """Tests for the templates loaded by TrimmedLoader."""
+
+    def test_trim(self):
+        """Test that indentation and blank lines go, and line breaks stay."""
+        self.assertEqual(
+            trim("<div>\n\n    <p>a  b</p>  \n  </div>\n"), "<div>\n<p>a  b</p>\n</div>"
+        )
+
+    def test_only_listed_prefixes_are_trimmed(self):
+        """Test that the cart templates are trimmed and the admin's aren't."""
+        engine = engines["django"]
+        cart = engine.get_template("cart/cart.html").template.source
+        admin = engine.get_template("admin/base.html").template.source
+
+        self.assertNotIn("\n ", cart)
+        self.assertNotIn("\n\n", cart)
+        self.assertIn("\n    ", admin)
@@ -0,0 +1,39 @@
+"""Test Classes for the tuned SQLite connection profile."""
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class SQLiteConnectionProfileTest(TestCase):
+    """Tests for the shoply.backends.sqlite3 database backend."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        """Test that the configured pragmas are active on the connection."""
+        pragmas = connection.settings_dict["OPTIONS"]["pragmas"]
+
+        self.assertEqual(self.pragma("busy_timeout"), pragmas["busy_timeout"])
+        self.assertEqual(self.pragma("cache_size"), pragmas["cache_size"])
+
+    def test_connection_is_usable(self):
+        """Test that the health check passes on an open connection."""
+        connection.ensure_connection()
+        self.assertTrue(connection.is_usable())
+
+
+class SQLiteTransactionModeTest(TransactionTestCase):
+    """Tests for the transaction_mode option of the backend."""
+
+    def test_transactions_use_the_configured_mode(self):
+        """Test that atomic blocks begin with the configured transaction mode."""
+        mode = connection.settings_dict["OPTIONS"]["transaction_mode"]
+
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                pass
+
+        self.assertEqual(context.captured_queries[0]["sql"], f"BEGIN {mode}")
@@ -0,0 +1,173 @@
+"""Test Classes for the stock event stream and the change feed behind it."""
+import asyncio
+import json
+import os
+import tempfile
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls.base import reverse
+from cart import coherence, feed
+from cart.db_init import initialize_database
+from cart.events import EventStreams
+from cart.models import Product
+
+
+def data(body: bytes) -> dict:
+    """Return the data of the stock event in a chunk of the stream."""
+    line = next(line for line in body.split(b"\n") if line.startswith(b"data: "))
+    return json.loads(line[len(b"data: ") :])
+
+
+async def django_application(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"django"})
+
+
+@override_settings(EVENTS_POLL_INTERVAL=0.01)
+class EventStreamTest(TransactionTestCase):
+    """Tests for streaming the stock and price changes of the cart's products."""
+
+    reset_sequences = True
+
+    def setUp(self) -> None:
+        """Set up Database objects, and an invalidation log of the test's own."""
+        initialize_database()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Runs last: back to the project's log once the setting is restored.
+        self.addCleanup(coherence.check)
+        log_setting = override_settings(
+            CACHE_INVALIDATION_LOG=os.path.join(directory.name, "invalidations.log")
+        )
+        log_setting.enable()
+        self.addCleanup(log_setting.disable)
+        coherence.check()
+        self.app = EventStreams(django_application)
+
+    async def open(self, query: bytes = b"", method: str = "GET"):
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": reverse("cart-events"),
+            "query_string": query,
+            "headers": [],
+        }
+        stream = ApplicationCommunicator(self.app, scope)
+        await stream.send_input({"type": "http.request"})
+        return stream, await stream.receive_output(5)
+
+    async def close(self, stream) -> None:
+        await stream.send_input({"type": "http.disconnect"})
+        await stream.wait(5)
+
+    async def test_stream_starts_with_the_cart_products(self):
+        """Test that a stream first sends the current values of the cart's products."""
+        await sync_to_async(Product.objects.create)(
+            name="Leeks", quantity_available=1, price_per_kg=3
+        )
+        stream, start = await self.open()
+
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        body = (await stream.receive_output(5))["body"]
+        self.assertTrue(body.startswith(b"retry: "))
+        self.assertEqual(data(body), {"1": [10, 5], "2": [6, 4], "3": [12, 2]})
+        await self.close(stream)
+
+    async def test_saves_are_pushed(self):
+        """Test that saving a product in the cart pushes its new values, and that
+        products outside the cart aren't sent.
+        """
+        stream, _ = await self.open()
+        await stream.receive_output(5)
+
+        leeks = Product(name="Leeks", quantity_available=1, price_per_kg=3)
+        await sync_to_async(leeks.save)()
+        potatoes = await sync_to_async(Product.objects.get)(name="Potatoes")
+        potatoes.quantity_available = 7
+        await sync_to_async(potatoes.save)()
+
+        self.assertEqual(data((await stream.receive_output(5))["body"]), {"1": [7, 5]})
+        await self.close(stream)
+
+    async def test_deleted_products_are_null(self):
+        """Test that a product deleted from the catalog is pushed as null."""
+        stream, _ = await self.open(b"products=2")
+        await stream.receive_output(5)
+
+        await sync_to_async(Product.objects.filter(pk=2).delete)()
+
+        self.assertEqual(data((await stream.receive_output(5))["body"]), {"2": None})
+        await self.close(stream)
+
+    async def test_changes_of_other_processes_are_pushed(self):
+        """Test that a change announced in the invalidation log is pushed."""
+        stream, _ = await self.open(b"products=2")
+        await stream.receive_output(5)
+
+        await sync_to_async(Product.objects.filter(pk=2).update)(price_per_kg=9)
+        coherence._append({"origin": "other", "namespace": "inventory", "keys": [2]})
+
+        self.assertEqual(data((await stream.receive_output(5))["body"]), {"2": [6, 9]})
+        await self.close(stream)
+
+    async def test_disconnect_unsubscribes(self):
+        """Test that a closed stream stops receiving deltas."""
+        stream, _ = await self.open()
+        await stream.receive_output(5)
+
+        await self.close(stream)
+
+        self.assertFalse(feed.broadcaster.subscriptions)
+
+    async def test_invalid_requests(self):
+        """Test that other methods and malformed product lists are refused."""
+        stream, start = await self.open(method="POST")
+        self.assertEqual(start["status"], 405)
+
+        stream, start = await self.open(b"products=1,x")
+        self.assertEqual(start["status"], 400)
+
+    async def test_other_paths_go_to_django(self):
+        """Test that every other request is passed on to the Django application."""
+        scope = {"type": "http", "method": "GET", "path": "/cart/"}
+        request = ApplicationCommunicator(self.app, scope)
+        await request.send_input({"type": "http.request"})
+
+        await request.receive_output(5)
+        self.assertEqual((await request.receive_output(5))["body"], b"django")
+
+    def test_wsgi_stand_in(self):
+        """Test that the view served under WSGI tells clients not to reconnect."""
+        self.assertEqual(self.client.get(reverse("cart-events")).status_code, 204)
+
+
+class SubscriptionTest(SimpleTestCase):
+    """Tests for the fan-out of deltas to subscriptions."""
+
+    async def test_slow_subscribers_get_merged_deltas(self):
+        """Test that deltas not yet taken are merged, latest values winning."""
+        subscription = feed.broadcaster.subscribe([1, 2])
+        try:
+            feed.broadcaster.publish({1: [5, 5], 3: [1, 1]})
+            feed.broadcaster.publish({1: [4, 5], 2: None})
+
+            self.assertEqual(await subscription.next(1), {1: [4, 5], 2: None})
+            self.assertEqual(await subscription.next(0.01), {})
+        finally:
+            feed.broadcaster.unsubscribe(subscription)
+
+    async def test_deltas_wake_up_waiting_subscribers(self):
+        """Test that a delta published from another thread ends the wait."""
+        subscription = feed.broadcaster.subscribe([1])
+        try:
+            waiting = asyncio.ensure_future(subscription.next(5))
+            await asyncio.sleep(0)
+            await sync_to_async(feed.broadcaster.publish, thread_sensitive=False)(
+                {1: [3, 3]}
+            )
+
+            self.assertEqual(await asyncio.wait_for(waiting, 1), {1: [3, 3]})
+        finally:
+            feed.broadcaster.unsubscribe(subscription)
@@ -1,8 +1,10 @@
 """Test Classes for the Form Classes and funcitonalities."""
 from logging import error
 from cart.models import Cart, Product
+from django.conf import settings
 from django.test import TestCase
 from cart.forms import CheckOutForm, CreateItemForm, UpdateItemForm
+from cart.views import CartCheckOutView
 from cart.db_init import initialize_database
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -195,3 +197,37 @@ class CheckOutFormTest(BaseFormTest):
         self.assertFalse(checkout_form.is_valid())
         error_message = f"We only have {available_quantity}kg of {product.name} left."
         self.assertTrue(error_message, checkout_form.errors.get("purchase_quantity"))
+
+
+class CheckOutFormSetTest(BaseFormTest):
+    """Tests for the formset checking out the whole cart."""
+
+    def test_forms_share_the_cart_lookups(self):
+        """Test that the cart items and their products are looked up once for all
+        the forms, not once per form.
+        """
+        formset = CartCheckOutView.form_class(
+            data={
+                "form-TOTAL_FORMS": 3,
+                "form-INITIAL_FORMS": 3,
+                "form-0-id": 1,
+                "form-1-id": 2,
+                "form-2-id": 3,
+            }
+        )
+
+        self.assertTrue(formset.is_valid())
+        self.assertEqual(len({id(f.fields["id"].preloaded) for f in formset}), 1)
+        self.assertEqual(len({id(f.fields["product"].preloaded) for f in formset}), 1)
+        self.assertEqual(
+            formset.cart_products, {p.pk: p for p in Product.objects.all()}
+        )
+
+    def test_carts_beyond_django_default_limit_check_out(self):
+        """Test that the checkout takes as many lines as CART_MAX_LINES allows, not
+        the 1000 (2000 at most) forms Django formsets default to.
+        """
+        self.assertEqual(CartCheckOutView.form_class.max_num, settings.CART_MAX_LINES)
+        self.assertEqual(
+            CartCheckOutView.form_class.absolute_max, settings.CART_MAX_LINES
+        )
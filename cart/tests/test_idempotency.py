@@ -0,0 +1,107 @@
+"""Test Classes for idempotent checkout retries."""
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls.base import reverse
+from cart import idempotency
+from cart.db_init import initialize_database
+from cart.models import Cart, Product
+from cart.views import CartCheckOutView
+from shoply import metrics
+from shoply.querybudget import QueryBudgetTestMixin
+
+
+class IdempotentCheckoutTest(QueryBudgetTestMixin, TestCase):
+    """Tests for replaying checkouts retried with the same idempotency key."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and start from empty metrics."""
+        initialize_database()
+        caches[idempotency.CACHE_ALIAS].clear()
+        metrics.reset()
+        self.url = reverse("cart-list")
+
+    def checkout_data(self, key):
+        ids = list(Cart.objects.values_list("id", flat=True))
+        data = {
+            "form-TOTAL_FORMS": len(ids),
+            "form-INITIAL_FORMS": len(ids),
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+            "idempotency_key": key,
+        }
+        data.update({f"form-{i}-id": pk for i, pk in enumerate(ids)})
+        return data
+
+    def test_checkout_page_includes_an_idempotency_key(self):
+        """Test that every render of the form carries a new key."""
+        first = self.client.get(self.url).context["idempotency_key"]
+        second = self.client.get(self.url).context["idempotency_key"]
+
+        self.assertTrue(first)
+        self.assertNotEqual(first, second)
+
+    def test_retry_replays_the_first_response(self):
+        """Test that a retry returns the stored response without checking out again,
+        with a single read of the cache.
+        """
+        data = self.checkout_data("abc")
+        with self.assertQueryBudget(CartCheckOutView.query_budget):
+            first = self.client.post(self.url, data=data)
+        self.assertRedirects(first, reverse("checkout-success"))
+        stock = list(Product.objects.values_list("quantity_available", flat=True))
+
+        with CaptureQueriesContext(connection) as context:
+            retry = self.client.post(self.url, data=data)
+
+        self.assertEqual(retry.status_code, 302)
+        self.assertEqual(retry["Location"], first["Location"])
+        self.assertEqual(retry["Idempotent-Replay"], "true")
+        self.assertEqual(
+            list(Product.objects.values_list("quantity_available", flat=True)), stock
+        )
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertTrue(context.captured_queries[0]["sql"].startswith("SELECT"))
+        body = metrics.render(*metrics.collect())
+        self.assertIn('shoply_idempotency_requests_total{result="hit"} 1', body)
+
+    def test_key_header_is_honoured(self):
+        """Test that the Idempotency-Key header works like the form field."""
+        data = self.checkout_data("")
+        self.client.post(self.url, data=data, HTTP_IDEMPOTENCY_KEY="xyz")
+        retry = self.client.post(self.url, data=data, HTTP_IDEMPOTENCY_KEY="xyz")
+
+        self.assertEqual(retry["Idempotent-Replay"], "true")
+
+    def test_request_still_running_is_a_conflict(self):
+        """Test that a retry of a request still in progress is told to come back."""
+        data = self.checkout_data("abc")
+        key = idempotency.key_for(
+            type("Request", (), {"META": {}, "POST": data})(), "cart-list"
+        )
+        caches[idempotency.CACHE_ALIAS].set(key, idempotency.IN_FLIGHT)
+
+        response = self.client.post(self.url, data=data)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(Cart.objects.count(), 3)
+
+    def test_requests_without_a_key_run_normally(self):
+        """Test that requests without a key are never deduplicated."""
+        data = self.checkout_data("")
+        self.client.post(self.url, data=data)
+
+        self.assertEqual(Cart.objects.count(), 0)
+
+    def test_claims_of_dead_requests_expire(self):
+        """Test that a key claimed by a request that never finished can be claimed
+        again once IDEMPOTENCY_IN_FLIGHT_TIMEOUT has passed.
+        """
+        key = "idempotency:dead"
+        with override_settings(IDEMPOTENCY_IN_FLIGHT_TIMEOUT=0):
+            self.assertIsNone(idempotency.claim(key))
+
+        self.assertIsNone(idempotency.claim(key))
+        self.assertEqual(idempotency.claim(key), idempotency.IN_FLIGHT)
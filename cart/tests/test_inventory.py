@@ -0,0 +1,171 @@
+"""Test Classes for the in-memory inventory snapshot."""
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls.base import reverse
+from cart import coherence, inventory
+from cart.db_init import initialize_database
+from cart.models import Cart, Product
+
+
+class SnapshotTest(TestCase):
+    """Tests for looking up and changing stock in a snapshot."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and load a snapshot of them."""
+        initialize_database()
+        self.ids = dict(Product.objects.values_list("name", "pk"))
+        self.snapshot = inventory.Snapshot.load(version=0)
+
+    def test_lookups_cover_the_products_that_exist(self):
+        """Test that lookups return the stock and prices of known products only."""
+        potatoes, onions = self.ids["Potatoes"], self.ids["Onions"]
+
+        self.assertEqual(
+            self.snapshot.lookup([onions, potatoes, 9999], self.snapshot.quantity),
+            {onions: 12, potatoes: 10},
+        )
+        self.assertEqual(
+            self.snapshot.lookup([potatoes], self.snapshot.price), {potatoes: 5}
+        )
+        self.assertEqual(self.snapshot.lookup([], self.snapshot.quantity), {})
+
+    def test_changes_are_applied_in_place(self):
+        """Test that updates and stock deltas change the arrays, and report products
+        the snapshot doesn't know.
+        """
+        potatoes, carrots = self.ids["Potatoes"], self.ids["Carrots"]
+
+        self.assertTrue(self.snapshot.update(potatoes, 7, 6))
+        self.assertTrue(self.snapshot.apply({potatoes: -2, carrots: -1}))
+        self.assertFalse(self.snapshot.apply({carrots: -1, 9999: -1}))
+        self.assertFalse(self.snapshot.update(9999, 1, 1))
+
+        self.assertEqual(
+            self.snapshot.lookup([potatoes, carrots], self.snapshot.quantity),
+            {potatoes: 5, carrots: 4},
+        )
+        self.assertEqual(
+            self.snapshot.lookup([potatoes], self.snapshot.price), {potatoes: 6}
+        )
+
+    def test_empty_catalog(self):
+        """Test that a snapshot of no products finds nothing."""
+        Cart.objects.all().delete()
+        Product.objects.all().delete()
+        snapshot = inventory.Snapshot.load(version=0)
+
+        self.assertEqual(snapshot.lookup([1, 2], snapshot.quantity), {})
+        self.assertFalse(snapshot.apply({1: -1}))
+
+
+@override_settings(TASK_THREADS=0)
+class InventorySnapshotTest(TransactionTestCase):
+    """Tests for keeping the process wide snapshot current, which needs committed
+    data.
+    """
+
+    def setUp(self) -> None:
+        """Set up Database objects and start from a fresh snapshot."""
+        initialize_database()
+        inventory.invalidate()
+        self.potatoes = Product.objects.get(name="Potatoes")
+
+    def test_snapshot_is_reused(self):
+        """Test that lookups after the first one don't query the database."""
+        inventory.available([self.potatoes.pk])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                inventory.available([self.potatoes.pk]), {self.potatoes.pk: 10}
+            )
+            self.assertEqual(
+                inventory.prices([self.potatoes.pk]), {self.potatoes.pk: 5}
+            )
+
+    def test_saved_products_are_updated_in_place(self):
+        """Test that a committed save changes the snapshot without reloading it."""
+        snapshot = inventory.snapshot()
+        self.potatoes.quantity_available = 4
+        self.potatoes.price_per_kg = 7
+        self.potatoes.save()
+
+        self.assertIs(inventory.snapshot(), snapshot)
+        self.assertEqual(inventory.available([self.potatoes.pk]), {self.potatoes.pk: 4})
+        self.assertEqual(inventory.prices([self.potatoes.pk]), {self.potatoes.pk: 7})
+
+    def test_new_and_deleted_products_reload_the_snapshot(self):
+        """Test that adding or removing a product makes the next lookup reload."""
+        snapshot = inventory.snapshot()
+        beans = Product.objects.create(
+            name="Beans", quantity_available=3, price_per_kg=9
+        )
+        self.assertIsNot(inventory.snapshot(), snapshot)
+        self.assertEqual(inventory.available([beans.pk]), {beans.pk: 3})
+
+        pk = beans.pk
+        beans.delete()
+        self.assertEqual(inventory.available([pk]), {})
+
+    def test_snapshot_is_reloaded_when_too_old(self):
+        """Test that changes made elsewhere show up once the snapshot expires."""
+        inventory.snapshot()
+        # An update of another process, which sends no signal here.
+        Product.objects.filter(pk=self.potatoes.pk).update(quantity_available=1)
+        self.assertEqual(
+            inventory.available([self.potatoes.pk]), {self.potatoes.pk: 10}
+        )
+
+        with override_settings(INVENTORY_SNAPSHOT_MAX_AGE=0):
+            self.assertEqual(
+                inventory.available([self.potatoes.pk]), {self.potatoes.pk: 1}
+            )
+
+    def test_changes_of_other_processes_are_reread(self):
+        """Test that products another process announces as changed are re-read."""
+        snapshot = inventory.snapshot()
+        Product.objects.filter(pk=self.potatoes.pk).update(price_per_kg=8)
+        coherence._append(
+            {"origin": "other", "namespace": "inventory", "keys": [self.potatoes.pk]}
+        )
+
+        coherence.check()
+
+        self.assertIs(inventory.snapshot(), snapshot)
+        self.assertEqual(inventory.prices([self.potatoes.pk]), {self.potatoes.pk: 8})
+
+    def test_checkout_reduces_the_snapshot_stock(self):
+        """Test that a checkout's bulk stock update is applied to the snapshot."""
+        snapshot = inventory.snapshot()
+        response = self.client.post(reverse("cart-list"), data=checkout_data())
+
+        self.assertRedirects(response, reverse("checkout-success"))
+        self.assertIs(inventory.snapshot(), snapshot)
+        self.assertEqual(
+            inventory.available(Product.objects.values_list("pk", flat=True)),
+            dict(Product.objects.values_list("pk", "quantity_available")),
+        )
+
+    def test_checkout_of_stock_sold_elsewhere_is_refused(self):
+        """Test that stock the snapshot still shows, but which is already gone, is
+        caught by the database and the checkout undone.
+        """
+        inventory.snapshot()
+        Product.objects.filter(pk=self.potatoes.pk).update(quantity_available=1)
+
+        response = self.client.post(reverse("cart-list"), data=checkout_data())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Sorry, Potatoes sold out")
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertEqual(Product.objects.get(pk=self.potatoes.pk).quantity_available, 1)
+
+
+def checkout_data():
+    ids = list(Cart.objects.values_list("id", flat=True))
+    data = {
+        "form-TOTAL_FORMS": len(ids),
+        "form-INITIAL_FORMS": len(ids),
+        "form-MIN_NUM_FORMS": 0,
+        "form-MAX_NUM_FORMS": 1000,
+    }
+    data.update({f"form-{i}-id": pk for i, pk in enumerate(ids)})
+    return data
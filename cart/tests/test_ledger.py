@@ -0,0 +1,177 @@
+"""Test Classes for the append-only inventory ledger and its compaction."""
+import datetime
+import tempfile
+from django.core import serializers
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls.base import reverse
+from django.utils import timezone
+from cart import ledger
+from cart.db_init import initialize_database
+from cart.models import Order, Product, StockCheckpoint, StockMovement
+
+
+def checkout_data() -> dict:
+    return {
+        "form-TOTAL_FORMS": 3,
+        "form-INITIAL_FORMS": 3,
+        "form-MIN_NUM_FORMS": 0,
+        "form-MAX_NUM_FORMS": 1000,
+        "form-0-id": 1,
+        "form-1-id": 2,
+        "form-2-id": 3,
+    }
+
+
+@override_settings(TASK_THREADS=0)
+class LedgerTest(TestCase):
+    """Tests for recording stock movements and deriving stock from them."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        self.ids = dict(Product.objects.values_list("name", "pk"))
+
+    def movements(self):
+        return list(StockMovement.objects.values_list("product_id", "kind", "quantity"))
+
+    def test_new_products_are_restocked(self):
+        """Test that a product's initial stock is its first movement."""
+        self.assertEqual(
+            self.movements(),
+            [
+                (self.ids["Potatoes"], StockMovement.RESTOCK, 10),
+                (self.ids["Carrots"], StockMovement.RESTOCK, 6),
+                (self.ids["Onions"], StockMovement.RESTOCK, 12),
+            ],
+        )
+
+    def test_checkout_appends_purchases(self):
+        """Test that a checkout records a purchase per line, tied to its order, and
+        that the stock derived from the ledger matches quantity_available.
+        """
+        response = self.client.post(reverse("cart-list"), data=checkout_data())
+
+        self.assertRedirects(response, reverse("checkout-success"))
+        order = Order.objects.get()
+        self.assertEqual(
+            list(
+                StockMovement.objects.filter(order__isnull=False).values_list(
+                    "kind", "quantity", "order"
+                )
+            ),
+            [(StockMovement.PURCHASE, -2, order.pk)]
+            + [(StockMovement.PURCHASE, -1, order.pk)] * 2,
+        )
+        self.assertEqual(list(ledger.drift()), [])
+
+    def test_saves_record_the_difference(self):
+        """Test that editing the stock records a restock or an adjustment, and that
+        saves leaving it alone record nothing.
+        """
+        StockMovement.objects.all().delete()
+        potatoes = Product.objects.get(name="Potatoes")
+
+        potatoes.quantity_available = 25
+        potatoes.save()
+        potatoes.quantity_available = 21
+        potatoes.save()
+        potatoes.price_per_kg = 6
+        potatoes.save()
+
+        self.assertEqual(
+            self.movements(),
+            [
+                (potatoes.pk, StockMovement.RESTOCK, 15),
+                (potatoes.pk, StockMovement.ADJUSTMENT, -4),
+            ],
+        )
+
+    def test_fixtures_bring_their_own_movements(self):
+        """Test that loading a dump of products and their movements records nothing
+        more, so the stock isn't counted twice.
+        """
+        potatoes = Product.objects.get(name="Potatoes")
+        movements = self.movements()
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as fixture:
+            fixture.write(
+                serializers.serialize(
+                    "json", [potatoes, *StockMovement.objects.filter(product=potatoes)]
+                )
+            )
+            fixture.flush()
+            StockMovement.objects.filter(product=potatoes).delete()
+            call_command("loaddata", fixture.name, verbosity=0)
+
+        self.assertEqual(self.movements(), movements)
+        self.assertEqual(list(ledger.drift()), [])
+
+    def test_stock_is_checkpoint_plus_later_movements(self):
+        """Test that movements folded into a checkpoint aren't counted twice."""
+        potatoes = self.ids["Potatoes"]
+        StockCheckpoint.objects.create(
+            product_id=potatoes,
+            quantity=100,
+            movement_id=StockMovement.objects.get(product_id=potatoes).pk,
+        )
+        ledger.record(StockMovement.PURCHASE, {potatoes: -3})
+
+        self.assertEqual(
+            ledger.stock([potatoes, self.ids["Onions"], 9999]),
+            {potatoes: 97, self.ids["Onions"]: 12},
+        )
+
+    def test_drift_finds_changes_made_around_the_ledger(self):
+        """Test that stock changed without a movement is reported."""
+        Product.objects.filter(name="Onions").update(quantity_available=3)
+
+        self.assertEqual(list(ledger.drift()), [(self.ids["Onions"], 3, 12)])
+        with self.assertRaises(CommandError):
+            call_command(
+                "compact_stock_ledger", "--check", stderr=open("/dev/null", "w")
+            )
+
+
+class CompactionTest(TestCase):
+    """Tests for folding old movements into checkpoints."""
+
+    def setUp(self) -> None:
+        """Set up Database objects with a month old history."""
+        initialize_database()
+        self.potatoes = Product.objects.get(name="Potatoes")
+        for quantity in (5, -3, -2):
+            ledger.record(StockMovement.ADJUSTMENT, {self.potatoes.pk: quantity})
+        StockMovement.objects.update(created=timezone.now() - datetime.timedelta(30))
+        ledger.record(StockMovement.PURCHASE, {self.potatoes.pk: -1})
+
+    def test_old_movements_are_folded(self):
+        """Test that old movements are replaced by checkpoints and the stock kept."""
+        before = timezone.now() - datetime.timedelta(7)
+
+        self.assertEqual(ledger.compact(before, batch_size=2), 6)
+
+        self.assertEqual(
+            list(StockMovement.objects.values_list("product_id", "quantity")),
+            [(self.potatoes.pk, -1)],
+        )
+        self.assertEqual(
+            StockCheckpoint.objects.get(product=self.potatoes).quantity, 10
+        )
+        self.assertEqual(ledger.stock([self.potatoes.pk]), {self.potatoes.pk: 9})
+        self.assertEqual(list(ledger.drift()), [])
+
+    def test_compacting_again_changes_nothing(self):
+        """Test that a second compaction has nothing left to fold."""
+        before = timezone.now() - datetime.timedelta(7)
+        ledger.compact(before)
+
+        self.assertEqual(ledger.compact(before), 0)
+        self.assertEqual(ledger.stock([self.potatoes.pk]), {self.potatoes.pk: 9})
+
+    def test_command(self):
+        """Test that the command folds movements older than --days."""
+        call_command(
+            "compact_stock_ledger", "--days", "7", stdout=open("/dev/null", "w")
+        )
+
+        self.assertEqual(StockMovement.objects.count(), 1)
@@ -0,0 +1,55 @@
+"""Test Classes for the request metrics and the /metrics endpoint."""
+import os
+import tempfile
+from django.test import TestCase
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from shoply import metrics
+
+
+class MetricsEndpointTest(TestCase):
+    """Tests for MetricsMiddleware and the metrics view."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and start from empty metrics."""
+        initialize_database()
+        metrics.reset()
+
+    def test_records_latency_and_queries_per_view(self):
+        """Test that a request to a view shows up in the exposition."""
+        self.client.get(reverse("cart-list"))
+        self.client.get(reverse("cart-list"))
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        labels = '{method="GET",view="cart-list"}'
+        self.assertIn(f"shoply_request_duration_seconds_count{labels} 2", body)
+        self.assertIn(f"shoply_db_queries_total{labels}", body)
+        self.assertIn(f"shoply_template_render_seconds_total{labels}", body)
+        self.assertIn("# TYPE shoply_request_duration_seconds histogram", body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that each bucket counts every observation at or below its bound."""
+        metrics.observe("test_seconds", 0.003)
+        metrics.observe("test_seconds", 0.2)
+        metrics.observe("test_seconds", 20)
+
+        body = metrics.render(*metrics.collect())
+        self.assertIn('test_seconds_bucket{le="0.005"} 1', body)
+        self.assertIn('test_seconds_bucket{le="0.25"} 2', body)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', body)
+        self.assertIn("test_seconds_count 3", body)
+
+    def test_merges_metrics_flushed_by_other_processes(self):
+        """Test that snapshots written by other workers are added in."""
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.inc("test_total", 2, view="a")
+            metrics.flush(directory)
+            # Pretend another worker flushed the same snapshot.
+            os.rename(
+                os.path.join(directory, f"{os.getpid()}.json"),
+                os.path.join(directory, "1.json"),
+            )
+
+            store, gauges = metrics.collect(directory)
+
+        self.assertEqual(store.counters["test_total", (("view", "a"),)], 4)
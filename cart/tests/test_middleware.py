@@ -0,0 +1,42 @@
+"""Test Classes for the per-route middleware profiles."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+
+
+class RouteProfileMiddlewareTest(TestCase):
+    """Tests for RouteProfileMiddleware with the configured profiles."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and a logged in admin user."""
+        initialize_database()
+        User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.login(username="admin", password="password")
+
+    def test_cart_pages_do_no_session_io(self):
+        """Test that a cart page view with a session cookie doesn't touch sessions."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("cart-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, "session"))
+        self.assertFalse(
+            [q for q in context.captured_queries if "django_session" in q["sql"]]
+        )
+
+    def test_admin_still_uses_sessions_and_auth(self):
+        """Test that routes outside the cart keep the full middleware stack."""
+        response = self.client.get(reverse("admin:index"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.wsgi_request.user.is_superuser)
+
+    def test_cart_pages_keep_csrf_protection(self):
+        """Test that the lean profile still rejects a POST without a CSRF token."""
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(reverse("create-cart-item"), {"product": 1})
+
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,125 @@
+"""Test Classes for the order history and its archival."""
+import datetime
+import gzip
+import shutil
+import tempfile
+from pathlib import Path
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls.base import reverse
+from django.utils import timezone
+from cart import archive
+from cart.db_init import initialize_database
+from cart.models import Cart, Order, OrderLine, Product
+
+
+def place_order(days_ago: int) -> Order:
+    """Record the current cart as an order placed `days_ago` days ago."""
+    order = Order.place(list(Cart.objects.select_related("product")))
+    created = timezone.now() - datetime.timedelta(days=days_ago)
+    Order.objects.filter(pk=order.pk).update(created=created)
+    order.lines.update(created=created)
+    order.created = created
+    return order
+
+
+class OrderHistoryTest(TestCase):
+    """Tests for recording checkouts as orders."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+
+    def test_checkout_records_an_order(self):
+        """Test that checking out keeps every cart line in a new order."""
+        cart = list(
+            Cart.objects.values_list(
+                "product_id", "purchase_quantity", "price_per_kg", "product__name"
+            )
+        )
+        data = {
+            "form-TOTAL_FORMS": 3,
+            "form-INITIAL_FORMS": 3,
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+        }
+        data.update(
+            {f"form-{i}-id": pk for i, pk in enumerate(Cart.objects.values_list("id"))}
+        )
+        self.client.post(reverse("cart-list"), data=data)
+
+        order = Order.objects.get()
+        self.assertEqual(
+            list(
+                order.lines.values_list(
+                    "product_id", "quantity", "price_per_kg", "product_name"
+                )
+            ),
+            cart,
+        )
+        self.assertEqual(order.total, sum(line[1] * line[2] for line in cart))
+        self.assertEqual(Cart.objects.count(), 0)
+
+    def test_history_survives_removed_products(self):
+        """Test that lines keep the product name once the product is deleted."""
+        order = place_order(days_ago=0)
+        Product.objects.all().delete()
+
+        line = order.lines.first()
+        self.assertIsNone(line.product)
+        self.assertTrue(line.product_name)
+
+
+class ArchiveOrdersTest(TestCase):
+    """Tests for moving old orders into archive files."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and an archive directory."""
+        initialize_database()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.old = [place_order(days_ago=days) for days in (400, 200, 100)]
+        self.recent = place_order(days_ago=1)
+
+    def test_old_orders_are_moved_to_monthly_files(self):
+        """Test that orders past the cutoff leave the tables for the archive."""
+        counts = archive.archive(
+            timezone.now() - datetime.timedelta(days=90), self.directory, batch_size=2
+        )
+
+        self.assertEqual(counts, {"orders": 3, "lines": 9})
+        self.assertEqual(list(Order.objects.all()), [self.recent])
+        self.assertEqual(OrderLine.objects.count(), 3)
+
+        records = list(archive.read(self.directory))
+        self.assertEqual([r["id"] for r in records], [o.pk for o in self.old])
+        self.assertEqual(records[0]["total"], self.old[0].total)
+        self.assertEqual(len(records[0]["lines"]), 3)
+        self.assertEqual(
+            records[0]["lines"][0]["product_name"], Product.objects.first().name
+        )
+        self.assertEqual(
+            sorted(path.name for path in Path(self.directory).iterdir()),
+            sorted(archive.partition_path("", o.created).name for o in self.old),
+        )
+
+    def test_rerun_after_interruption_does_not_duplicate(self):
+        """Test that orders written but not deleted by an earlier run are read once."""
+        before = timezone.now() - datetime.timedelta(days=90)
+        path = archive.partition_path(self.directory, self.old[0].created)
+        archive.archive(before, self.directory)
+        with gzip.open(path, "rt") as f:
+            duplicate = f.read()
+        with gzip.open(path, "at") as f:
+            f.write(duplicate)
+
+        self.assertEqual(len(list(archive.read(self.directory))), 3)
+
+    def test_command(self):
+        """Test that the command archives orders older than --days."""
+        out = StringIO()
+        call_command("archive_orders", days=150, directory=self.directory, stdout=out)
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertIn("Archived 2 orders (6 lines)", out.getvalue())
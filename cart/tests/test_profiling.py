@@ -0,0 +1,63 @@
+"""Test Classes for on-demand request profiling."""
+import marshal
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import RequestProfile
+
+
+@override_settings(PROFILING_TOKEN="secret")
+class ProfilingMiddlewareTest(TestCase):
+    """Tests for ProfilingMiddleware and the profile admin."""
+
+    def setUp(self) -> None:
+        """Set up Database objects to be used by test."""
+        initialize_database()
+
+    def test_authorized_request_is_profiled(self):
+        """Test that a request with the token is stored with its SQL timeline."""
+        response = self.client.get(reverse("cart-list"), HTTP_X_PROFILE="secret")
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.route, "cart-list")
+        self.assertEqual(profile.method, "GET")
+        self.assertTrue(profile.sql_timeline)
+        self.assertIn("function calls", profile.summary)
+        self.assertIsInstance(marshal.loads(bytes(profile.stats)), dict)
+
+    def test_requests_without_the_token_are_not_profiled(self):
+        """Test that a missing or wrong token leaves the request alone."""
+        self.client.get(reverse("cart-list"))
+        self.client.get(reverse("cart-list"), HTTP_X_PROFILE="guess")
+
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_profiled(self):
+        """Test that sampling profiles requests without any header."""
+        self.client.get(reverse("checkout-success"))
+
+        self.assertEqual(RequestProfile.objects.get().route, "checkout-success")
+
+    def test_admin_lists_and_downloads_profiles(self):
+        """Test that staff can list profiles and download the pstats data."""
+        self.client.get(reverse("cart-list"), HTTP_X_PROFILE="secret")
+        profile = RequestProfile.objects.get()
+        User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.login(username="admin", password="password")
+
+        response = self.client.get(reverse("admin:cart_requestprofile_changelist"))
+        self.assertContains(response, "cart-list")
+
+        response = self.client.get(
+            reverse("admin:cart_requestprofile_change", args=[profile.pk])
+        )
+        self.assertContains(response, "SQL timeline")
+
+        response = self.client.get(
+            reverse("admin:cart_requestprofile_download", args=[profile.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, bytes(profile.stats))
@@ -0,0 +1,71 @@
+"""Test Classes for the N+1 query detector and per-view query budgets."""
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import Cart, Product
+from cart.views import CartCheckOutView
+from shoply.querybudget import QueryBudgetExceeded, QueryBudgetTestMixin, fingerprint
+
+
+class FingerprintTest(SimpleTestCase):
+    """Tests for normalizing SQL into its shape."""
+
+    def test_literals_are_normalized(self):
+        """Test that statements differing only in literals share a shape."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a''b'"),
+            fingerprint("SELECT  *  FROM t WHERE id = 22 AND name = 'c'"),
+        )
+
+    def test_parameter_lists_are_normalized(self):
+        """Test that IN lists of any length share a shape."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)"),
+        )
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Tests for the query budget middleware and test mixin."""
+
+    def setUp(self) -> None:
+        """Set up Database objects to be used by test."""
+        initialize_database()
+
+    def test_request_over_budget_fails(self):
+        """Test that a request running more queries than its view allows fails."""
+        with mock.patch.object(CartCheckOutView, "query_budget", 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("cart-list"))
+
+    def test_per_row_queries_are_flagged(self):
+        """Test that repeating one query shape for every row is flagged."""
+        for i in range(5):
+            Product.objects.create(name=f"p{i}", quantity_available=1, price_per_kg=1)
+
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget():
+                for product in Product.objects.all():
+                    Cart.objects.filter(product=product).exists()
+
+    def test_checkout_queries_do_not_grow_with_the_cart(self):
+        """Test that checking out a bigger cart runs no extra queries."""
+        for i in range(20):
+            product = Product.objects.create(
+                name=f"p{i}", quantity_available=5, price_per_kg=1
+            )
+            Cart.objects.create(product=product, purchase_quantity=1, price_per_kg=1)
+        ids = list(Cart.objects.values_list("id", flat=True))
+        data = {
+            "form-TOTAL_FORMS": len(ids),
+            "form-INITIAL_FORMS": len(ids),
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+        }
+        data.update({f"form-{i}-id": pk for i, pk in enumerate(ids)})
+
+        with self.assertQueryBudget(CartCheckOutView.query_budget):
+            response = self.client.post(reverse("cart-list"), data=data)
+        self.assertRedirects(response, reverse("checkout-success"))
+        self.assertEqual(Cart.objects.count(), 0)
@@ -0,0 +1,74 @@
+"""Test Classes for the direct rendering of the checkout rows."""
+import re
+from unittest import mock
+from django.test import TestCase
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import Cart, Product
+from cart.views import CartCheckOutView
+
+
+# The per-response values of the page.
+TOKENS = re.compile(r'name="(csrfmiddlewaretoken|idempotency_key)" value="[^"]*"')
+
+
+class CheckoutRowsTest(TestCase):
+    """Tests for rendering the checkout rows without building the forms."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        self.url = reverse("cart-list")
+
+    def page(self, fast_rows: bool) -> str:
+        with mock.patch.object(CartCheckOutView, "fast_rows", fast_rows):
+            response = self.client.get(self.url)
+        return TOKENS.sub(r'name="\1" value=""', response.content.decode())
+
+    def test_same_html_as_the_forms(self):
+        """Test that the page is identical, byte for byte, to the as_p rendering."""
+        self.assertEqual(self.page(fast_rows=True), self.page(fast_rows=False))
+
+    def test_names_are_escaped(self):
+        """Test that product names are escaped like the widget does."""
+        Product.objects.filter(name="Onions").update(name='Red "Onions" & <Shallots>')
+
+        self.assertIn("Red &quot;Onions&quot; &amp; &lt;Shallots&gt;", self.page(True))
+        self.assertEqual(self.page(fast_rows=True), self.page(fast_rows=False))
+
+    def test_empty_cart(self):
+        """Test that an empty cart renders the same management form."""
+        Cart.objects.all().delete()
+
+        self.assertEqual(self.page(fast_rows=True), self.page(fast_rows=False))
+
+    def test_rows_post_back_as_a_checkout(self):
+        """Test that the rendered rows are a valid checkout POST."""
+        html = self.page(fast_rows=True)
+        data = dict(re.findall(r'type="hidden" name="([^"]+)" value="([^"]*)"', html))
+
+        response = self.client.post(self.url, data=data)
+
+        self.assertRedirects(response, reverse("checkout-success"))
+        self.assertFalse(Cart.objects.exists())
+
+    def test_one_query(self):
+        """Test that the rows and totals take one query, whatever the catalog."""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(
+            (response.context["total_quantity"], response.context["total_cost"]),
+            (4, 16),
+        )
+
+    def test_catalog_is_not_listed(self):
+        """Test that each row shows its product's name, not every product."""
+        Product.objects.create(name="Leeks", quantity_available=1, price_per_kg=3)
+        potatoes = Product.objects.get(name="Potatoes").pk
+
+        for fast_rows in (True, False):
+            html = self.page(fast_rows)
+            self.assertNotIn("Leeks", html)
+            self.assertNotIn("<select", html)
+            self.assertIn(f'data-product="{potatoes}">Potatoes</span>', html)
@@ -0,0 +1,145 @@
+"""Test Classes for the daily sales rollups."""
+import datetime
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls.base import reverse
+from django.utils import timezone
+from cart import rollups
+from cart.db_init import initialize_database
+from cart.models import Cart, DailySales, Order, OrderLine
+
+
+def checkout() -> Order:
+    """Place an order for everything in the cart, leaving the cart as it is."""
+    return Order.place(list(Cart.objects.select_related("product")))
+
+
+class DailySalesTest(TestCase):
+    """Tests for the rollups updated at checkout."""
+
+    def setUp(self) -> None:
+        """Set up Database objects."""
+        initialize_database()
+        self.today = timezone.localdate()
+
+    def test_checkout_adds_to_the_days_totals(self):
+        """Test that each order adds its lines to the product's total for the day."""
+        checkout()
+        checkout()
+
+        for item in Cart.objects.all():
+            sales = DailySales.objects.get(product=item.product_id, day=self.today)
+            self.assertEqual(sales.kg_sold, 2 * item.purchase_quantity)
+            self.assertEqual(
+                sales.revenue, 2 * item.purchase_quantity * item.price_per_kg
+            )
+
+    def test_checkout_upserts_with_one_query(self):
+        """Test that recording the rollups of a whole order is a single query."""
+        items = list(Cart.objects.select_related("product"))
+        # The order, its lines and the rollups.
+        with self.assertNumQueries(3):
+            Order.place(items)
+
+    def test_rebuild_matches_incremental_totals(self):
+        """Test that a rebuild from the order lines gives the same rollups."""
+        checkout()
+        OrderLine.objects.update(created=timezone.now() - datetime.timedelta(days=3))
+        checkout()
+        incremental = rollups.actual(self.today - datetime.timedelta(days=3))
+        self.assertTrue(rollups.verify())
+
+        rollups.rebuild()
+
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(len(rollups.actual(self.today)), 3)
+        self.assertEqual(
+            sum(
+                kg
+                for kg, _ in rollups.actual(self.today - datetime.timedelta(3)).values()
+            ),
+            sum(kg for kg, _ in incremental.values()),
+        )
+
+    def test_rebuild_keeps_rollups_of_archived_days(self):
+        """Test that days before the oldest order line are left alone."""
+        old = DailySales.objects.create(
+            product_id=1, day=self.today - datetime.timedelta(days=400), kg_sold=5
+        )
+        checkout()
+
+        rollups.rebuild()
+
+        self.assertTrue(DailySales.objects.filter(pk=old.pk).exists())
+
+    def test_rebuild_after_archiving(self):
+        """Test that archiving leaves no day partly archived: the rollups still match
+        the order lines, and a rebuild keeps them.
+        """
+        day = self.today - datetime.timedelta(days=30)
+        for created in (
+            datetime.datetime.combine(
+                day - datetime.timedelta(days=1), datetime.time()
+            ),
+            datetime.datetime.combine(day, datetime.time(0, 0, 1)),
+            datetime.datetime.combine(day, datetime.time(23, 59, 59)),
+        ):
+            order = checkout()
+            created = timezone.make_aware(created)
+            Order.objects.filter(pk=order.pk).update(created=created)
+            OrderLine.objects.filter(order=order).update(created=created)
+        rollups.rebuild()
+        before = rollups.actual(day)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "archive_orders", days=30, directory=directory, stdout=StringIO()
+            )
+
+        self.assertEqual(OrderLine.objects.count(), 6)
+        self.assertEqual(rollups.verify(), [])
+        rollups.rebuild()
+        self.assertEqual(rollups.actual(day), before)
+
+    def test_command(self):
+        """Test that --check fails on wrong rollups and a rebuild fixes them."""
+        checkout()
+        DailySales.objects.filter(product_id=1).update(kg_sold=0)
+
+        with self.assertRaisesMessage(CommandError, "1 rollups do not match"):
+            call_command("rebuild_sales_rollups", check=True, stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", stdout=out)
+        self.assertIn("Rebuilt 3 rollups (1 were wrong)", out.getvalue())
+        call_command("rebuild_sales_rollups", check=True, stdout=StringIO())
+
+
+class ProductAdminSalesTest(TestCase):
+    """Tests for the sales columns of the product changelist."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and log in as an admin."""
+        initialize_database()
+        user = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(user)
+
+    def test_sold_today_and_this_week(self):
+        """Test that the changelist shows each product's sales from the rollups."""
+        today = timezone.localdate()
+        for days_ago, kg_sold in ((0, 2), (3, 5), (10, 7)):
+            DailySales.objects.create(
+                product_id=1,
+                day=today - datetime.timedelta(days=days_ago),
+                kg_sold=kg_sold,
+            )
+
+        response = self.client.get(reverse("admin:cart_product_changelist"))
+
+        products = {p.pk: p for p in response.context["cl"].result_list}
+        self.assertEqual((products[1].sold_today, products[1].sold_this_week), (2, 7))
+        self.assertEqual((products[2].sold_today, products[2].sold_this_week), (0, 0))
@@ -0,0 +1,72 @@
+"""Test Classes for routing reads of read-only views to the replica."""
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import Cart
+from shoply.middleware import ReplicaRoutingMiddleware
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """Test which database each request reads from."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self) -> None:
+        """Set up Database objects to be used by test."""
+        initialize_database()
+
+    def get(self, url):
+        """Make a GET request, returning the response and the queries per database."""
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = self.client.get(url)
+        return response, len(primary), len(replica)
+
+    def test_read_only_view_reads_from_replica(self):
+        """Test that a GET of a read-only view does all its reads on the replica."""
+        response, primary, replica = self.get(reverse("cart-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_other_views_read_from_primary(self):
+        """Test that views not listed in READ_REPLICA_VIEWS use the primary."""
+        response, primary, replica = self.get(reverse("create-cart-item"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        """Test that a client reads its own writes from the primary after a POST."""
+        item = Cart.objects.first()
+        url = reverse("update-cart-item", args=[item.pk])
+        response = self.client.post(
+            url,
+            data={
+                "product": item.product_id,
+                "purchase_quantity": 3,
+                "price_per_kg": item.price_per_kg,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+
+        response, primary, replica = self.get(url)
+        self.assertEqual(response.context["form"].initial["purchase_quantity"], 3)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_in_a_transaction_use_primary(self):
+        """Test that a request inside a transaction on the primary sees its writes."""
+        with transaction.atomic():
+            Cart.objects.filter(purchase_quantity=2).update(purchase_quantity=5)
+            response, primary, replica = self.get(reverse("cart-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_quantity"], 7)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
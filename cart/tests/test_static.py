@@ -0,0 +1,77 @@
+"""Test Classes for the fingerprinted, precompressed static files."""
+import gzip
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from shoply.staticfiles import StaticFile
+
+
+class StaticFilesMiddlewareTest(SimpleTestCase):
+    """Tests for collectstatic output served by StaticFilesMiddleware."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(STATIC_ROOT=cls.root.name)
+        cls.settings.enable()
+        call_command("collectstatic", interactive=False, verbosity=0)
+        with open(os.path.join(cls.root.name, "staticfiles.json")) as f:
+            cls.css = json.load(f)["paths"]["cart/style.css"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        """Test that the hashed file has a gzip variant next to it."""
+        self.assertRegex(self.css, r"^cart/style\.[0-9a-f]{12}\.css$")
+        self.assertTrue(os.path.exists(os.path.join(self.root.name, self.css + ".gz")))
+
+    def test_hashed_file_is_cached_forever_and_compressed(self):
+        """Test the cache headers and gzip encoding of a fingerprinted file."""
+        response = self.client.get(f"/static/{self.css}", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertIn(b"body", gzip.decompress(response.content))
+
+    def test_identity_when_compression_not_accepted(self):
+        """Test that clients not accepting gzip get the plain file."""
+        response = self.client.get(f"/static/{self.css}")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn(b"body", response.content)
+
+    def test_matching_etag_is_not_modified(self):
+        """Test that a conditional request with the current ETag gets a 304."""
+        etag = self.client.get(f"/static/{self.css}")["ETag"]
+        response = self.client.get(f"/static/{self.css}", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+
+class NegotiationTest(SimpleTestCase):
+    """Tests for picking the encoding of a static file."""
+
+    def setUp(self) -> None:
+        self.file = StaticFile("text/css", '"x"', True)
+        self.file.variants = {
+            "identity": b"x" * 100,
+            "gzip": b"x" * 20,
+            "br": b"x" * 10,
+        }
+
+    def test_prefers_the_smallest_accepted_encoding(self):
+        self.assertEqual(self.file.negotiate("gzip, deflate, br")[0], "br")
+        self.assertEqual(self.file.negotiate("gzip")[0], "gzip")
+
+    def test_zero_quality_is_refused(self):
+        self.assertEqual(self.file.negotiate("br;q=0, gzip;q=0.5")[0], "gzip")
+        self.assertEqual(self.file.negotiate("")[0], "identity")
@@ -0,0 +1,131 @@
+"""Test Classes for the background task queue."""
+import datetime
+import threading
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from cart import taskqueue
+from cart.models import Task
+
+
+calls = []
+done = threading.Event()
+
+
+@taskqueue.task()
+def record(value):
+    calls.append(value)
+    done.set()
+
+
+@taskqueue.task(batch=True)
+def record_batch(batch):
+    calls.append(sorted(value for (value,) in batch))
+
+
+@taskqueue.task(max_attempts=2, retry_delay=10)
+def explode():
+    raise ValueError("boom")
+
+
+@override_settings(TASK_THREADS=0)
+class TaskQueueTest(TestCase):
+    """Tests for queueing and running tasks."""
+
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_tasks_run_once_and_are_deleted(self):
+        """Test that a queued task runs and leaves no row behind."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.enqueue(1)
+        self.assertEqual(callbacks, [taskqueue.wake])
+
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_identical_pending_tasks_are_coalesced(self):
+        """Test that enqueueing the same task twice runs it once."""
+        record.enqueue(1)
+        record.enqueue(1)
+        record.enqueue(2)
+
+        taskqueue.run_pending()
+        self.assertEqual(sorted(calls), [1, 2])
+
+    def test_batch_tasks_get_every_run_in_one_call(self):
+        """Test that a batch task is called once with the arguments of each run."""
+        for value in (3, 1, 2):
+            record_batch.enqueue(value)
+
+        taskqueue.run_pending()
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def test_failures_are_retried_then_kept_as_failed(self):
+        """Test that a failing task backs off, and fails for good after max_attempts."""
+        explode.enqueue()
+        taskqueue.run_pending()
+
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertGreater(
+            task.run_after, timezone.now() + datetime.timedelta(seconds=9)
+        )
+        self.assertIn("ValueError: boom", task.last_error)
+        self.assertEqual(taskqueue.run_pending(), 0)
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs("cart.taskqueue", "ERROR"):
+            taskqueue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_abandoned_tasks_are_claimed_again(self):
+        """Test that a task whose worker's lease ran out is run by another worker."""
+        record.enqueue(1)
+        self.assertEqual(len(taskqueue.claim(10, lease=60)), 1)
+        self.assertEqual(taskqueue.claim(10, lease=60), [])
+
+        Task.objects.update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, [1])
+
+
+@override_settings(TASK_THREADS=1)
+class TaskQueueThreadTest(TransactionTestCase):
+    """Tests for running tasks in other threads, which need committed data."""
+
+    def setUp(self) -> None:
+        calls.clear()
+        done.clear()
+
+    def test_task_runs_after_commit(self):
+        """Test that a task queued in a transaction runs in a thread after commit."""
+        with transaction.atomic():
+            record.enqueue(7)
+            time.sleep(0.05)
+            self.assertEqual(calls, [])
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(calls, [7])
+        # Let the thread finish before the test's tables are flushed.
+        deadline = time.monotonic() + 5
+        while taskqueue._drainers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASK_THREADS=0)
+    def test_run_tasks_command(self):
+        """Test that the worker command drains the queue."""
+        for value in range(5):
+            record.enqueue(value)
+        out = StringIO()
+
+        call_command("run_tasks", threads=1, once=True, stdout=out)
+
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertIn("Ran 5 tasks.", out.getvalue())
@@ -2,12 +2,14 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import response
 from cart.models import Cart, Product
+from django.db import connection
 from django.test import TestCase
 from django.urls.base import reverse
 from cart.db_init import initialize_database
+from shoply.querybudget import QueryBudgetTestMixin
 
 
-class BaseViewClassTest(TestCase):
+class BaseViewClassTest(QueryBudgetTestMixin, TestCase):
     """Base Test for view classes with common setup and functions."""
 
     def setUp(self) -> None:
@@ -73,6 +75,73 @@ class CartCheckOutViewTest(BaseViewClassTest):
         self.assertEqual(context["total_quantity"], 4)
         self.assertEqual(context["total_cost"], 16)
 
+    def quantities_data(self, *quantities, update=True):
+        """POST data of the checkout page with the given quantities, in cart order."""
+        data = {
+            "form-TOTAL_FORMS": len(quantities),
+            "form-INITIAL_FORMS": len(quantities),
+            "form-MIN_NUM_FORMS": 0,
+            "form-MAX_NUM_FORMS": 1000,
+        }
+        for i, (pk, quantity) in enumerate(
+            zip(Cart.objects.values_list("pk", flat=True), quantities)
+        ):
+            data.update({f"form-{i}-id": pk, f"form-{i}-purchase_quantity": quantity})
+        if update:
+            data["update_quantities"] = "Update Quantities"
+        return data
+
+    def test_update_quantities_saves_only_changed_lines(self):
+        """Test that changed quantities are saved with one bulk update, without
+        checking out.
+        """
+        url = reverse("cart-list")
+        carrots = Cart.objects.get(product__name="Carrots")
+
+        data = self.quantities_data(2, 5, 1)
+        queries = []
+
+        def record(execute, sql, params, *args):
+            queries.append((sql, params))
+            return execute(sql, params, *args)
+
+        with connection.execute_wrapper(record):
+            response = self.client.post(url, data=data)
+
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            list(Cart.objects.values_list("purchase_quantity", flat=True)), [2, 5, 1]
+        )
+        updates = [(sql, p) for sql, p in queries if sql.startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        # Only the changed line is written.
+        self.assertIn("IN (%s)", updates[0][0])
+        self.assertEqual(updates[0][1][-1], carrots.pk)
+        self.assertEqual(Product.objects.get(name="Carrots").quantity_available, 6)
+
+    def test_update_quantities_checks_stock(self):
+        """Test that quantities beyond the stock are refused, and nothing is saved."""
+        url = reverse("cart-list")
+
+        response = self.client.post(url, data=self.quantities_data(2, 7, 3))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "We only have 6kg of Carrots left.")
+        self.assertEqual(
+            list(Cart.objects.values_list("purchase_quantity", flat=True)), [2, 1, 1]
+        )
+
+    def test_checkout_buys_the_quantities_on_the_page(self):
+        """Test that Buy checks out quantities edited but not saved yet."""
+        url = reverse("cart-list")
+
+        response = self.client.post(
+            url, data=self.quantities_data(3, 1, 1, update=False)
+        )
+
+        self.assertRedirects(response, reverse("checkout-success"))
+        self.assertEqual(Product.objects.get(name="Potatoes").quantity_available, 7)
+
 
 class CartItemCreateViewTest(BaseViewClassTest):
     """Test cases for the CartItemCreateView."""
@@ -0,0 +1,126 @@
+"""Test Classes for the worker warm-up and the readiness probe."""
+from unittest import mock
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.test import TestCase, override_settings
+from django.urls.base import reverse
+from cart.db_init import initialize_database
+from cart.models import Cart, Product, RequestProfile
+from cart.warmup import request_routes
+from shoply import metrics, warmup
+
+
+def failing_step() -> None:
+    raise RuntimeError("cold")
+
+
+class WarmupTest(TestCase):
+    """Tests for running the warm-up steps and reporting readiness."""
+
+    def setUp(self) -> None:
+        """Set up Database objects and a warm-up of the test's own."""
+        initialize_database()
+        self.addCleanup(setattr, warmup, "state", warmup.state)
+        warmup.state = warmup.Warmup()
+
+    def test_not_ready_until_warmed_up(self):
+        """Test that the probe answers 503 while warming up, then 200 with the time
+        each step took.
+        """
+        warmup.state.started = 0.0
+
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response.json()["warmup_seconds"], None)
+
+        warmup.state.run()
+
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 200)
+        status = response.json()
+        self.assertIsNotNone(status["warmup_seconds"])
+        self.assertEqual(
+            list(status["steps"]),
+            [
+                "cart.warmup.compile_templates",
+                "cart.warmup.prime_caches",
+                "cart.warmup.request_routes",
+            ],
+        )
+        self.assertEqual(status["failed"], [])
+
+    def test_ready_without_warmup(self):
+        """Test that a process that never warms up is ready."""
+        self.assertEqual(self.client.get(reverse("ready")).status_code, 200)
+
+    @override_settings(
+        WARMUP_STEPS=["cart.tests.test_warmup.failing_step", "cart.warmup.prime_caches"]
+    )
+    def test_failing_steps_are_skipped(self):
+        """Test that a failing step is logged and the rest still run."""
+        with self.assertLogs("shoply.warmup", "ERROR"):
+            warmup.state.run()
+
+        self.assertTrue(warmup.state.ready)
+        self.assertEqual(
+            warmup.state.status()["failed"], ["cart.tests.test_warmup.failing_step"]
+        )
+        self.assertIn("cart.warmup.prime_caches", warmup.state.steps)
+
+    def test_requests_change_nothing(self):
+        """Test that the synthetic requests all succeed and leave the data alone."""
+        cart = list(Cart.objects.values_list("pk", "purchase_quantity"))
+        stock = list(Product.objects.values_list("pk", "quantity_available"))
+
+        with self.assertNoLogs("cart.warmup", "WARNING"):
+            warmup.state.run()
+
+        self.assertEqual(warmup.state.failed, [])
+        self.assertEqual(
+            list(Cart.objects.values_list("pk", "purchase_quantity")), cart
+        )
+        self.assertEqual(
+            list(Product.objects.values_list("pk", "quantity_available")), stock
+        )
+
+    @override_settings(PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=1.0)
+    def test_requests_are_left_out_of_metrics_and_profiles(self):
+        """Test that the warm-up's requests are neither measured nor profiled, and
+        that a request can't pass for one without the process's token.
+        """
+        metrics.reset()
+        request_routes()
+
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertEqual(metrics.collect()[0].counters, {})
+
+        self.client.get(reverse("checkout-success"), HTTP_X_WARMUP="guess")
+
+        self.assertEqual(RequestProfile.objects.get().route, "checkout-success")
+        self.assertNotEqual(metrics.collect()[0].counters, {})
+
+    def test_requests_go_through_the_server_handler(self):
+        """Test that the pages are requested through the handler given to `start`,
+        without the signals of a server's requests.
+        """
+        server = WSGIHandler()
+        self.addCleanup(setattr, warmup, "handler", warmup.handler)
+        signals = []
+
+        def received(signal, **kwargs):
+            signals.append(signal)
+
+        for signal in (request_started, request_finished):
+            signal.connect(received)
+            self.addCleanup(signal.disconnect, received)
+
+        with self.settings(WARMUP=False):
+            warmup.start(server)
+        with mock.patch.object(
+            server, "get_response", wraps=server.get_response
+        ) as get_response:
+            request_routes()
+
+        self.assertEqual(get_response.call_count, 5)
+        self.assertEqual(signals, [])
@@ -17,6 +17,7 @@ urlpatterns = [
         name="delete-cart-item",
     ),
     path("item/create/", views.CartItemCreateView.as_view(), name="create-cart-item"),
+    path("events", views.cart_events, name="cart-events"),
     path(
         "success",
         TemplateView.as_view(template_name="cart/checkout_success.html"),
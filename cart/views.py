@@ -1,30 +1,95 @@
 """View Classes for redering pages, interacting with forms and models."""
+import uuid
 from typing import Any, Dict
+from django.conf import settings
 from django.forms.models import modelformset_factory
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, HttpResponseRedirect
 from django.views.generic import CreateView, UpdateView, DeleteView, FormView
 from cart.models import Cart
-from cart.forms import CheckOutForm, CreateItemForm, UpdateItemForm
-from django.urls import reverse_lazy
+from cart.forms import CheckOutForm, CheckOutFormSet, CreateItemForm, UpdateItemForm
+from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext as _
+from cart import idempotency, inventory, rendering
+from shoply import admission
+
+
+class IdempotentPostMixin:
+    """Replay the stored response when a POST is retried with the same idempotency
+    key (an Idempotency-Key header, or the idempotency_key field of the form).
+
+    The POST is admitted to the writes pool first, so a request that is shed makes
+    no claim (a write) on the cache.
+    """
+
+    @admission.limited("writes")
+    def post(self, request, *args, **kwargs) -> HttpResponse:
+        key = idempotency.key_for(request, request.resolver_match.view_name)
+        if key is None:
+            return super().post(request, *args, **kwargs)
+
+        claimed = idempotency.claim(key)
+        if claimed == idempotency.IN_FLIGHT:
+            response = HttpResponse(
+                _("This request is already being processed."), status=409
+            )
+            response["Retry-After"] = "1"
+            return response
+        if claimed is not None:
+            return claimed
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            idempotency.release(key)
+            raise
+        idempotency.store(key, response)
+        return response
 
-# Import to trigger running of the database initializations.
-from cart import db_init
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        """Add a fresh idempotency key for the form to submit."""
+        context = super().get_context_data(**kwargs)
+        context["idempotency_key"] = uuid.uuid4().hex
+        return context
 
 
-class CartCheckOutView(FormView):
+class CartCheckOutView(IdempotentPostMixin, FormView):
     """Creates view for the list of items in the cart to be checked out."""
 
-    form_class = modelformset_factory(Cart, form=CheckOutForm, extra=0)
+    form_class = modelformset_factory(
+        Cart,
+        form=CheckOutForm,
+        formset=CheckOutFormSet,
+        extra=0,
+        max_num=settings.CART_MAX_LINES,
+        absolute_max=settings.CART_MAX_LINES,
+    )
     success_url = reverse_lazy("checkout-success")
     template_name = "cart/cart_checkout.html"
+    # A checkout runs 10 queries, and its idempotency key 7 more on the cache: the
+    # lookup, then the claim and the stored response (count, select, write each).
+    query_budget = 17
+    # Render the rows of an unbound formset with cart.rendering instead of as_p.
+    fast_rows = True
 
     def form_valid(self, form) -> HttpResponse:
         """Call the save method of the form to clear cart and save update to the
-        Product inventory.
+        Product inventory, or only save the quantities changed on the page when
+        the "Update Quantities" button was pressed.
         """
-        for f in form:
-            f.save()
+        if "update_quantities" in self.request.POST:
+            form.update_quantities()
+            return HttpResponseRedirect(reverse("cart-list"))
+
+        try:
+            form.save()
+        except inventory.OutOfStock as e:
+            form._non_form_errors = form.error_class(
+                [
+                    _("Sorry, %(product_names)s sold out while you were checking out.")
+                    % {"product_names": ", ".join(e.product_names)}
+                ]
+            )
+            return self.form_invalid(form)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
@@ -32,7 +97,20 @@ class CartCheckOutView(FormView):
         context data.
         """
         context = super().get_context_data(**kwargs)
-        items = Cart.objects.all()
+        form = context["form"]
+        if self.fast_rows and not form.is_bound:
+            rows = rendering.checkout_rows(form)
+            context.update(
+                {
+                    "checkout_rows": rows,
+                    "total_quantity": rows.total_quantity,
+                    "total_cost": rows.total_cost,
+                }
+            )
+            return context
+
+        # The items the formset already loaded.
+        items = form.get_queryset()
         total_cost = 0
         total_quantity = 0
         for item in items:
@@ -50,6 +128,11 @@ class CartItemCreateView(CreateView):
     form_class = CreateItemForm
     template_name = "cart/cart_add_new_item.html"
     success_url = reverse_lazy("cart-list")
+    query_budget = 8
+
+    @admission.limited("writes")
+    def form_valid(self, form) -> HttpResponse:
+        return super().form_valid(form)
 
 
 class CartItemUpdateView(UpdateView):
@@ -58,6 +141,11 @@ class CartItemUpdateView(UpdateView):
     form_class = UpdateItemForm
     queryset = Cart.objects.all()
     success_url = reverse_lazy("cart-list")
+    query_budget = 8
+
+    @admission.limited("writes")
+    def form_valid(self, form) -> HttpResponse:
+        return super().form_valid(form)
 
 
 class CartItemDeleteView(DeleteView):
@@ -65,3 +153,15 @@ class CartItemDeleteView(DeleteView):
 
     model = Cart
     success_url = reverse_lazy("cart-list")
+    query_budget = 6
+
+    @admission.limited("writes")
+    def delete(self, request, *args, **kwargs) -> HttpResponse:
+        return super().delete(request, *args, **kwargs)
+
+
+def cart_events(request) -> HttpResponse:
+    """Stand in for the stock event stream, which only the ASGI application serves
+    (cart.events); a 204 tells EventSource clients not to reconnect.
+    """
+    return HttpResponse(status=204)
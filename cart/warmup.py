@@ -0,0 +1,62 @@
+"""Warm-up steps for the cart (see shoply.warmup): the work each cart page leaves to
+the first request that needs it, done before the worker takes traffic.
+"""
+import logging
+import os
+from django.apps import apps
+from django.conf import settings
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import get_resolver, reverse
+from cart import coherence, inventory
+from cart.models import Cart
+from shoply import warmup
+
+
+logger = logging.getLogger(__name__)
+
+
+def compile_templates() -> None:
+    """Load the cart templates, which the cached template loader keeps compiled."""
+    directory = os.path.join(apps.get_app_config("cart").path, "templates")
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(".html"):
+                get_template(os.path.relpath(os.path.join(root, name), directory))
+
+
+def prime_caches() -> None:
+    """Build the URL resolver and load the inventory snapshot."""
+    get_resolver().reverse_dict
+    coherence.check()
+    inventory.snapshot()
+
+
+def request_routes() -> None:
+    """GET every cart page once through the server's handler and its middleware,
+    which also imports the views and builds their forms and the checkout's product
+    choices.
+
+    Only GETs are sent, so nothing is changed; the item pages use the first cart item,
+    and are skipped while the cart is empty. The requests carry the warm-up's X-Warmup
+    token, so they are kept out of the metrics and profiles.
+    """
+    host = next(
+        (host for host in settings.ALLOWED_HOSTS if "*" not in host),
+        "localhost",
+    ).lstrip(".")
+    factory = RequestFactory(HTTP_HOST=host, HTTP_X_WARMUP=warmup.TOKEN)
+    get_response = warmup.response_getter()
+    paths = [
+        reverse(name) for name in ("cart-list", "create-cart-item", "checkout-success")
+    ]
+    item = Cart.objects.values_list("pk", flat=True).order_by("pk").first()
+    if item is not None:
+        paths += [
+            reverse(name, args=[item])
+            for name in ("update-cart-item", "delete-cart-item")
+        ]
+    for path in paths:
+        response = get_response(factory.get(path, HTTP_ACCEPT_ENCODING="br, gzip"))
+        if response.status_code >= 400:
+            logger.warning("Warm-up request %s got %s", path, response.status_code)
@@ -0,0 +1,153 @@
+"""Admission control: bounded concurrency for expensive work, with a short wait queue.
+
+Each pool in settings.ADMISSION_POOLS lets `concurrency` requests of a worker process
+run at once and up to `queue` more wait (for at most `timeout` seconds) for a slot.
+Anything beyond that is shed at once with a 503 and a Retry-After header, instead of
+queueing on the database and slowing down every other request with it.
+"""
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+from shoply import metrics
+
+
+metrics.register(
+    "shoply_admission_active", "gauge", "Requests running in each admission pool."
+)
+metrics.register(
+    "shoply_admission_queue_depth",
+    "gauge",
+    "Requests waiting for a slot in each admission pool.",
+)
+metrics.register(
+    "shoply_admission_wait_seconds",
+    "histogram",
+    "Time admitted requests waited for a slot.",
+)
+metrics.register(
+    "shoply_admission_shed_total",
+    "counter",
+    "Requests turned away by each admission pool, by reason (queue_full or timeout).",
+)
+
+
+class Overloaded(Exception):
+    """Raised when a pool can't admit a request."""
+
+    def __init__(self, pool: str, reason: str, retry_after: float) -> None:
+        super().__init__(f"{pool} pool overloaded ({reason})")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Admit at most `concurrency` holders at once, and queue at most `queue` more."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue: int = 0,
+        timeout: float = 1.0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("shoply_admission_active", self.active, pool=self.name)
+        metrics.set_gauge("shoply_admission_queue_depth", self.waiting, pool=self.name)
+
+    def _shed(self, reason: str) -> Overloaded:
+        metrics.inc("shoply_admission_shed_total", pool=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after)
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Hold a slot for the duration of the block, or raise Overloaded."""
+        with self._condition:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.queue:
+                    raise self._shed("queue_full")
+                start = time.perf_counter()
+                self.waiting += 1
+                self._update_gauges()
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: self.active < self.concurrency, self.timeout
+                    )
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self._update_gauges()
+                    raise self._shed("timeout")
+                metrics.observe(
+                    "shoply_admission_wait_seconds",
+                    time.perf_counter() - start,
+                    pool=self.name,
+                )
+            self.active += 1
+            self._update_gauges()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._update_gauges()
+                self._condition.notify()
+
+
+@functools.lru_cache(maxsize=None)
+def limiter(pool: str) -> Limiter:
+    """Return the process wide limiter of a pool configured in ADMISSION_POOLS."""
+    return Limiter(pool, **settings.ADMISSION_POOLS[pool])
+
+
+@receiver(setting_changed)
+def _reset_limiters(setting, **kwargs) -> None:
+    if setting == "ADMISSION_POOLS":
+        limiter.cache_clear()
+
+
+def overloaded_response(error: Overloaded) -> HttpResponse:
+    """Return the 503 telling the client when to try again."""
+    response = HttpResponse(
+        _("The shop is busy right now, please try again in a moment."), status=503
+    )
+    response["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
+
+def limited(pool: str):
+    """Decorate a view (or view method) to run it in a slot of the `pool` limiter,
+    answering with a 503 when none is free in time.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with limiter(pool).admit():
+                    return view(*args, **kwargs)
+            except Overloaded as e:
+                return overloaded_response(e)
+
+        return wrapper
+
+    return decorator
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shoply.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up: the stock event stream, served in front of Django.
+from cart.events import EventStreams  # noqa: E402
+
+application = EventStreams(django_application)
+
+# Warm the worker up before it takes traffic.
+from shoply import warmup  # noqa: E402
+
+warmup.start(django_application)
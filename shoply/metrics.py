@@ -0,0 +1,234 @@
+"""Low overhead counters, gauges and histograms, exposed in the Prometheus text format.
+
+Every thread records into a store of its own, so recording takes no locks. A
+snapshot merges the stores of all threads in this process and, when METRICS_DIR is
+set, the snapshots the other worker processes periodically write to that directory.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+
+
+# Upper bounds (in seconds) of the latency histogram buckets, +Inf is implied.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Metric name -> (type, help text), used for the HELP and TYPE lines.
+DESCRIPTIONS: Dict[str, Tuple[str, str]] = {}
+
+
+def register(name: str, kind: str, help_text: str) -> None:
+    """Describe a metric; kind is "counter", "gauge" or "histogram"."""
+    DESCRIPTIONS[name] = (kind, help_text)
+
+
+register("shoply_request_duration_seconds", "histogram", "Request latency per view.")
+register("shoply_db_queries_total", "counter", "Database queries per view.")
+register("shoply_db_query_seconds_total", "counter", "Time spent in database queries.")
+register(
+    "shoply_template_render_seconds_total", "counter", "Time spent rendering templates."
+)
+
+
+class Store:
+    """Metrics recorded by one thread."""
+
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread: Optional[threading.Thread]) -> None:
+        self.thread = thread
+        self.counters: Dict[Key, float] = defaultdict(float)
+        self.histograms: Dict[Key, List[float]] = {}
+
+    def merge(self, other: "Store") -> None:
+        for key, value in list(other.counters.items()):
+            self.counters[key] += value
+        for key, values in list(other.histograms.items()):
+            merged = self.histograms.setdefault(key, [0.0] * (len(BUCKETS) + 2))
+            for i, value in enumerate(list(values)):
+                merged[i] += value
+
+
+_local = threading.local()
+_stores: List[Store] = []
+_retired = Store(None)
+_gauges: Dict[Key, float] = {}
+_registry_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _store() -> Store:
+    try:
+        return _local.store
+    except AttributeError:
+        store = _local.store = Store(threading.current_thread())
+        with _registry_lock:
+            _stores.append(store)
+        return store
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Add value to a counter."""
+    _store().counters[_key(name, labels)] += value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record value in a histogram."""
+    histograms = _store().histograms
+    key = _key(name, labels)
+    values = histograms.get(key)
+    if values is None:
+        values = histograms[key] = [0.0] * (len(BUCKETS) + 2)
+    values[bisect.bisect_left(BUCKETS, value)] += 1
+    values[-1] += value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set the current value of a gauge for this process."""
+    _gauges[_key(name, labels)] = value
+
+
+def local_snapshot() -> Store:
+    """Merge the stores of every thread of this process."""
+    snapshot = Store(None)
+    with _registry_lock:
+        # Fold the stores of finished threads away so thread churn can't grow the list.
+        for store in list(_stores):
+            if not store.thread.is_alive():
+                _retired.merge(store)
+                _stores.remove(store)
+        snapshot.merge(_retired)
+        for store in _stores:
+            snapshot.merge(store)
+    return snapshot
+
+
+def _serialize(store: Store, gauges: Dict[Key, float]) -> str:
+    return json.dumps(
+        {
+            "counters": [[n, l, v] for (n, l), v in store.counters.items()],
+            "histograms": [[n, l, v] for (n, l), v in store.histograms.items()],
+            "gauges": [[n, l, v] for (n, l), v in gauges.items()],
+        }
+    )
+
+
+def _deserialize(data: str) -> Tuple[Store, Dict[Key, float]]:
+    payload = json.loads(data)
+    store = Store(None)
+    for name, labels, value in payload["counters"]:
+        store.counters[name, tuple(map(tuple, labels))] = value
+    for name, labels, values in payload["histograms"]:
+        store.histograms[name, tuple(map(tuple, labels))] = values
+    gauges = {(n, tuple(map(tuple, l))): v for n, l, v in payload["gauges"]}
+    return store, gauges
+
+
+def flush(directory: Optional[str] = None) -> None:
+    """Write this process's snapshot to the shared metrics directory."""
+    directory = directory or getattr(settings, "METRICS_DIR", None)
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    data = _serialize(local_snapshot(), dict(_gauges))
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(data)
+    os.replace(path, os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def flush_if_due() -> None:
+    """Flush at most once every METRICS_FLUSH_INTERVAL seconds, from one thread."""
+    global _last_flush
+
+    interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+    if time.monotonic() - _last_flush < interval or not _flush_lock.acquire(False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        flush()
+    finally:
+        _flush_lock.release()
+
+
+def collect(directory: Optional[str] = None) -> Tuple[Store, Dict[Key, float]]:
+    """Merge this process's metrics with those the other workers flushed."""
+    store = local_snapshot()
+    gauges = defaultdict(float, _gauges)
+    directory = directory or getattr(settings, "METRICS_DIR", None)
+    if directory and os.path.isdir(directory):
+        own = f"{os.getpid()}.json"
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    other, other_gauges = _deserialize(f.read())
+            except (OSError, ValueError):
+                continue
+            store.merge(other)
+            for key, value in other_gauges.items():
+                gauges[key] += value
+    return store, gauges
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render(store: Store, gauges: Dict[Key, float]) -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    series = defaultdict(list)
+    for (name, labels), value in sorted(store.counters.items()):
+        series[name].append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), value in sorted(gauges.items()):
+        series[name].append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), values in sorted(store.histograms.items()):
+        cumulative = 0.0
+        for bound, count in zip(BUCKETS + ("+Inf",), values):
+            cumulative += count
+            bucket_labels = labels + (("le", str(bound)),)
+            series[name].append(
+                f"{name}_bucket{_format_labels(bucket_labels)} {cumulative:g}"
+            )
+        series[name].append(f"{name}_sum{_format_labels(labels)} {values[-1]:g}")
+        series[name].append(f"{name}_count{_format_labels(labels)} {cumulative:g}")
+
+    lines = []
+    for name in sorted(series):
+        kind, help_text = DESCRIPTIONS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(series[name])
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Forget everything recorded by this process."""
+    global _retired
+
+    with _registry_lock:
+        for store in _stores:
+            store.counters.clear()
+            store.histograms.clear()
+        _retired = Store(None)
+        _gauges.clear()
@@ -0,0 +1,381 @@
+"""Project wide middleware."""
+import gzip
+import logging
+import os
+import time
+import zlib
+from contextlib import ExitStack
+from typing import Iterable, Iterator, Optional
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.core.handlers.exception import convert_exception_to_response
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from shoply import metrics, warmup
+from shoply.querybudget import QueryBudgetExceeded, QueryRecorder, view_budget
+from shoply.routers import replica_available, use_replica
+from shoply.staticfiles import (
+    COMPRESSIBLE_TYPES,
+    StaticFiles,
+    accepted_encodings,
+    brotli,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class StaticFilesMiddleware:
+    """Serve the files collected into STATIC_ROOT from memory.
+
+    Fingerprinted (content hashed) files get far-future, immutable cache headers;
+    every file is sent in the smallest encoding the client accepts. Place it first in
+    MIDDLEWARE so static requests skip the rest of the stack. Until collectstatic has
+    been run the middleware removes itself and the development server serves them.
+    """
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.files = StaticFiles(root)
+        if not self.files.files:
+            raise MiddlewareNotUsed
+        self.prefix = settings.STATIC_URL
+        self.max_age = getattr(settings, "STATIC_MAX_AGE", 60 * 60 * 24 * 365)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix) or request.method not in (
+            "GET",
+            "HEAD",
+        ):
+            return self.get_response(request)
+        static_file = self.files.get(request.path[len(self.prefix) :])
+        if static_file is None:
+            return self.get_response(request)
+
+        if request.META.get("HTTP_IF_NONE_MATCH") == static_file.etag:
+            response = HttpResponseNotModified()
+        else:
+            encoding, content = static_file.negotiate(
+                request.META.get("HTTP_ACCEPT_ENCODING", "")
+            )
+            response = HttpResponse(
+                b"" if request.method == "HEAD" else content,
+                content_type=static_file.content_type,
+            )
+            response["Content-Length"] = len(content)
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = static_file.etag
+        if static_file.immutable:
+            response["Cache-Control"] = f"public, max-age={self.max_age}, immutable"
+        else:
+            response["Cache-Control"] = "public, max-age=60"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli (when installed) or gzip, as the client accepts.
+
+    Responses under COMPRESSION_MIN_SIZE bytes are sent as they are: compressing them
+    saves less than it costs. Streamed responses are compressed chunk by chunk, and
+    each chunk is flushed so the client gets it without waiting for the next one.
+    Responses that already have a Content-Encoding, like the static files, are left
+    alone. The CSRF token is masked differently in every response, so its compressed
+    size gives nothing away (BREACH).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        self.gzip_level = getattr(settings, "COMPRESSION_GZIP_LEVEL", 6)
+        self.brotli_quality = getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header("Content-Encoding") or not response.get(
+            "Content-Type", ""
+        ).startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = self.negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.stream(
+                encoding, response.streaming_content
+            )
+            del response["Content-Length"]
+        else:
+            content = self.compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        etag = response.get("ETag", "")
+        if etag.startswith('"'):
+            # The compressed body isn't byte for byte the one the tag was made for.
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """Return the encoding to send, or None to send the response as it is."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding == "br" and brotli is None:
+                continue
+            if encoding in accepted or "*" in accepted:
+                return encoding
+        return None
+
+    def compress(self, encoding: str, content: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(content, quality=self.brotli_quality)
+        return gzip.compress(content, compresslevel=self.gzip_level, mtime=0)
+
+    def stream(self, encoding: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush(
+                        zlib.Z_SYNC_FLUSH
+                    )
+            yield compressor.flush()
+
+
+class MiddlewareProfile:
+    """One chain of middleware, built the way Django builds MIDDLEWARE."""
+
+    def __init__(self, paths, get_response) -> None:
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        handler = get_response
+        for path in reversed(paths):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, "process_view"):
+                self.view_middleware.insert(0, instance.process_view)
+            if hasattr(instance, "process_template_response"):
+                self.template_response_middleware.append(
+                    instance.process_template_response
+                )
+            if hasattr(instance, "process_exception"):
+                self.exception_middleware.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+
+        self.handler = handler
+
+
+class RouteProfileMiddleware:
+    """Run a different middleware stack depending on the request path.
+
+    MIDDLEWARE_PROFILES maps a profile name to a list of middleware, and
+    MIDDLEWARE_PROFILE_ROUTES maps path prefixes to profile names; the longest
+    matching prefix wins and other paths use the "default" profile. This lets routes
+    that don't use sessions, auth or messages skip those layers entirely.
+    """
+
+    def __init__(self, get_response):
+        self.profiles = {
+            name: MiddlewareProfile(paths, get_response)
+            for name, paths in settings.MIDDLEWARE_PROFILES.items()
+        }
+        self.routes = sorted(
+            getattr(settings, "MIDDLEWARE_PROFILE_ROUTES", {}).items(),
+            key=lambda route: len(route[0]),
+            reverse=True,
+        )
+
+    def profile_for(self, path: str) -> MiddlewareProfile:
+        for prefix, name in self.routes:
+            if path.startswith(prefix):
+                return self.profiles[name]
+        return self.profiles["default"]
+
+    def __call__(self, request):
+        request.middleware_profile = self.profile_for(request.path_info)
+        return request.middleware_profile.handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in request.middleware_profile.view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+
+    def process_template_response(self, request, response):
+        for process in request.middleware_profile.template_response_middleware:
+            response = process(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for process in request.middleware_profile.exception_middleware:
+            response = process(request, exception)
+            if response is not None:
+                return response
+
+
+class QueryTimer:
+    """Execute wrapper counting the queries run through it and the time they take."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Record latency, database queries and time, and template render time per view.
+
+    Place it first in MIDDLEWARE so the whole stack is measured. The warm-up's
+    requests are left out: they are the slow, cold ones.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if warmup.is_warmup(request):
+            return self.get_response(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        labels = {
+            "view": match.view_name if match else "unresolved",
+            "method": request.method,
+        }
+        metrics.observe("shoply_request_duration_seconds", elapsed, **labels)
+        metrics.inc("shoply_db_queries_total", timer.count, **labels)
+        metrics.inc("shoply_db_query_seconds_total", timer.seconds, **labels)
+        render_seconds = getattr(request, "template_render_seconds", 0.0)
+        if render_seconds:
+            metrics.inc(
+                "shoply_template_render_seconds_total", render_seconds, **labels
+            )
+        metrics.flush_if_due()
+
+        return response
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.template_render_seconds = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests to the views in READ_REPLICA_VIEWS read from the replica.
+
+    After a client makes a write request it gets a short lived cookie, and while it
+    is present all of that client's reads go to the primary, so it always reads its
+    own writes even when the replica lags behind.
+    """
+
+    cookie_name = "shoply_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = set(getattr(settings, "READ_REPLICA_VIEWS", ()))
+        self.sticky_seconds = getattr(settings, "READ_REPLICA_STICKY_SECONDS", 5)
+
+    def __call__(self, request):
+        token = use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ("GET", "HEAD")
+            and self.cookie_name not in request.COOKIES
+            and request.resolver_match.view_name in self.views
+            and replica_available()
+        ):
+            use_replica.set(True)
+
+
+class QueryBudgetMiddleware:
+    """Flag requests that exceed their view's query budget or repeat a query shape.
+
+    Meant for development: QUERY_BUDGET_MODE "warn" logs the problems, "raise" fails
+    the request with QueryBudgetExceeded and "off" (the default) removes the
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "QUERY_BUDGET_MODE", "off")
+        if self.mode == "off":
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        budget = getattr(request, "query_budget", None)
+        problems = recorder.problems(budget)
+        if problems:
+            message = "{} {}: {}".format(
+                request.method,
+                match.view_name if match else request.path,
+                "; ".join(problems),
+            )
+            if self.mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = view_budget(view_func, request.resolver_match.view_name)
@@ -0,0 +1,117 @@
+"""Detection of repeated (N+1) queries and enforcement of per-view query budgets.
+
+A view declares its budget with a ``query_budget`` class attribute, or through the
+QUERY_BUDGETS setting (view name -> maximum queries) for views without a class of
+their own. Within one request, any query shape (the SQL with its literals and
+parameter lists normalized away) that runs N_PLUS_ONE_THRESHOLD times or more is
+reported as a likely per-row query.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import List, Optional
+from django.conf import settings
+from django.db import connections
+from django.test.utils import modify_settings, override_settings
+
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_SPACE = re.compile(r"\s+")
+# Transaction control isn't counted: TestCase turns a view's transactions into
+# savepoints, so counting them would make budgets differ between tests and production.
+_TRANSACTION_CONTROL = re.compile(r"\s*(BEGIN|SAVEPOINT|RELEASE|ROLLBACK)\b", re.I)
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries than its budget, or repeated a query shape."""
+
+
+def fingerprint(sql: str) -> str:
+    """Return the shape of a SQL statement: literals become ? and lists (...)."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    """Execute wrapper counting the queries run through it by shape, leaving out
+    transaction control statements.
+    """
+
+    def __init__(self) -> None:
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not _TRANSACTION_CONTROL.match(sql):
+            self.shapes[fingerprint(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self) -> int:
+        return sum(self.shapes.values())
+
+    @contextmanager
+    def record(self):
+        """Record the queries run on every database connection."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def problems(
+        self, budget: Optional[int] = None, threshold: Optional[int] = None
+    ) -> List[str]:
+        """Describe the budget overrun and the repeated query shapes, if any."""
+        if threshold is None:
+            threshold = getattr(settings, "N_PLUS_ONE_THRESHOLD", 5)
+        problems = []
+        if budget is not None and self.total > budget:
+            problems.append(f"{self.total} queries exceed the budget of {budget}")
+        for shape, count in self.shapes.most_common():
+            if count < threshold:
+                break
+            problems.append(f"{count} queries with the same shape: {shape}")
+        return problems
+
+
+def view_budget(view_func, view_name: str) -> Optional[int]:
+    """Return the query budget declared for a view, if any."""
+    view_class = getattr(view_func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is None:
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(view_name)
+    return budget
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin failing any test request that exceeds its view's query budget
+    or repeats a query shape, and adding an assertQueryBudget() context manager.
+    """
+
+    def _pre_setup(self) -> None:
+        super()._pre_setup()
+        for manager in (
+            override_settings(QUERY_BUDGET_MODE="raise"),
+            modify_settings(
+                MIDDLEWARE={"append": "shoply.middleware.QueryBudgetMiddleware"}
+            ),
+        ):
+            manager.enable()
+            self.addCleanup(manager.disable)
+
+    @contextmanager
+    def assertQueryBudget(
+        self, budget: Optional[int] = None, threshold: Optional[int] = None
+    ):
+        """Fail if the block runs more than budget queries or repeats a query shape."""
+        with QueryRecorder().record() as recorder:
+            yield recorder
+        problems = recorder.problems(budget, threshold)
+        if problems:
+            self.fail("\n".join(problems))
@@ -0,0 +1,39 @@
+"""Database router sending the reads of read-only views to a replica."""
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+
+REPLICA_ALIAS = "replica"
+
+# True while the current request may read from the replica.
+use_replica: ContextVar[bool] = ContextVar("use_replica", default=False)
+
+
+def replica_available() -> bool:
+    """Return True when a replica database is configured."""
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class ReplicaRouter:
+    """Route reads to the replica only for requests marked read-only by
+    ReplicaRoutingMiddleware, outside of transactions; everything else, and every
+    write, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Inside a transaction on the primary, reads must see its uncommitted writes.
+        if use_replica.get() and not connections["default"].in_atomic_block:
+            return REPLICA_ALIAS
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        # A read-only view that writes anyway reads its own writes from now on.
+        use_replica.set(False)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,7 +24,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = "django-insecure-330o@jka!*jg0vl5g+y3-ijb3gowv(26$v#82&9@&7038gk+8$"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("SHOPLY_DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = ["*"]
 
@@ -41,22 +42,81 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "shoply.middleware.StaticFilesMiddleware",
+    "shoply.middleware.MetricsMiddleware",
+    "shoply.middleware.CompressionMiddleware",
+    "cart.middleware.ProfilingMiddleware",
+    "shoply.middleware.RouteProfileMiddleware",
+    "shoply.middleware.ReplicaRoutingMiddleware",
+    "shoply.middleware.QueryBudgetMiddleware",
 ]
 
+# Middleware stacks run by RouteProfileMiddleware. The cart pages use neither
+# sessions, auth nor messages, so their "lean" profile leaves those layers out and
+# a cart page view never reads or writes a session.
+
+MIDDLEWARE_PROFILES = {
+    "default": [
+        "django.middleware.security.SecurityMiddleware",
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    ],
+    "lean": [
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    ],
+}
+
+MIDDLEWARE_PROFILE_ROUTES = {
+    "/cart/": os.environ.get("SHOPLY_CART_MIDDLEWARE_PROFILE", "lean"),
+    "/metrics": "lean",
+}
+
+# The admin checks look for its middleware in MIDDLEWARE only; it is in the
+# "default" profile above.
+
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+# Where sessions are kept: "db", "cache" (cached_db: cache in front of the database)
+# or "signed_cookies" (no server side storage at all).
+
+SESSION_ENGINE = (
+    "django.contrib.sessions.backends."
+    + {
+        "db": "db",
+        "cache": "cached_db",
+        "signed_cookies": "signed_cookies",
+    }[os.environ.get("SHOPLY_SESSION_STORE", "db")]
+)
+
 ROOT_URLCONF = "shoply.urls"
 
+# Templates are compiled once per process by the cached loader, except under DEBUG,
+# where edits should show up without a restart. SHOPLY_CACHED_TEMPLATES=1 caches them
+# under DEBUG too, e.g. to benchmark production rendering.
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "shoply.template_loaders.TrimmedLoader",
+]
+
+if not DEBUG or os.environ.get("SHOPLY_CACHED_TEMPLATES") == "1":
+    TEMPLATE_LOADERS = [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+
+# App templates whose names start with these prefixes are loaded with their indentation
+# and blank lines removed, which shrinks large pages.
+
+TRIMMED_TEMPLATES = ["cart/"]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -64,6 +124,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            "loaders": TEMPLATE_LOADERS,
         },
     },
 ]
@@ -74,13 +135,92 @@ WSGI_APPLICATION = "shoply.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# The shoply.backends.sqlite3 engine applies the pragmas below to every new
+# connection. Each value can be overridden with the environment variable named
+# next to it.
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "ENGINE": "shoply.backends.sqlite3",
+        "NAME": os.environ.get("SHOPLY_DB_NAME", BASE_DIR / "db.sqlite3"),
+        # Seconds to keep a connection open across requests (0 closes it per request).
+        "CONN_MAX_AGE": int(os.environ.get("SHOPLY_DB_CONN_MAX_AGE", "60")),
+        "OPTIONS": {
+            "pragmas": {
+                "journal_mode": os.environ.get("SHOPLY_DB_JOURNAL_MODE", "WAL"),
+                "synchronous": os.environ.get("SHOPLY_DB_SYNCHRONOUS", "NORMAL"),
+                "busy_timeout": int(
+                    os.environ.get("SHOPLY_DB_BUSY_TIMEOUT_MS", "5000")
+                ),
+                # Negative values are in KiB, so this is a 64 MiB page cache.
+                "cache_size": int(os.environ.get("SHOPLY_DB_CACHE_SIZE", "-65536")),
+                "mmap_size": int(os.environ.get("SHOPLY_DB_MMAP_SIZE", "268435456")),
+                "temp_store": "MEMORY",
+                "foreign_keys": "ON",
+            },
+            "transaction_mode": os.environ.get(
+                "SHOPLY_DB_TRANSACTION_MODE", "IMMEDIATE"
+            ),
+            "health_check_interval": float(
+                os.environ.get("SHOPLY_DB_HEALTH_CHECK_INTERVAL", "30")
+            ),
+        },
     }
 }
 
+# Read-only replica. Set SHOPLY_DB_REPLICA_NAME to a replicated copy of the primary
+# database; by default it is emulated with read-only connections to the primary file,
+# which in WAL mode never block (or get blocked by) the writer.
+
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "NAME": os.environ.get(
+        "SHOPLY_DB_REPLICA_NAME", f"file:{DATABASES['default']['NAME']}?mode=ro"
+    ),
+    "OPTIONS": {
+        **DATABASES["default"]["OPTIONS"],
+        "transaction_mode": "DEFERRED",
+    },
+    "TEST": {"MIRROR": "default"},
+}
+
+DATABASE_ROUTERS = ["shoply.routers.ReplicaRouter"]
+
+# Views whose GET requests read from the replica, and how long (in seconds) a client
+# keeps reading from the primary after it writes.
+
+READ_REPLICA_VIEWS = [
+    "cart-list",
+    "update-cart-item",
+    "admin:cart_product_changelist",
+]
+
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get("SHOPLY_READ_REPLICA_STICKY", "5"))
+
+
+# Caches. "idempotency" keeps the responses of checkouts for replaying retries, in a
+# database table created by `python manage.py createcachetable`.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cart_idempotency_cache",
+        # Seconds a key (and its response) is kept.
+        "TIMEOUT": int(os.environ.get("SHOPLY_IDEMPOTENCY_TTL", "86400")),
+        "OPTIONS": {"MAX_ENTRIES": 100000, "CULL_FREQUENCY": 10},
+    },
+}
+
+# Seconds a key stays claimed by a request that is still running: a retry of a request
+# whose worker died gets 409 for this long, then runs. Keep it above the request timeout.
+
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT = int(
+    os.environ.get("SHOPLY_IDEMPOTENCY_IN_FLIGHT_TIMEOUT", "60")
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -120,7 +260,179 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
+# `python manage.py collectstatic` writes content hashed, precompressed copies of the
+# static files here, and StaticFilesMiddleware serves them from memory.
+
+STATIC_ROOT = os.environ.get("SHOPLY_STATIC_ROOT", BASE_DIR / "staticfiles")
+
+STATICFILES_STORAGE = "shoply.staticfiles.CompressedManifestStaticFilesStorage"
+
+# Cache lifetime (seconds) of fingerprinted static files.
+
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+# Responses of at least COMPRESSION_MIN_SIZE bytes, and all streamed responses, are
+# compressed with brotli (if installed) or gzip when the client accepts it.
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("SHOPLY_COMPRESSION_MIN_SIZE", "1024"))
+
+COMPRESSION_GZIP_LEVEL = 6
+
+COMPRESSION_BROTLI_QUALITY = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Maximum median time (ms) for a fresh worker to boot and serve its first response,
+# enforced by `python manage.py bench_startup`.
+
+STARTUP_BUDGET_MS = float(os.environ.get("SHOPLY_STARTUP_BUDGET_MS", "2000"))
+
+
+# Each worker warms up as it boots (shoply.warmup): the WARMUP_STEPS run on a thread of
+# their own, and /ready answers 503 until they are done. SHOPLY_WARMUP=0 skips it.
+
+WARMUP = os.environ.get("SHOPLY_WARMUP", "1") == "1"
+
+WARMUP_STEPS = [
+    "cart.warmup.compile_templates",
+    "cart.warmup.prime_caches",
+    "cart.warmup.request_routes",
+]
+
+
+# Directory where each worker process periodically writes its metrics, so that
+# /metrics reports all of them. Leave unset for a single process deployment.
+
+METRICS_DIR = os.environ.get("SHOPLY_METRICS_DIR")
+
+METRICS_FLUSH_INTERVAL = float(os.environ.get("SHOPLY_METRICS_FLUSH_INTERVAL", "5"))
+
+
+# Results file `python manage.py bench_routes` compares each run against.
+
+BENCHMARK_BASELINE = os.environ.get(
+    "SHOPLY_BENCHMARK_BASELINE", BASE_DIR / "bench_baseline.json"
+)
+
+
+# Development checks for per-row queries: "warn" logs and "raise" fails requests that
+# exceed their view's query_budget or run one query shape N_PLUS_ONE_THRESHOLD times.
+# QUERY_BUDGETS holds the budgets of views without a class of their own.
+
+QUERY_BUDGET_MODE = os.environ.get("SHOPLY_QUERY_BUDGET_MODE", "off")
+
+N_PLUS_ONE_THRESHOLD = 5
+
+QUERY_BUDGETS = {
+    "checkout-success": 3,
+}
+
+
+# On-demand profiling: requests with an X-Profile header equal to PROFILING_TOKEN, and
+# a PROFILING_SAMPLE_RATE fraction of all requests, are profiled and listed in the
+# admin. With neither set the profiling middleware is disabled.
+
+PROFILING_TOKEN = os.environ.get("SHOPLY_PROFILING_TOKEN", "")
+
+PROFILING_SAMPLE_RATE = float(os.environ.get("SHOPLY_PROFILING_SAMPLE_RATE", "0"))
+
+PROFILING_MAX_PROFILES = 200
+
+
+# Orders older than ORDER_RETENTION_DAYS are moved by `python manage.py archive_orders`
+# into gzipped, per-month JSON Lines files in ORDER_ARCHIVE_DIR.
+
+ORDER_ARCHIVE_DIR = os.environ.get("SHOPLY_ORDER_ARCHIVE_DIR", BASE_DIR / "archive")
+
+ORDER_RETENTION_DAYS = int(os.environ.get("SHOPLY_ORDER_RETENTION_DAYS", "90"))
+
+
+# `python manage.py compact_stock_ledger` folds stock movements older than
+# STOCK_LEDGER_RETENTION_DAYS into per-product checkpoints.
+
+STOCK_LEDGER_RETENTION_DAYS = int(
+    os.environ.get("SHOPLY_STOCK_LEDGER_RETENTION_DAYS", "90")
+)
+
+
+# Products without a low_stock_threshold of their own raise a low stock alert once
+# their quantity_available falls to this many kg.
+
+LOW_STOCK_THRESHOLD = int(os.environ.get("SHOPLY_LOW_STOCK_THRESHOLD", "5"))
+
+
+# Admission control. Each worker process runs at most `concurrency` requests of a pool
+# at once; up to `queue` more wait at most `timeout` seconds for a slot, and the rest
+# get a 503 with Retry-After. SQLite has a single writer, so across all workers the
+# "writes" concurrency should add up to a few at most.
+
+ADMISSION_POOLS = {
+    "writes": {
+        "concurrency": int(os.environ.get("SHOPLY_WRITE_CONCURRENCY", "2")),
+        "queue": int(os.environ.get("SHOPLY_WRITE_QUEUE", "8")),
+        "timeout": float(os.environ.get("SHOPLY_WRITE_QUEUE_TIMEOUT", "2")),
+        "retry_after": 1,
+    },
+}
+
+
+# Background tasks (cart.taskqueue). After a commit that queued tasks, up to
+# TASK_THREADS threads of the web process run them; set it to 0 to leave them to
+# `python manage.py run_tasks` workers. A claimed task is retried by another worker if
+# it is not finished within TASK_LEASE_SECONDS.
+
+TASK_THREADS = int(os.environ.get("SHOPLY_TASK_THREADS", "2"))
+
+TASK_BATCH_SIZE = 100
+
+TASK_LEASE_SECONDS = 300
+
+
+# Stock and price checks read an in-memory snapshot of the inventory (cart.inventory),
+# kept current with the changes of every process through cart.coherence. Changes made
+# without signals (QuerySet.update()) show up once the snapshot is reloaded, at most
+# INVENTORY_SNAPSHOT_MAX_AGE seconds later.
+
+INVENTORY_SNAPSHOT_MAX_AGE = float(
+    os.environ.get("SHOPLY_INVENTORY_SNAPSHOT_MAX_AGE", "300")
+)
+
+
+# The most lines a cart can check out at once (the checkout formset's max_num and
+# absolute_max). Django's defaults would turn away carts of more than 2000 lines, and
+# its limit of 1000 POST fields carts of more than about 500: a line posts its id and
+# quantity.
+
+CART_MAX_LINES = int(os.environ.get("SHOPLY_CART_MAX_LINES", "10000"))
+
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 2 * CART_MAX_LINES + 100
+
+
+# Per-process caches are kept coherent through a log of invalidations that every
+# worker process appends to and checks at the start of each request, so all workers
+# must share this file. It is started afresh past CACHE_INVALIDATION_LOG_MAX_BYTES.
+
+CACHE_INVALIDATION_LOG = os.environ.get(
+    "SHOPLY_CACHE_INVALIDATION_LOG", BASE_DIR / "cache-invalidations.log"
+)
+
+CACHE_INVALIDATION_LOG_MAX_BYTES = 1024 * 1024
+
+# Runs the tests with a temporary CACHE_INVALIDATION_LOG.
+
+TEST_RUNNER = "shoply.test_runner.TestRunner"
+
+
+# Stock event streams (cart.events, ASGI only): how often (seconds) a process serving
+# them checks the invalidation log for other processes' changes, the seconds between
+# keep-alive comments on an idle stream, and how long (ms) clients wait to reconnect.
+
+EVENTS_POLL_INTERVAL = float(os.environ.get("SHOPLY_EVENTS_POLL_INTERVAL", "0.25"))
+
+EVENTS_HEARTBEAT_SECONDS = 15
+
+EVENTS_RETRY_MS = 3000
@@ -0,0 +1,160 @@
+"""Fingerprinted, precompressed static files, served from memory.
+
+collectstatic with CompressedManifestStaticFilesStorage writes content hashed copies
+of every static file plus .gz (and, when the optional brotli package is installed,
+.br) variants. StaticFiles loads the collected files into memory so
+StaticFilesMiddleware can answer static requests without touching the disk.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, Optional, Set
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+# Files worth compressing; images and fonts are compressed already.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "image/vnd.microsoft.icon",
+    "image/x-icon",
+)
+
+# Variants are only kept when they save at least this fraction of the size.
+MIN_SAVING = 0.05
+
+
+def compressible(name: str) -> bool:
+    content_type = mimetypes.guess_type(name)[0] or ""
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(content: bytes) -> Dict[str, bytes]:
+    """Return the gzip and brotli encodings of content that are worth keeping."""
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content)
+    limit = len(content) * (1 - MIN_SAVING)
+    return {encoding: data for encoding, data in variants.items() if len(data) < limit}
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Return the content codings of an Accept-Encoding header with a quality above 0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+EXTENSIONS = {"gzip": ".gz", "br": ".br"}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes compressed variants of each file.
+
+    Before collectstatic has run (in development and tests) the manifest is empty
+    and the unhashed names are used.
+    """
+
+    def stored_name(self, name: str) -> str:
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not compressible(name) or not self.exists(name):
+                continue
+            with self.open(name) as f:
+                content = f.read()
+            for encoding, data in compress(content).items():
+                path = self.path(name) + EXTENSIONS[encoding]
+                with open(path, "wb") as f:
+                    f.write(data)
+
+
+class StaticFile:
+    """A static file with its encodings, ready to be served."""
+
+    __slots__ = ("content_type", "etag", "immutable", "variants")
+
+    def __init__(self, content_type: str, etag: str, immutable: bool) -> None:
+        self.content_type = content_type
+        self.etag = etag
+        self.immutable = immutable
+        # Content-Encoding ("identity", "gzip" or "br") -> bytes.
+        self.variants: Dict[str, bytes] = {}
+
+    def negotiate(self, accept_encoding: str):
+        """Return the smallest variant the client accepts, and its encoding."""
+        accepted = accepted_encodings(accept_encoding)
+        best = "identity"
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                if len(self.variants[encoding]) < len(self.variants[best]):
+                    best = encoding
+        return best, self.variants[best]
+
+
+class StaticFiles:
+    """In-memory table of the files collected into a static root."""
+
+    def __init__(self, root: str) -> None:
+        self.files: Dict[str, StaticFile] = {}
+        hashed = set()
+        manifest = os.path.join(root, "staticfiles.json")
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                hashed = set(json.load(f).get("paths", {}).values())
+
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith((".gz", ".br")) or name == "staticfiles.json":
+                    continue
+                self.files[name] = self.load(path, name, name in hashed)
+
+    def load(self, path: str, name: str, immutable: bool) -> StaticFile:
+        with open(path, "rb") as f:
+            content = f.read()
+        content_type, _ = mimetypes.guess_type(name)
+        static_file = StaticFile(
+            content_type or "application/octet-stream",
+            '"{}"'.format(hashlib.md5(content).hexdigest()),
+            immutable,
+        )
+        static_file.variants["identity"] = content
+        for encoding, extension in EXTENSIONS.items():
+            if os.path.exists(path + extension):
+                with open(path + extension, "rb") as f:
+                    static_file.variants[encoding] = f.read()
+        return static_file
+
+    def get(self, name: str) -> Optional[StaticFile]:
+        return self.files.get(name)
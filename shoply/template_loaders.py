@@ -0,0 +1,26 @@
+"""Template loaders."""
+from django.conf import settings
+from django.template.loaders import app_directories
+
+
+def trim(source: str) -> str:
+    """Remove the indentation, trailing whitespace and blank lines of a template."""
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class TrimmedLoader(app_directories.Loader):
+    """Load templates from the apps' directories, trimming the whitespace of those
+    whose names start with one of TRIMMED_TEMPLATES.
+
+    The whitespace goes when the template is read, so with the cached loader it costs
+    nothing per request. Only HTML where leading whitespace doesn't matter (no <pre>
+    or <textarea> content) should be trimmed.
+    """
+
+    def get_contents(self, origin) -> str:
+        contents = super().get_contents(origin)
+        prefixes = tuple(getattr(settings, "TRIMMED_TEMPLATES", ()))
+        if prefixes and origin.template_name.startswith(prefixes):
+            return trim(contents)
+        return contents
@@ -0,0 +1,26 @@
+"""Test runner for the project."""
+import os
+import tempfile
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests with an invalidation log of their own (cart.coherence), so the
+    changes they make never reach the workers sharing the project's log.
+    """
+
+    def setup_test_environment(self, **kwargs) -> None:
+        super().setup_test_environment(**kwargs)
+        self.log_directory = tempfile.TemporaryDirectory()
+        self.log_setting = override_settings(
+            CACHE_INVALIDATION_LOG=os.path.join(
+                self.log_directory.name, "cache-invalidations.log"
+            )
+        )
+        self.log_setting.enable()
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        self.log_setting.disable()
+        self.log_directory.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -17,12 +17,13 @@ from django.contrib import admin
 from django.urls import path
 from django.views.generic import RedirectView
 from django.urls.conf import include
-from django.conf.urls.static import static
-from django.conf import settings
+from shoply import views
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("cart/", include("cart.urls")),
+    path("metrics", views.metrics, name="metrics"),
+    path("ready", views.ready, name="ready"),
     path("", RedirectView.as_view(url="cart/")),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+]
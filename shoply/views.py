@@ -0,0 +1,24 @@
+"""Project wide views."""
+from django.http import HttpResponse, JsonResponse
+from shoply import metrics as metrics_registry
+from shoply import warmup
+
+
+def metrics(request) -> HttpResponse:
+    """Expose the metrics of every worker in the Prometheus text format."""
+    store, gauges = metrics_registry.collect()
+    return HttpResponse(
+        metrics_registry.render(store, gauges),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def ready(request) -> HttpResponse:
+    """Readiness probe: 503 while the worker is warming up (shoply.warmup), then 200;
+    both with the progress and duration of the warm-up.
+    """
+    status = warmup.state.status()
+    response = JsonResponse(status, status=200 if status["ready"] else 503)
+    if not status["ready"]:
+        response["Retry-After"] = "1"
+    return response
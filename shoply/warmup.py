@@ -0,0 +1,143 @@
+"""Warm-up of a worker process before it takes traffic.
+
+URL resolution, compiled templates, view and form classes and the in-memory caches
+are each built by the first request that needs them, so a freshly started worker
+serves its first requests slowly. shoply.wsgi and shoply.asgi `start` a warm-up as the
+worker boots: the WARMUP_STEPS (dotted paths of functions taking no arguments) run on
+a thread of their own, and the readiness probe (shoply.views.ready) answers 503 until
+they are done, so a load balancer only sends traffic to warm workers.
+
+A step that fails is logged and skipped: a cold worker is better than none.
+
+Requests a step makes to warm the pages up go through the server's own handler
+(`response_getter`), so its middleware is the one warmed, and send an X-Warmup header
+holding this process's TOKEN, so that MetricsMiddleware and ProfilingMiddleware leave
+them out (`is_warmup`); a client can't pass for one without knowing the token.
+"""
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+from shoply import metrics
+
+
+logger = logging.getLogger(__name__)
+
+metrics.register("shoply_warmup_seconds", "histogram", "Time taken by worker warm-ups.")
+
+# Sent by warm-up requests as the X-Warmup header.
+TOKEN = secrets.token_hex(16)
+
+# The server's handler (the Django application of shoply.wsgi or shoply.asgi), given
+# to `start`.
+handler: Optional[BaseHandler] = None
+
+
+def is_warmup(request) -> bool:
+    """Whether the request was made by this process's warm-up."""
+    header = request.META.get("HTTP_X_WARMUP")
+    return bool(header) and hmac.compare_digest(header.encode(), TOKEN.encode())
+
+
+def response_getter() -> Callable[[HttpRequest], HttpResponse]:
+    """Return a function sending a request through the server's handler and its
+    middleware, or through a handler of its own without a server (e.g. in tests).
+
+    Unlike the server's requests, these send no request_started or request_finished
+    signals.
+    """
+    current = handler or WSGIHandler()
+    if isinstance(current, ASGIHandler):
+        return async_to_sync(current.get_response_async)
+    return current.get_response
+
+
+class Warmup:
+    """The progress of this process's warm-up."""
+
+    def __init__(self) -> None:
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Step -> seconds it took.
+        self.steps: Dict[str, float] = {}
+        self.failed: List[str] = []
+
+    @property
+    def ready(self) -> bool:
+        """Whether the process can take traffic: it isn't warming up."""
+        return self.started is None or self.finished is not None
+
+    def status(self) -> Dict[str, Any]:
+        seconds = None
+        if self.finished is not None:
+            seconds = round(self.finished - self.started, 3)
+        return {
+            "ready": self.ready,
+            "warmup_seconds": seconds,
+            "steps": {name: round(t, 3) for name, t in self.steps.items()},
+            "failed": list(self.failed),
+        }
+
+    def run(self) -> None:
+        """Run the WARMUP_STEPS, and record how long they took."""
+        self.started, self.finished = time.perf_counter(), None
+        self.steps, self.failed = {}, []
+        for path in settings.WARMUP_STEPS:
+            start = time.perf_counter()
+            try:
+                import_string(path)()
+            except Exception:
+                logger.exception("Warm-up step %s failed", path)
+                self.failed.append(path)
+            self.steps[path] = time.perf_counter() - start
+        self.finished = time.perf_counter()
+        seconds = self.finished - self.started
+        metrics.observe("shoply_warmup_seconds", seconds)
+        logger.info("Warm-up finished in %.3fs", seconds)
+
+
+state = Warmup()
+
+
+def start(application: Optional[BaseHandler] = None) -> None:
+    """Warm this process up on a thread of its own, unless WARMUP is off; the warm-up
+    requests go through `application`, the server's handler.
+    """
+    global handler
+    if application is not None:
+        handler = application
+    if not settings.WARMUP:
+        return
+    state.started, state.finished = time.perf_counter(), None
+    threading.Thread(target=_run, name="shoply-warmup", daemon=True).start()
+
+
+def _run() -> None:
+    try:
+        state.run()
+    except Exception:
+        logger.exception("Warm-up failed")
+        state.finished = time.perf_counter()
+    finally:
+        connections.close_all()
+
+
+def _forked() -> None:
+    # A server that imports the application before forking its workers (gunicorn
+    # --preload) forks them without the warm-up thread: they warm up on their own.
+    if not state.ready:
+        start()
+
+
+os.register_at_fork(after_in_child=_forked)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shoply.settings")
 
 application = get_wsgi_application()
+
+# Imported once Django is set up: warm the worker up before it takes traffic.
+from shoply import warmup  # noqa: E402
+
+warmup.start(application)